@@ -0,0 +1,101 @@
+"""
+Ingestion micro-benchmark: typed (whole-file type inference, STRICT tables) vs
+untyped (pandas per-chunk dtype guessing) conversion in convert_to_sqlite.
+
+Reports ingest rows/sec and peak RSS per mode, then the latency of typical
+analytical queries on each resulting database, with row counts so that wrong
+answers caused by TEXT-affinity numbers are visible.
+
+Examples (from backend/):
+    python -m benchmarks.bench_ingest --rows 100000
+    python -m benchmarks.bench_ingest --rows 1000000 --clean --repeat 10
+"""
+
+import argparse
+import os
+import shutil
+import sqlite3
+import statistics
+import tempfile
+import time
+
+from benchmarks.common import PeakRSS, Timer, print_report, write_json
+from benchmarks.datasets import generate
+
+QUERIES = {
+    "sum_by_category": "SELECT category, SUM(revenue) FROM [{table}] GROUP BY category",
+    "filter_numeric": "SELECT COUNT(*) FROM [{table}] WHERE revenue > 1000",
+    "top_revenue": "SELECT order_id, revenue FROM [{table}] ORDER BY revenue DESC LIMIT 10",
+    "avg_quantity": "SELECT region, AVG(quantity) FROM [{table}] GROUP BY region",
+    "returned": "SELECT COUNT(*) FROM [{table}] WHERE is_returned = 1",
+}
+
+
+def ingest(path: str, output_dir: str, typed: bool):
+    from text_to_sql.config_loader import GLOBAL_CONFIG
+    from utils.file_converter import convert_to_sqlite
+
+    settings = GLOBAL_CONFIG.setdefault('ingestion', {})
+    previous = settings.get('type_inference', True)
+    settings['type_inference'] = typed
+    try:
+        with PeakRSS() as rss, Timer() as timer:
+            db_path = convert_to_sqlite(path, output_dir)
+    finally:
+        settings['type_inference'] = previous
+    return db_path, timer.seconds, rss.peak_mb
+
+
+def time_queries(db_path: str, repeat: int):
+    results = {}
+    with sqlite3.connect(f"file:{db_path}?mode=ro", uri=True) as conn:
+        table = conn.execute("SELECT name FROM sqlite_master WHERE type='table' AND name LIKE 'data_%'").fetchone()[0]
+        for name, template in QUERIES.items():
+            sql = template.format(table=table)
+            timings, rows = [], []
+            for _ in range(repeat):
+                start = time.perf_counter()
+                rows = conn.execute(sql).fetchall()
+                timings.append(time.perf_counter() - start)
+            results[name] = {"median_ms": round(statistics.median(timings) * 1000, 2), "first_row": rows[0] if rows else None}
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=100000)
+    parser.add_argument("--clean", action="store_true", help="Use clean ISO values instead of messy export-style values.")
+    parser.add_argument("--format", default="csv", choices=["csv", "xlsx"])
+    parser.add_argument("--repeat", type=int, default=5, help="Runs per query.")
+    parser.add_argument("--output", help="Write results as JSON to this path.")
+    args = parser.parse_args()
+
+    work_dir = tempfile.mkdtemp(prefix="af_ingest_")
+    try:
+        path = generate(os.path.join(work_dir, f"orders.{args.format}"), args.rows, messy=not args.clean)
+        ingest_rows, query_rows, payload = [], [], {}
+        for typed in (False, True):
+            mode = "typed" if typed else "untyped"
+            db_path, seconds, peak = ingest(path, work_dir, typed)
+            ingest_rows.append({
+                "mode": mode,
+                "seconds": round(seconds, 2),
+                "rows_per_s": round(args.rows / seconds),
+                "peak_rss_mb": peak,
+                "db_mb": round(os.path.getsize(db_path) / 1e6, 1),
+            })
+            queries = time_queries(db_path, args.repeat)
+            payload[mode] = {"ingest": ingest_rows[-1], "queries": queries}
+            for name, stats in queries.items():
+                query_rows.append({"query": name, "mode": mode, **stats})
+
+        print_report(f"Ingest ({args.rows:,} rows, {'clean' if args.clean else 'messy'} {args.format})", ingest_rows)
+        print_report("Query latency", sorted(query_rows, key=lambda r: r["query"]))
+        if args.output:
+            write_json(args.output, {"args": vars(args), "results": payload})
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
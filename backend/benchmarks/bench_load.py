@@ -0,0 +1,151 @@
+"""
+End-to-end load benchmark for /upload, /query and /data/*.
+
+Runs against the in-process app (default) or a live server (--url), using the
+offline 'fake' LLM provider so numbers reflect our own stack, not provider latency.
+For each dataset it reports throughput, p50/p95/p99 latency and peak RSS per stage.
+
+Examples (from backend/):
+    python -m benchmarks.bench_load --rows 10000,100000 --formats csv
+    python -m benchmarks.bench_load --rows 1000000 --formats csv,xlsx --concurrency 16 --output bench.json
+    python -m benchmarks.bench_load --url http://localhost:8000 --rows 10000000 --formats csv
+"""
+
+import argparse
+import os
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks.common import BACKEND_DIR, PeakRSS, Timer, print_report, summarize, write_json
+from benchmarks.datasets import generate
+
+QUESTIONS = [
+    "How many orders are there?",
+    "Show me some orders",
+    "Count the returned orders",
+    "What does this data contain?",
+]
+
+
+def build_client(url: str = None):
+    if url:
+        import httpx
+        return httpx.Client(base_url=url, timeout=600)
+
+    # In-process app with the offline provider; must be set before the app is imported
+    os.environ.setdefault("LLM_PROVIDER", "fake")
+    from fastapi.testclient import TestClient
+    from main import app
+    return TestClient(app)
+
+
+def run_concurrent(fn, count: int, concurrency: int):
+    """Calls fn(i) `count` times on `concurrency` threads, returning latencies, errors and wall time."""
+    latencies, errors = [], 0
+
+    def timed(i):
+        start = time.perf_counter()
+        ok = fn(i)
+        return time.perf_counter() - start, ok
+
+    with Timer() as wall, ThreadPoolExecutor(max_workers=concurrency) as executor:
+        for latency, ok in executor.map(timed, range(count)):
+            latencies.append(latency)
+            errors += 0 if ok else 1
+    return latencies, errors, wall.seconds
+
+
+def bench_dataset(client, path: str, rows: int, args) -> list:
+    results = []
+    label = f"{os.path.splitext(path)[1][1:]}/{rows:,}"
+
+    # Upload
+    with PeakRSS() as rss, open(path, "rb") as fp, Timer() as timer:
+        response = client.post("/upload/", files={"file": (os.path.basename(path), fp)})
+    if response.status_code != 200:
+        print(f"Upload failed for {label}: {response.status_code} {response.text[:200]}")
+        return results
+    uploaded = response.json()
+    db_path = uploaded["db_path"]
+    upload = summarize([timer.seconds], timer.seconds)
+    upload.update(dataset=label, stage="upload", rows_per_s=round(rows / timer.seconds), peak_rss_mb=rss.peak_mb)
+    results.append(upload)
+
+    stages = {
+        "query": lambda i: client.post("/query/", json={
+            "question": QUESTIONS[i % len(QUESTIONS)],
+            "db_path": db_path,
+            "provider": args.provider,
+            "explain": args.explain,
+        }).status_code == 200,
+        "data_preview": lambda i: client.get("/data/preview", params={"db_path": db_path, "limit": args.preview_limit}).status_code == 200,
+        "data_summary": lambda i: client.get("/data/summary", params={"db_path": db_path}).status_code == 200,
+    }
+
+    for stage, fn in stages.items():
+        count = args.queries if stage == "query" else args.requests
+        with PeakRSS() as rss:
+            latencies, errors, wall = run_concurrent(fn, count, args.concurrency)
+        stats = summarize(latencies, wall, errors)
+        stats.update(dataset=label, stage=stage, peak_rss_mb=rss.peak_mb)
+        results.append(stats)
+
+    if not args.keep_files:
+        release(client, uploaded, in_process=not args.url)
+    return results
+
+
+def release(client, uploaded: dict, in_process: bool):
+    """
+    Releases the benchmark's reference on its database. In-process, a database nobody
+    else references is deleted at once through the registry (no grace period).
+    """
+    references = 0
+    if uploaded.get("upload_id"):
+        response = client.delete("/upload", params={"db_path": uploaded["db_path"], "upload_id": uploaded["upload_id"]})
+        references = response.json().get("references", 0) if response.status_code == 200 else 0
+    if in_process and not references:
+        from utils.db_registry import DB_REGISTRY
+        DB_REGISTRY.remove(uploaded["db_path"], delete_file=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", default="10000", help="Comma-separated dataset sizes (10K to 10M).")
+    parser.add_argument("--formats", default="csv,xlsx", help="Comma-separated formats: csv, xlsx.")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--queries", type=int, default=40, help="Number of /query calls per dataset.")
+    parser.add_argument("--requests", type=int, default=100, help="Number of calls per /data endpoint.")
+    parser.add_argument("--preview-limit", type=int, default=10)
+    parser.add_argument("--provider", default="fake", help="LLM provider used for /query.")
+    parser.add_argument("--explain", default="inline", choices=["none", "inline", "deferred"])
+    parser.add_argument("--url", help="Benchmark a running server instead of the in-process app.")
+    parser.add_argument("--data-dir", help="Where generated datasets are written (default: a temp dir).")
+    parser.add_argument("--keep-files", action="store_true", help="Keep generated datasets and databases.")
+    parser.add_argument("--output", help="Write results as JSON to this path.")
+    args = parser.parse_args()
+
+    client = build_client(args.url)
+    data_dir = args.data_dir or tempfile.mkdtemp(prefix="af_bench_")
+    all_results = []
+
+    for fmt in [f.strip() for f in args.formats.split(",") if f.strip()]:
+        for rows in [int(r) for r in args.rows.split(",") if r.strip()]:
+            path = os.path.join(data_dir, f"bench_{rows}.{fmt}")
+            if not os.path.exists(path):
+                with Timer() as timer:
+                    generate(path, rows)
+                print(f"Generated {path} in {timer.seconds:.1f}s")
+            all_results.extend(bench_dataset(client, path, rows, args))
+            if not args.keep_files:
+                os.remove(path)
+
+    columns = ["dataset", "stage", "count", "errors", "throughput_per_s", "p50_ms", "p95_ms", "p99_ms", "peak_rss_mb", "rows_per_s"]
+    print_report("Load benchmark", [{c: r.get(c, "") for c in columns} for r in all_results])
+    if args.output:
+        write_json(args.output, {"backend_dir": BACKEND_DIR, "args": vars(args), "results": all_results})
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+"""
+Read-path benchmark: query latency on a converted database with cold and warm caches,
+for three read configurations (section `read_path` of llm_config.yaml):
+
+- baseline: a new connection per query, SQLite's default page cache, no mmap
+- mmap: a new connection per query, memory-mapped file and larger page cache
+- pooled: mmap and page cache, connections kept open between queries (READ_POOLS)
+
+"cold" evicts the file from the OS cache first (posix_fadvise, Linux only), "prewarmed"
+evicts it then runs the startup prewarm, "warm" is the median of repeated runs. On a
+tmpfs (often /tmp in containers) files never leave memory: use --work-dir on a disk.
+
+Examples (from backend/):
+    python -m benchmarks.bench_read_path --rows 500000
+    python -m benchmarks.bench_read_path --rows 2000000 --repeat 20 --output read_path.json
+"""
+
+import argparse
+import os
+import shutil
+import statistics
+import tempfile
+import time
+
+from benchmarks.bench_ingest import QUERIES
+from benchmarks.common import print_report, write_json
+from benchmarks.datasets import generate
+
+MODES = {
+    "baseline": {"keep_connections": False, "mmap_max_mb": 0, "cache_size_mb": 0},
+    "mmap": {"keep_connections": False},
+    "pooled": {"keep_connections": True},
+}
+
+
+def evict(db_path: str) -> bool:
+    """Drops the database's pages from the OS cache; False where posix_fadvise is unavailable."""
+    if not hasattr(os, "posix_fadvise"):
+        return False
+    for path in (db_path, db_path + "-wal"):
+        if os.path.exists(path):
+            fd = os.open(path, os.O_RDONLY)
+            try:
+                os.fsync(fd)
+                os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_DONTNEED)
+            finally:
+                os.close(fd)
+    return True
+
+
+def first_query_ms(db_path: str, sql: str, prewarm_first: bool) -> float:
+    from text_to_sql.sql_executor import READ_POOLS, execute_query_and_format, prewarm
+
+    READ_POOLS.clear()
+    if not evict(db_path):
+        return float("nan")
+    if prewarm_first:
+        prewarm(db_path)
+    start = time.perf_counter()
+    execute_query_and_format(sql, db_path)
+    return (time.perf_counter() - start) * 1000
+
+
+def warm_query_ms(db_path: str, sql: str, repeat: int) -> float:
+    from text_to_sql.sql_executor import execute_query_and_format
+
+    execute_query_and_format(sql, db_path)
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        execute_query_and_format(sql, db_path)
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=500000)
+    parser.add_argument("--repeat", type=int, default=10, help="Warm runs per query.")
+    parser.add_argument("--work-dir", help="Directory for the dataset and database (default: system temp).")
+    parser.add_argument("--output", help="Write results as JSON to this path.")
+    args = parser.parse_args()
+
+    from text_to_sql.config_loader import GLOBAL_CONFIG
+    from text_to_sql.sql_executor import READ_POOLS
+    from utils.file_converter import convert_to_sqlite
+
+    work_dir = tempfile.mkdtemp(prefix="af_read_path_", dir=args.work_dir)
+    previous = dict(GLOBAL_CONFIG.get('read_path', {}))
+    try:
+        db_path = convert_to_sqlite(generate(os.path.join(work_dir, "orders.csv"), args.rows), work_dir)
+        rows = []
+        for mode, overrides in MODES.items():
+            config = GLOBAL_CONFIG.setdefault('read_path', {})
+            config.clear()
+            config.update(previous, **overrides)
+            READ_POOLS.config = config
+            for name, template in QUERIES.items():
+                sql = template.format(table="data_orders")
+                rows.append({
+                    "query": name,
+                    "mode": mode,
+                    "cold_ms": round(first_query_ms(db_path, sql, prewarm_first=False), 2),
+                    "prewarmed_ms": round(first_query_ms(db_path, sql, prewarm_first=True), 2),
+                    "warm_ms": round(warm_query_ms(db_path, sql, args.repeat), 2),
+                })
+        READ_POOLS.clear()
+
+        title = f"Read path ({args.rows:,} rows, {os.path.getsize(db_path) / 1e6:.1f} MB database)"
+        print_report(title, sorted(rows, key=lambda r: r["query"]))
+        if args.output:
+            write_json(args.output, {"args": vars(args), "results": rows})
+    finally:
+        GLOBAL_CONFIG['read_path'] = previous
+        READ_POOLS.config = previous
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
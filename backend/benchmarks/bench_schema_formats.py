@@ -0,0 +1,156 @@
+"""
+Schema format benchmark: size of the schema text and of the full SQL prompt for each
+style of the `schema_format` section (verbose, compact, and compact without
+deduplication or type abbreviations), then SQL generation latency, provider-reported
+prompt tokens and the share of generated queries that run, per format.
+
+The workbook is wide on purpose: several sheets, most of them sharing one layout (as
+monthly or regional exports do). Tokens are counted with tiktoken (cl100k_base) when it
+is installed, else estimated as characters / 4. Generation uses the offline 'fake'
+provider by default, which only exercises our own stack; pass --provider to measure a
+real model.
+
+Examples (from backend/):
+    python -m benchmarks.bench_schema_formats
+    python -m benchmarks.bench_schema_formats --sheets 12 --columns 200 --provider groq --repeat 5
+"""
+
+import argparse
+import os
+import random
+import shutil
+import statistics
+import tempfile
+import time
+
+from benchmarks.common import print_report, write_json
+
+FORMATS = {
+    "verbose": {"style": "verbose"},
+    "compact": {"style": "compact"},
+    "compact_no_dedup": {"style": "compact", "deduplicate": False},
+    "compact_full_types": {"style": "compact", "abbreviate_types": False},
+}
+
+QUESTIONS = [
+    "How many rows are there?",
+    "What is the total of the first numeric column?",
+    "Show the 10 most recent rows.",
+]
+
+
+def token_counter():
+    """Returns (count function, method name)."""
+    try:
+        import tiktoken
+        encoding = tiktoken.get_encoding("cl100k_base")
+        return (lambda text: len(encoding.encode(text))), "tiktoken"
+    except Exception:
+        return (lambda text: len(text) // 4), "chars/4"
+
+
+def generate_workbook(path: str, sheets: int, columns: int, layouts: int, rows: int = 30, seed: int = 3) -> str:
+    """A workbook of `sheets` sheets whose columns follow `layouts` distinct layouts."""
+    import pandas as pd
+
+    rng = random.Random(seed)
+    kinds = ["int", "real", "text", "date", "bool"]
+    layout_columns = [
+        [(f"{kind}_{name}_{i}", kind) for i in range(columns)
+         for kind, name in [(rng.choice(kinds), rng.choice(["amount", "code", "label", "count", "flag", "day"]))]]
+        for _ in range(layouts)
+    ]
+
+    def values(kind):
+        if kind == "int":
+            return [rng.randint(0, 1000) for _ in range(rows)]
+        if kind == "real":
+            return [round(rng.uniform(0, 100), 2) for _ in range(rows)]
+        if kind == "date":
+            return [f"2024-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}" for _ in range(rows)]
+        if kind == "bool":
+            return [rng.choice(["yes", "no"]) for _ in range(rows)]
+        return [f"item {rng.randint(0, 50)}" for _ in range(rows)]
+
+    with pd.ExcelWriter(path) as writer:
+        for index in range(sheets):
+            layout = layout_columns[min(index, layouts - 1)]
+            frame = pd.DataFrame({name: values(kind) for name, kind in layout})
+            frame.to_excel(writer, sheet_name=f"sheet{index + 1}", index=False)
+    return path
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sheets", type=int, default=6)
+    parser.add_argument("--columns", type=int, default=120, help="Columns per sheet.")
+    parser.add_argument("--layouts", type=int, default=2, help="Distinct sheet layouts (the last one repeats).")
+    parser.add_argument("--provider", default="fake")
+    parser.add_argument("--model", help="Model name for the provider.")
+    parser.add_argument("--repeat", type=int, default=3, help="Generations per question and format.")
+    parser.add_argument("--output", help="Write results as JSON to this path.")
+    args = parser.parse_args()
+
+    # The default LLM is built at import time; must be set before the generator is imported
+    if args.provider == "fake":
+        os.environ.setdefault("LLM_PROVIDER", "fake")
+    from text_to_sql.llm_generator import LLMGenerator
+    from text_to_sql.metrics import METRICS
+    from text_to_sql.schema_inspector import extract_schema, render_schema
+    from text_to_sql.sql_executor import execute_query_and_format, open_readonly_connection
+    from utils.file_converter import convert_to_sqlite
+
+    count_tokens, method = token_counter()
+    work_dir = tempfile.mkdtemp(prefix="af_schema_")
+    try:
+        workbook = generate_workbook(os.path.join(work_dir, "wide.xlsx"), args.sheets, args.columns, args.layouts)
+        db_path = convert_to_sqlite(workbook, work_dir)
+        conn = open_readonly_connection(db_path)
+        try:
+            payload = extract_schema(conn)
+        finally:
+            conn.close()
+
+        generator = LLMGenerator()
+        size_rows, generation_rows = [], []
+        for name, config in FORMATS.items():
+            schema = render_schema(payload, config)
+            messages = generator.query_prompt.invoke(generator._query_params(QUESTIONS[0], schema, [])).to_messages()
+            prompt = "\n".join(str(m.content) for m in messages)
+            size_rows.append({
+                "format": name,
+                "schema_chars": len(schema),
+                f"schema_tokens ({method})": count_tokens(schema),
+                f"prompt_tokens ({method})": count_tokens(prompt),
+            })
+
+            latencies, runs, prompt_tokens = [], 0, METRICS.get("llm.prompt_tokens", args.provider)
+            for question in QUESTIONS:
+                for _ in range(args.repeat):
+                    start = time.perf_counter()
+                    try:
+                        sql = generator.generate_query(question, schema, provider=args.provider, model_name=args.model)
+                    except Exception as e:
+                        print(f"Generation failed ({name}): {e}")
+                        continue
+                    latencies.append(time.perf_counter() - start)
+                    runs += "error" not in execute_query_and_format(sql, db_path)
+            calls = len(QUESTIONS) * args.repeat
+            generation_rows.append({
+                "format": name,
+                "median_ms": round(statistics.median(latencies) * 1000, 1) if latencies else None,
+                "max_ms": round(max(latencies) * 1000, 1) if latencies else None,
+                "reported_prompt_tokens": round((METRICS.get("llm.prompt_tokens", args.provider) - prompt_tokens) / calls),
+                "sql_runs": f"{runs}/{calls}",
+            })
+
+        print_report(f"Schema size ({args.sheets} sheets x {args.columns} columns, {args.layouts} layouts)", size_rows)
+        print_report(f"Generation ({args.provider}, {args.repeat} run(s) per question)", generation_rows)
+        if args.output:
+            write_json(args.output, {"args": vars(args), "sizes": size_rows, "generation": generation_rows})
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+"""
+Cold-start benchmark: time to import the app (`import main`) in a fresh interpreter,
+then to compile the workflow graph (what the first query or the warm-up pays), and
+which heavy modules were loaded at import. Exits non-zero when the median import
+time exceeds the budget, so it can guard startup in CI.
+
+Examples (from backend/):
+    python -m benchmarks.bench_startup
+    python -m benchmarks.bench_startup --repeat 10 --budget-ms 1000
+"""
+
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+
+from benchmarks.common import BACKEND_DIR, print_report, write_json
+
+# Must not be imported by `import main`: they belong to uploads or to a selected provider
+HEAVY_MODULES = ["pandas", "openpyxl", "langgraph", "langchain_openai", "langchain_groq",
+                 "langchain_google_genai", "langchain_mistralai"]
+
+_PROBE = """
+import json, os, sys, time
+sys.path.append(os.path.join(os.getcwd(), 'src'))
+start = time.perf_counter()
+import main
+imported = time.perf_counter() - start
+loaded = [m for m in {heavy!r} if m in sys.modules]
+start = time.perf_counter()
+main.query.workflow_engine.warm_up()
+compiled = time.perf_counter() - start
+print(json.dumps({{"import_s": imported, "compile_s": compiled, "loaded": loaded}}))
+"""
+
+
+def probe() -> dict:
+    # A fresh interpreter per run: nothing is cached in sys.modules
+    output = subprocess.run(
+        [sys.executable, "-c", _PROBE.format(heavy=HEAVY_MODULES)],
+        cwd=BACKEND_DIR, capture_output=True, text=True, check=True
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=5, help="Fresh interpreters to start.")
+    parser.add_argument("--budget-ms", type=float, default=1500, help="Maximum median import time.")
+    parser.add_argument("--output", help="Write results as JSON to this path.")
+    args = parser.parse_args()
+
+    runs = [probe() for _ in range(args.repeat)]
+    imports = [r["import_s"] * 1000 for r in runs]
+    compiles = [r["compile_s"] * 1000 for r in runs]
+    loaded = sorted({m for r in runs for m in r["loaded"]})
+    rows = [
+        {"stage": "import main", "median_ms": round(statistics.median(imports), 1), "max_ms": round(max(imports), 1)},
+        {"stage": "compile graph", "median_ms": round(statistics.median(compiles), 1), "max_ms": round(max(compiles), 1)},
+    ]
+    print_report(f"Startup ({args.repeat} fresh interpreters, budget {args.budget_ms:.0f} ms)", rows)
+    print(f"\nHeavy modules loaded at import: {', '.join(loaded) or 'none'}")
+    if args.output:
+        write_json(args.output, {"args": vars(args), "results": rows, "heavy_modules_loaded": loaded})
+
+    if statistics.median(imports) > args.budget_ms or loaded:
+        print("Startup budget exceeded.")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+"""Synthetic CSV/XLSX datasets for benchmarks, generated by streaming so 10M rows fit in memory."""
+
+import csv
+import datetime
+import os
+import random
+
+CATEGORIES = ["Electronics", "Books", "Clothing", "Food", "Toys", "Garden", "Sports", "Beauty"]
+REGIONS = ["North", "South", "East", "West", "Central"]
+HEADER = ["order_id", "order_date", "customer", "region", "category", "quantity", "unit_price", "revenue", "is_returned"]
+
+# Excel sheets are limited to 1,048,576 rows including the header
+XLSX_MAX_ROWS = 1_048_575
+
+
+def iter_rows(rows: int, seed: int = 7, messy: bool = False):
+    """
+    Yields order rows. With `messy`, values look like real exports: DD/MM/YYYY dates,
+    thousands separators in revenue, and missing quantities ("N/A") only late in the file,
+    which defeats dtype guessing on the first chunk.
+    """
+    rng = random.Random(seed)
+    start = datetime.date(2022, 1, 1)
+    for i in range(rows):
+        quantity = rng.randint(1, 20)
+        price = round(rng.uniform(2, 500), 2)
+        revenue = round(quantity * price, 2)
+        day = start + datetime.timedelta(days=rng.randint(0, 1000))
+        returned = rng.random() < 0.05
+        if messy:
+            yield [
+                i + 1,
+                day.strftime("%d/%m/%Y"),
+                f"Customer {rng.randint(1, max(10, rows // 20))}",
+                rng.choice(REGIONS),
+                rng.choice(CATEGORIES),
+                "N/A" if i > rows // 2 and rng.random() < 0.01 else quantity,
+                price,
+                f"{revenue:,.2f}",
+                "yes" if returned else "no",
+            ]
+        else:
+            yield [
+                i + 1,
+                day.isoformat(),
+                f"Customer {rng.randint(1, max(10, rows // 20))}",
+                rng.choice(REGIONS),
+                rng.choice(CATEGORIES),
+                quantity,
+                price,
+                revenue,
+                returned,
+            ]
+
+
+def generate_csv(path: str, rows: int, seed: int = 7, messy: bool = False) -> str:
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, "w", newline="", encoding="utf-8") as fp:
+        writer = csv.writer(fp)
+        writer.writerow(HEADER)
+        writer.writerows(iter_rows(rows, seed, messy))
+    return path
+
+
+def generate_xlsx(path: str, rows: int, seed: int = 7, messy: bool = False) -> str:
+    """Writes a workbook in write-only mode, spilling over to extra sheets past the Excel row limit."""
+    from openpyxl import Workbook
+
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    workbook = Workbook(write_only=True)
+    sheet, sheet_rows, sheet_index = None, XLSX_MAX_ROWS, 0
+    for row in iter_rows(rows, seed, messy):
+        if sheet_rows >= XLSX_MAX_ROWS:
+            sheet_index += 1
+            sheet = workbook.create_sheet(f"Orders{sheet_index}")
+            sheet.append(HEADER)
+            sheet_rows = 0
+        sheet.append(row)
+        sheet_rows += 1
+    if sheet is None:
+        workbook.create_sheet("Orders1").append(HEADER)
+    workbook.save(path)
+    return path
+
+
+def generate(path: str, rows: int, seed: int = 7, messy: bool = False) -> str:
+    if path.lower().endswith(".xlsx"):
+        return generate_xlsx(path, rows, seed, messy)
+    return generate_csv(path, rows, seed, messy)
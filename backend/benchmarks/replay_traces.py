@@ -0,0 +1,167 @@
+"""
+Replays recorded workflow traces (section `tracing` of llm_config.yaml) against the
+offline stack: the LLM outputs come from the trace, SQL runs on the real SQLite
+databases. Reports, per trace, the recorded and replayed durations of each node and
+whether the replay reached the same SQL, row count and error, so engine changes can
+be profiled and compared on real traffic. The SQL/result caches and the example store
+are bypassed, so every step does its work.
+
+Examples (from backend/):
+    python -m benchmarks.replay_traces --list --slowest 20
+    python -m benchmarks.replay_traces --slowest 10 --repeat 5
+    python -m benchmarks.replay_traces 3f2a9c... --db-dir /data/databases --simulate-latency
+    python -m benchmarks.replay_traces --last 200 --fail-on-diff --output replay.json
+"""
+
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from typing import Any, Dict
+
+from benchmarks.common import print_report, write_json
+
+
+def offline_engine(work_dir: str):
+    """
+    A workflow engine whose caches keep nothing and whose traces go to a scratch store
+    in `work_dir`: replays are traced like live runs, which gives their node timings.
+    """
+    from text_to_sql import workflow_engine
+    from text_to_sql.config_loader import GLOBAL_CONFIG
+    from text_to_sql.shared_cache import InMemoryCache
+    from text_to_sql.trace_store import TraceStore
+
+    workflow_engine.SQL_CACHE = InMemoryCache(max_entries=0)
+    workflow_engine.RESULT_CACHE = InMemoryCache(max_entries=0)
+    GLOBAL_CONFIG.setdefault('examples', {})['enabled'] = False
+    workflow_engine.TRACES = TraceStore(os.path.join(work_dir, "replays.db"), {"enabled": True, "sample_rate": 1.0})
+    return workflow_engine.WorkflowEngine(), workflow_engine.TRACES
+
+
+def replay_trace(engine, replays, trace: Dict[str, Any], db_dir: str = None,
+                 simulate_latency: bool = False) -> Dict[str, Any]:
+    """Runs the trace's question again; returns the replayed final state and its own trace."""
+    from text_to_sql.trace_store import ReplayGenerator, messages_from_json
+
+    inputs = trace["inputs"]
+    db_path = os.path.join(db_dir, os.path.basename(inputs["db_path"])) if db_dir else inputs["db_path"]
+    engine.llm_generator = ReplayGenerator(trace, simulate_latency=simulate_latency)
+    state = engine.run(
+        question=inputs["question"],
+        db_path=db_path,
+        chat_history=messages_from_json(inputs.get("chat_history")),
+        provider=inputs.get("provider"),
+        model_name=inputs.get("model_name"),
+        schema=inputs["schema"],
+        explain_mode=inputs.get("explain_mode", "inline"),
+        approximate=inputs.get("approximate", False),
+        candidates=inputs.get("candidates") or 1,
+    )
+    return {"state": state, "trace": replays.get(state["trace_id"])}
+
+
+def compare(trace: Dict[str, Any], replayed: Dict[str, Any]) -> Dict[str, Any]:
+    from text_to_sql.trace_store import row_count
+
+    recorded, state = trace["final"], replayed["state"]
+    differences = []
+    if (recorded.get("sql") or "") != (state.get("sql") or ""):
+        differences.append("sql")
+    if recorded.get("row_count") != row_count(state.get("result")):
+        differences.append("rows")
+    if bool(recorded.get("error")) != bool(state.get("error")):
+        differences.append("error")
+    recorded_nodes = ">".join(s["node"] for s in trace["steps"])
+    replayed_nodes = ">".join(s["node"] for s in replayed["trace"]["steps"])
+    if recorded_nodes != replayed_nodes:
+        differences.append("path")
+    return {"differences": differences, "recorded_nodes": recorded_nodes, "replayed_nodes": replayed_nodes}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("trace_ids", nargs="*", help="Traces to replay (default: the most recent ones).")
+    parser.add_argument("--last", type=int, default=20, help="Replay the N most recent traces.")
+    parser.add_argument("--slowest", type=int, help="Replay the N slowest traces instead.")
+    parser.add_argument("--min-ms", type=float, default=0, help="Only traces at least this slow.")
+    parser.add_argument("--list", action="store_true", help="List the traces without replaying them.")
+    parser.add_argument("--repeat", type=int, default=1, help="Replays per trace (the median time is reported).")
+    parser.add_argument("--db-dir", help="Look the databases up in this directory (traces from another machine).")
+    parser.add_argument("--simulate-latency", action="store_true",
+                        help="Wait as long as the recorded generate/explain nodes took.")
+    parser.add_argument("--traces", help="Trace store to read (default: tracing.sqlite_path).")
+    parser.add_argument("--fail-on-diff", action="store_true", help="Exit non-zero when a replay diverges.")
+    parser.add_argument("--output", help="Write results as JSON to this path.")
+    args = parser.parse_args()
+
+    from text_to_sql.trace_store import TRACES, TraceStore
+
+    store = TraceStore(args.traces, TRACES.config) if args.traces else TRACES
+    if args.trace_ids:
+        summaries = [{"trace_id": t} for t in args.trace_ids]
+    else:
+        limit = args.slowest or args.last
+        summaries = store.list(limit=limit, slowest=bool(args.slowest), min_ms=args.min_ms)
+    if args.list:
+        print_report("Traces", [
+            {**s, "created_at": time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(s["created_at"])),
+             "question": s["question"][:60], "db_path": os.path.basename(s["db_path"])}
+            for s in summaries
+        ])
+        return
+
+    work_dir = tempfile.mkdtemp(prefix="af_replay_")
+    engine, replays = offline_engine(work_dir)
+    rows, node_rows, payload, diverged = [], [], [], 0
+    node_totals = defaultdict(lambda: {"recorded_ms": 0.0, "replayed_ms": 0.0, "count": 0})
+    try:
+        for summary in summaries:
+            trace = store.get(summary["trace_id"])
+            if trace is None:
+                print(f"Trace not found: {summary['trace_id']}")
+                continue
+            runs = sorted((replay_trace(engine, replays, trace, args.db_dir, args.simulate_latency)
+                           for _ in range(args.repeat)), key=lambda r: r["trace"]["total_ms"])
+            replayed = runs[len(runs) // 2]
+            comparison = compare(trace, replayed)
+            diverged += bool(comparison["differences"])
+            rows.append({
+                "trace_id": trace["trace_id"][:12],
+                "recorded_ms": round(trace["total_ms"], 1),
+                "replayed_ms": round(replayed["trace"]["total_ms"], 1),
+                "nodes": comparison["recorded_nodes"],
+                "diff": ",".join(comparison["differences"]) or "-",
+            })
+            for step in trace["steps"]:
+                node_totals[step["node"]]["recorded_ms"] += step["ms"]
+                node_totals[step["node"]]["count"] += 1
+            for step in replayed["trace"]["steps"]:
+                node_totals[step["node"]]["replayed_ms"] += step["ms"]
+            payload.append({**rows[-1], "trace_id": trace["trace_id"], **comparison,
+                            "replayed_sql": replayed["state"].get("sql"), "replayed_error": replayed["state"].get("error"),
+                            "replayed_steps": replayed["trace"]["steps"]})
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    for node, totals in sorted(node_totals.items()):
+        node_rows.append({
+            "node": node,
+            "calls": totals["count"],
+            "recorded_ms": round(totals["recorded_ms"], 1),
+            "replayed_ms": round(totals["replayed_ms"], 1),
+        })
+    print_report(f"Replay ({len(rows)} traces, {args.repeat} run(s) each)", rows)
+    print_report("Time per node (all traces)", node_rows)
+    print(f"\nDiverged: {diverged} of {len(rows)}")
+    if args.output:
+        write_json(args.output, {"args": vars(args), "traces": payload, "nodes": node_rows})
+    if args.fail_on_diff and diverged:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,5 @@
+import os
+import sys
+
+# The data layer builds on the application modules under src
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src'))
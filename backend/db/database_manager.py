@@ -0,0 +1,64 @@
+import os
+import sqlite3
+from typing import Dict, List, Optional
+
+import pandas as pd
+
+from text_to_sql.config_loader import GLOBAL_CONFIG
+from utils.file_converter import (
+    backup_to_file, create_typed_table, finalize_for_reads, insert_frame, load_csv_typed,
+    write_column_metadata
+)
+from utils.type_inference import convert_frame, infer_types
+
+
+class DatabaseManager:
+    """
+    Loads CSV and Excel files into typed SQLite tables, the same way uploads are converted.
+
+    By default the database lives in memory (`:memory:`): small datasets load and query
+    without touching the disk, and `backup_to_disk` writes them to a file with SQLite's
+    online backup when they must persist.
+    """
+
+    def __init__(self, db_path: str = ":memory:"):
+        self.db_path = db_path
+        self._conn: Optional[sqlite3.Connection] = None
+
+    def init_sqlite(self, db_path: str = None) -> sqlite3.Connection:
+        """Opens the database (in memory unless a file path is given), replacing any open connection."""
+        if self._conn is not None:
+            self._conn.close()
+        self.db_path = db_path or self.db_path
+        self._conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        return self._conn
+
+    def get_sqlite_connection(self) -> Optional[sqlite3.Connection]:
+        return self._conn
+
+    def _connection(self) -> sqlite3.Connection:
+        return self._conn if self._conn is not None else self.init_sqlite()
+
+    def load_csv_as_table(self, file_path: str, table_name: str) -> List[Dict[str, str]]:
+        """Creates `table_name` from a CSV file, with column types inferred over every row. Returns the types."""
+        settings = GLOBAL_CONFIG.get('ingestion', {})
+        return load_csv_typed(file_path, table_name, self._connection(), settings)
+
+    def load_excel_as_table(self, file_path: str, table_name: str, sheet_name=0) -> List[Dict[str, str]]:
+        """Creates `table_name` from one sheet of an Excel file (the first by default). Returns the types."""
+        settings = GLOBAL_CONFIG.get('ingestion', {})
+        conn = self._connection()
+        df = pd.read_excel(file_path, sheet_name=sheet_name, dtype=str)
+        column_types = infer_types([df], dayfirst=settings.get('dayfirst', True))
+        if not column_types:
+            raise ValueError("The sheet has no columns.")
+        create_typed_table(conn, table_name, column_types, strict=settings.get('strict_tables', True))
+        insert_frame(conn, table_name, convert_frame(df, column_types))
+        write_column_metadata(conn, table_name, column_types)
+        return column_types
+
+    def backup_to_disk(self, path: str) -> str:
+        """Writes the current database to `path` (online backup: the connection stays usable)."""
+        backup_to_file(self._connection(), path)
+        finalize_for_reads(path)
+        return os.path.abspath(path)
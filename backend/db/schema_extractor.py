@@ -0,0 +1,37 @@
+import json
+import os
+import sqlite3
+from typing import Any, Dict, Optional, Union
+
+from text_to_sql.schema_inspector import extract_schema, save_schema_snapshot
+
+
+def _database_file(conn: sqlite3.Connection) -> Optional[str]:
+    # PRAGMA database_list gives an empty file name for in-memory databases
+    for _, name, path in conn.execute("PRAGMA database_list"):
+        if name == "main":
+            return path or None
+    return None
+
+
+def get_sqlite_schema(conn: sqlite3.Connection, persist: bool = True,
+                      output_path: Union[str, os.PathLike, None] = None) -> Dict[str, Any]:
+    """
+    Structured schema of the database behind `conn`:
+    {"source": "sqlite", "tables": [{"name", "columns": [{"name", "type", ...}]}], ...}.
+
+    With `persist`, the JSON snapshot is written to `output_path`, or by default next to
+    the database file, where `get_db_schema` loads it instead of inspecting the database
+    again (in-memory databases have no default location and are not persisted).
+    """
+    payload = extract_schema(conn)
+    if not persist:
+        return payload
+    if output_path is not None:
+        with open(output_path, "w", encoding="utf-8") as f:
+            json.dump(payload, f, indent=2)
+    else:
+        db_file = _database_file(conn)
+        if db_file:
+            save_schema_snapshot(db_file, payload)
+    return payload
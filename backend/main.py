@@ -1,19 +1,39 @@
 import uvicorn
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 import os
 import sys
+import threading
 
 # Adjust the python path to include the src directory
 sys.path.append(os.path.join(os.path.dirname(__file__), 'src'))
 
-from api.routers import upload, query, data
+from api.routers import upload, query, data, sessions
+from text_to_sql.config_loader import GLOBAL_CONFIG
+from text_to_sql.metrics import METRICS
+from utils.db_registry import LIFECYCLE
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Background housekeeping of backend/databases and backend/temp
+    LIFECYCLE.start()
+    # Compile the workflow graph while the worker already accepts requests
+    if GLOBAL_CONFIG.get('server', {}).get('warm_up', True):
+        threading.Thread(target=query.workflow_engine.warm_up, name="warm-up", daemon=True).start()
+    # Recently used databases into the OS cache, so their first queries don't hit the disk
+    if GLOBAL_CONFIG.get('read_path', {}).get('prewarm_on_startup', False):
+        threading.Thread(target=LIFECYCLE.prewarm, name="prewarm", daemon=True).start()
+    yield
+    LIFECYCLE.stop()
 
 # --- FastAPI App ---
 app = FastAPI(
     title="Text-to-SQL API",
     description="An API to convert natural language questions into SQL queries and execute them.",
     version="1.0.0",
+    lifespan=lifespan,
 )
 
 # Add CORS Middleware
@@ -29,11 +49,17 @@ app.add_middleware(
 app.include_router(upload.router)
 app.include_router(query.router)
 app.include_router(data.router)
+app.include_router(sessions.router)
 
 @app.get("/", tags=["Health Check"])
 def read_root():
     """Root endpoint for health checks."""
     return {"status": "ok"}
 
+@app.get("/metrics", tags=["Health Check"])
+def read_metrics():
+    """Returns in-process counters (LLM calls, token usage, cache hits...)."""
+    return METRICS.snapshot()
+
 if __name__ == "__main__":
     uvicorn.run("main:app", host="0.0.0.0", port=8000, reload=True)
@@ -0,0 +1,47 @@
+"""
+Production entrypoint: several preforked worker processes, no auto-reload.
+
+Caches (schemas, generated SQL, results), deferred explanation jobs and chat
+sessions are kept in SQLite files under backend/state/, so every worker benefits
+from the work done by the others.
+
+    python serve.py --workers 4
+"""
+import argparse
+import os
+import sys
+
+import uvicorn
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.join(BACKEND_DIR, 'src'))
+
+
+def main():
+    # Must be set before the workers import the app, which builds the caches
+    os.environ["AF_SHARED_STATE"] = "1"
+    from text_to_sql.config_loader import GLOBAL_CONFIG
+
+    config = GLOBAL_CONFIG.get('server', {})
+    parser = argparse.ArgumentParser(description="Runs the API with several worker processes.")
+    parser.add_argument("--host", default=config.get('host', '0.0.0.0'))
+    parser.add_argument("--port", type=int, default=config.get('port', 8000))
+    parser.add_argument("--workers", type=int, default=config.get('workers') or os.cpu_count() or 1)
+    parser.add_argument("--log-level", default=config.get('log_level', 'info'))
+    args = parser.parse_args()
+    # Per-process limits (admission control) are split between the workers
+    os.environ["AF_WORKERS"] = str(args.workers)
+
+    uvicorn.run(
+        "main:app",
+        host=args.host,
+        port=args.port,
+        workers=args.workers,
+        reload=False,
+        app_dir=BACKEND_DIR,
+        log_level=args.log_level,
+    )
+
+
+if __name__ == "__main__":
+    main()
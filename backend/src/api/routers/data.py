@@ -1,7 +1,9 @@
 from fastapi import APIRouter, HTTPException
-import os
-import sqlite3
-import pandas as pd
+
+from api.serialization import json_response
+from text_to_sql.schema_inspector import list_user_tables
+from text_to_sql.sql_executor import open_readonly_connection
+from utils.validators import validate_db_path
 
 router = APIRouter(
     prefix="/data",
@@ -10,52 +12,41 @@ router = APIRouter(
 )
 
 
-def get_db_dir():
-    """Returns the absolute path to the databases directory."""
-    base_dir = os.path.dirname(
-        os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-    )
-    return os.path.join(base_dir, 'databases')
-
-
 @router.get("/preview")
 def get_data_preview(db_path: str, limit: int = 10):
     """
     Returns the first N rows of the first table in the database.
     """
     try:
-        # Validate path
-        db_dir = get_db_dir()
-        full_path = os.path.abspath(db_path)
-        if not full_path.startswith(db_dir):
-            raise HTTPException(status_code=403, detail="Access forbidden")
-
-        if not os.path.exists(full_path):
-            raise HTTPException(status_code=404, detail="Database not found")
+        # Validate path (registry lookup, also records the access for LRU eviction)
+        full_path = validate_db_path(db_path)
 
-        # Use check_same_thread=False to avoid issues with FastAPI threads
-        conn = sqlite3.connect(full_path, check_same_thread=False)
+        # Use check_same_thread=False to avoid issues with FastAPI threads.
+        # Read-only, so a stale registry entry can't recreate a deleted file.
+        conn = open_readonly_connection(full_path, check_same_thread=False)
 
         # Get the first table name
         cursor = conn.cursor()
-        cursor.execute("SELECT name FROM sqlite_master WHERE type='table' LIMIT 1;")
-        table = cursor.fetchone()
-        if not table:
+        tables = list_user_tables(cursor)
+        if not tables:
             conn.close()
             return {"columns": [], "rows": [], "table_name": None}
 
-        table_name = table[0]
+        table_name = tables[0]
 
-        # Get data as DataFrame
-        df = pd.read_sql_query(f"SELECT * FROM [{table_name}] LIMIT {limit}", conn)
+        # Plain cursor read: pandas is only loaded for uploads
+        cursor.execute(f"SELECT * FROM [{table_name}] LIMIT ?", (limit,))
+        columns = [d[0] for d in cursor.description]
+        rows = cursor.fetchall()
         conn.close()
 
-        return {
+        # Already columnar: pre-encoded once with orjson
+        return json_response({
             "table_name": table_name,
-            "columns": df.columns.tolist(),
-            "rows": df.values.tolist(),
-            "total_rows_shown": len(df)
-        }
+            "columns": columns,
+            "rows": rows,
+            "total_rows_shown": len(rows)
+        })
 
     except HTTPException:
         raise
@@ -69,24 +60,17 @@ def get_data_summary(db_path: str):
     Returns summary statistics for the first table in the database.
     """
     try:
-        db_dir = get_db_dir()
-        full_path = os.path.abspath(db_path)
-        if not full_path.startswith(db_dir):
-            raise HTTPException(status_code=403, detail="Access forbidden")
-
-        if not os.path.exists(full_path):
-            raise HTTPException(status_code=404, detail="Database not found")
+        full_path = validate_db_path(db_path)
 
-        conn = sqlite3.connect(full_path)
+        conn = open_readonly_connection(full_path)
 
         cursor = conn.cursor()
-        cursor.execute("SELECT name FROM sqlite_master WHERE type='table' LIMIT 1;")
-        table = cursor.fetchone()
-        if not table:
+        tables = list_user_tables(cursor)
+        if not tables:
             conn.close()
             return {"table_name": None, "row_count": 0, "columns": []}
 
-        table_name = table[0]
+        table_name = tables[0]
 
         # Get row count
         cursor.execute(f"SELECT COUNT(*) FROM [{table_name}]")
@@ -1,9 +1,24 @@
-from fastapi import APIRouter, HTTPException, Body
-from typing import Dict, Any  # noqa: F401
+from fastapi import APIRouter, HTTPException, Body, Header, Request
+from fastapi.responses import StreamingResponse
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Dict, Any, Optional  # noqa: F401
+import math
+import threading
+import time
 
-from api.schemas import QueryRequest
+from api.schemas import QueryRequest, BatchQueryRequest, ExportRequest
+from api.serialization import dumps, negotiate, render_result, export_response
 from utils.validators import validate_db_path
 from text_to_sql.workflow_engine import WorkflowEngine
+from text_to_sql.schema_inspector import get_cached_db_schema
+from text_to_sql.sql_executor import ReadOnlyConnectionPool, open_readonly_connection
+from text_to_sql.sql_safety import SQLSecurityError, validate_sql_safety
+from text_to_sql.config_loader import GLOBAL_CONFIG
+from text_to_sql.llm_provider import LLMProvider
+from text_to_sql.explanation_jobs import ExplanationJobs
+from text_to_sql.approximate import approximation_note
+from text_to_sql.admission import ADMISSION, AdmissionRejected
+from text_to_sql.history_manager import count_tokens
 
 router = APIRouter(
     prefix="/query",
@@ -15,25 +30,104 @@ router = APIRouter(
 # In a larger app, this might be a dependency injection.
 workflow_engine = WorkflowEngine()
 
+# Background explanations for `explain: deferred` requests
+explanation_jobs = ExplanationJobs()
+
+# Per-provider concurrency slots, shared by all running batches
+_provider_slots: Dict[str, threading.BoundedSemaphore] = {}
+_provider_slots_lock = threading.Lock()
+
+
+def defer_explanation(result: Dict[str, Any], question: str, provider: str = None, model_name: str = None) -> Dict[str, Any]:
+    """Schedules the explanation of a successful result and attaches its handle."""
+    query_result = result.get("result") or {}
+    if result.get("error") or not query_result.get("data"):
+        return result
+
+    query_result["explanation_id"] = explanation_jobs.submit(
+        workflow_engine.llm_generator.generate_explanation,
+        question=question,
+        sql=result.get("sql"),
+        data=query_result["data"],
+        provider=provider,
+        model_name=model_name,
+        note=approximation_note(query_result)
+    )
+    return result
+
+
+def client_id(http_request: Request, x_user_id: Optional[str] = None) -> Optional[str]:
+    """Who per-client rate limits apply to: the X-User-Id header, else the client address."""
+    return x_user_id or (http_request.client.host if http_request.client else None)
+
+
+def candidate_count(requested: Optional[int]) -> int:
+    config = GLOBAL_CONFIG.get('candidates', {})
+    return max(1, min(requested or config.get('default', 1), config.get('max', 5)))
+
+
+def admit_request(provider: Optional[str], client: Optional[str], schema: str, question: str,
+                  explain_mode: str = "inline", block: bool = False, candidates: int = 1):
+    """Applies admission control before any LLM call; raises a 429 with Retry-After when over the limits."""
+    provider = provider or LLMProvider.active_provider()
+    prompt_tokens = count_tokens(schema + question, provider)
+    calls = ADMISSION.estimated_calls(explain_mode) + candidates - 1
+    tokens = ADMISSION.estimated_tokens(prompt_tokens, calls)
+    try:
+        ADMISSION.admit(provider, client_id=client, tokens=tokens, block=block, calls=calls)
+    except AdmissionRejected as e:
+        raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": str(math.ceil(e.retry_after))})
+
+
+def _provider_concurrency(provider: str) -> int:
+    limits = GLOBAL_CONFIG.get('batch', {}).get('concurrency', {})
+    return limits.get(provider, limits.get('default', 4))
+
+
+def _get_provider_slots(provider: str) -> threading.BoundedSemaphore:
+    with _provider_slots_lock:
+        if provider not in _provider_slots:
+            _provider_slots[provider] = threading.BoundedSemaphore(_provider_concurrency(provider))
+        return _provider_slots[provider]
+
 @router.post("/")
-def run_query(request: QueryRequest = Body(...)):
+def run_query(http_request: Request, request: QueryRequest = Body(...), x_user_id: Optional[str] = Header(None),
+              format: Optional[str] = None, accept: Optional[str] = Header(None)):
     """
     Takes a natural language question and returns a SQL query or the result of the query.
+    Answers 429 with a Retry-After header when the provider or client rate limit is reached.
+    The response format follows `?format=` or the Accept header: json (default), columnar,
+    or the result rows alone as csv / ndjson.
     """
     try:
-        # Validate the provided database path
-        validate_db_path(request.db_path)
+        fmt = negotiate(format, accept)
+        # Validate the provided database path; the resolved path keys the caches
+        db_path = validate_db_path(request.db_path)
+
+        schema = get_cached_db_schema(db_path)
+        if schema.startswith("Error"):
+            raise HTTPException(status_code=400, detail=schema)
+        candidates = candidate_count(request.candidates)
+        admit_request(request.provider, client_id(http_request, x_user_id), schema, request.question,
+                      request.explain, candidates=candidates)
 
         # Convert Pydantic messages to LangChain messages
         chat_history_langchain = [msg.to_langchain() for msg in request.chat_history]
 
         result = workflow_engine.run(
             question=request.question,
-            db_path=request.db_path,
+            db_path=db_path,
             chat_history=chat_history_langchain,
             provider=request.provider,
-            model_name=request.model_name
+            model_name=request.model_name,
+            schema=schema,
+            explain_mode=request.explain,
+            approximate=request.approximate,
+            candidates=candidates
         )
+
+        if request.explain == "deferred":
+            result = defer_explanation(result, request.question, request.provider, request.model_name)
         
         if result.get("error"):
             if "Security Violation" in result["error"]:
@@ -41,10 +135,151 @@ def run_query(request: QueryRequest = Body(...)):
             # For other errors, return 400 Bad Request
             raise HTTPException(status_code=400, detail=result["error"])
 
-        return result
+        return render_result(result, fmt)
 
     except HTTPException as e:
         raise e
     except Exception as e:
         print(f"Internal Server Error: {e}") 
         raise HTTPException(status_code=500, detail=f"An internal server error occurred: {str(e)}")
+
+
+@router.post("/export")
+def export_query(request: ExportRequest = Body(...), format: Optional[str] = None, accept: Optional[str] = Header(None)):
+    """
+    Streams the full result of a SQL query (e.g. the `sql` of a /query answer) as CSV or
+    NDJSON, read in chunks from a read-only connection instead of being held in memory.
+    The query is interrupted after `serialization.export_timeout_seconds`; past the
+    first rows, the response is then cut short rather than completed.
+    """
+    fmt = negotiate(format or request.format, accept)
+    if fmt not in ("csv", "ndjson"):
+        raise HTTPException(status_code=400, detail="Export format must be csv or ndjson.")
+    full_path = validate_db_path(request.db_path)
+    try:
+        sql = validate_sql_safety(request.sql)
+    except SQLSecurityError as e:
+        raise HTTPException(status_code=403, detail=str(e))
+
+    conn = open_readonly_connection(full_path, check_same_thread=False)
+    timeout = GLOBAL_CONFIG.get('serialization', {}).get('export_timeout_seconds', 300)
+    if timeout:
+        # As in execute_query_and_format: a non-zero return aborts the query with "interrupted"
+        deadline = time.monotonic() + timeout
+        conn.set_progress_handler(lambda: time.monotonic() > deadline, 10000)
+    try:
+        cursor = conn.execute(sql)
+    except Exception as e:
+        conn.close()
+        raise HTTPException(status_code=400, detail=str(e))
+    if cursor.description is None:
+        conn.close()
+        raise HTTPException(status_code=400, detail="The query returns no rows to export.")
+    columns = [d[0] for d in cursor.description]
+
+    def rows():
+        try:
+            while True:
+                chunk = cursor.fetchmany(GLOBAL_CONFIG.get('serialization', {}).get('export_chunk_rows', 1000))
+                if not chunk:
+                    break
+                yield from chunk
+        except Exception as e:
+            # Headers are sent: the stream is aborted, so the export can't pass for complete
+            print(f"Export stopped: {e}")
+            raise
+        finally:
+            conn.close()
+
+    return export_response(fmt, columns, rows(), filename="export")
+
+
+@router.get("/explanations/{explanation_id}")
+def get_explanation(explanation_id: str):
+    """
+    Returns the status of a deferred explanation: 'pending', 'done' (with the text) or 'error'.
+    """
+    job = explanation_jobs.get(explanation_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Explanation not found or expired")
+    return job
+
+
+@router.post("/batch")
+def run_batch_query(http_request: Request, request: BatchQueryRequest = Body(...), x_user_id: Optional[str] = Header(None)):
+    """
+    Answers many questions against one database. The schema is loaded once, questions
+    run concurrently (bounded per provider) on a shared connection pool, and results
+    are streamed back as NDJSON lines in completion order, each with the status code
+    the question would have had on its own. A batch counts as one request for the
+    client rate limit; each question then waits for its turn at the provider.
+    """
+    db_path = validate_db_path(request.db_path)
+
+    max_questions = GLOBAL_CONFIG.get('batch', {}).get('max_questions', 1000)
+    if not request.questions:
+        raise HTTPException(status_code=400, detail="No questions provided.")
+    if len(request.questions) > max_questions:
+        raise HTTPException(status_code=400, detail=f"Too many questions (max {max_questions}).")
+
+    schema = get_cached_db_schema(db_path)
+    if schema.startswith("Error"):
+        raise HTTPException(status_code=400, detail=schema)
+
+    try:
+        ADMISSION.admit(None, client_id=client_id(http_request, x_user_id))
+    except AdmissionRejected as e:
+        raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": str(math.ceil(e.retry_after))})
+
+    provider = request.provider or LLMProvider.active_provider()
+    concurrency = _provider_concurrency(provider)
+    if request.concurrency:
+        concurrency = max(1, min(concurrency, request.concurrency))
+    slots = _get_provider_slots(provider)
+
+    def answer(index: int, question: str, pool: ReadOnlyConnectionPool) -> Dict[str, Any]:
+        with slots:
+            try:
+                admit_request(provider, None, schema, question, request.explain, block=True)
+                result = workflow_engine.run(
+                    question=question,
+                    db_path=db_path,
+                    chat_history=[],
+                    provider=request.provider,
+                    model_name=request.model_name,
+                    schema=schema,
+                    connection_pool=pool,
+                    explain_mode=request.explain
+                )
+                if request.explain == "deferred":
+                    result = defer_explanation(result, question, request.provider, request.model_name)
+            except HTTPException as e:
+                # Rate limiting (429) is told apart from server faults
+                result = {"error": e.detail, "status_code": e.status_code}
+            except Exception as e:
+                result = {"error": f"An internal server error occurred: {str(e)}", "status_code": 500}
+        error = result.get("error")
+        if error and "status_code" not in result:
+            result["status_code"] = 403 if "Security Violation" in error else 400
+        return {
+            "index": index,
+            "question": question,
+            "sql": result.get("sql"),
+            "result": result.get("result"),
+            "error": error,
+            "status_code": result.get("status_code", 200)
+        }
+
+    def stream():
+        pool = ReadOnlyConnectionPool(db_path, size=concurrency)
+        executor = ThreadPoolExecutor(max_workers=concurrency)
+        try:
+            futures = [executor.submit(answer, i, q, pool) for i, q in enumerate(request.questions)]
+            for future in as_completed(futures):
+                yield dumps(future.result()) + b"\n"
+        finally:
+            # Stops queued questions if the client disconnects mid-stream
+            executor.shutdown(wait=True, cancel_futures=True)
+            pool.close()
+
+    return StreamingResponse(stream(), media_type="application/x-ndjson")
@@ -0,0 +1,111 @@
+from fastapi import APIRouter, HTTPException, Body, Header, Request
+from typing import Optional
+
+from api.schemas import SessionCreateRequest, SessionQueryRequest
+from api.serialization import json_response
+from api.routers.query import workflow_engine, defer_explanation, admit_request, client_id
+from utils.validators import validate_db_path
+from utils.session_store import Session, build_session_store
+from text_to_sql.schema_inspector import get_cached_db_schema
+
+router = APIRouter(
+    prefix="/sessions",
+    tags=["Sessions"],
+    responses={404: {"description": "Not found"}},
+)
+
+# Conversation state kept server-side so clients only send the new question.
+session_store = build_session_store()
+
+
+def _get_session_or_404(session_id: str) -> Session:
+    session = session_store.get(session_id)
+    if session is None:
+        raise HTTPException(status_code=404, detail="Session not found or expired")
+    return session
+
+
+@router.post("/")
+def create_session(request: SessionCreateRequest = Body(...)):
+    """
+    Opens a conversation pinned to one database.
+    """
+    db_path = validate_db_path(request.db_path)
+
+    schema = get_cached_db_schema(db_path)
+    if schema.startswith("Error"):
+        raise HTTPException(status_code=400, detail=schema)
+
+    session = Session(
+        db_path=db_path,
+        provider=request.provider,
+        model_name=request.model_name
+    )
+    session_store.put(session)
+    return {**session.to_dict(), "expires_in": session_store.ttl_seconds}
+
+
+@router.get("/{session_id}")
+def get_session(session_id: str):
+    """Returns the session metadata and its conversation history."""
+    return _get_session_or_404(session_id).to_dict(include_history=True)
+
+
+@router.delete("/{session_id}")
+def delete_session(session_id: str):
+    if not session_store.delete(session_id):
+        raise HTTPException(status_code=404, detail="Session not found or expired")
+    return {"message": "Session deleted."}
+
+
+@router.post("/{session_id}/query")
+def run_session_query(session_id: str, http_request: Request, request: SessionQueryRequest = Body(...),
+                      x_user_id: Optional[str] = Header(None)):
+    """
+    Answers a question using the history and database stored in the session. The schema
+    comes from the schema cache, so rows or tables added since the session opened are seen.
+    """
+    session = _get_session_or_404(session_id)
+    schema = get_cached_db_schema(session.db_path)
+    if schema.startswith("Error"):
+        raise HTTPException(status_code=400, detail=schema)
+    admit_request(request.provider or session.provider, client_id(http_request, x_user_id),
+                  schema, request.question, request.explain)
+
+    try:
+        with session.lock:
+            result = workflow_engine.run(
+                question=request.question,
+                db_path=session.db_path,
+                chat_history=list(session.history),
+                provider=request.provider or session.provider,
+                model_name=request.model_name or session.model_name,
+                schema=schema,
+                explain_mode=request.explain
+            )
+
+            if request.explain == "deferred":
+                result = defer_explanation(
+                    result, request.question,
+                    request.provider or session.provider,
+                    request.model_name or session.model_name
+                )
+
+            if result.get("error"):
+                if "Security Violation" in result["error"]:
+                    raise HTTPException(status_code=403, detail=result["error"])
+                raise HTTPException(status_code=400, detail=result["error"])
+
+            answer = (result.get("result") or {}).get("message", "")
+            if not session_store.add_turn(session, request.question, answer, result.get("sql")):
+                raise HTTPException(status_code=404, detail="Session not found or expired")
+
+        # History and schema stay server-side; only send back the new turn
+        response = {k: v for k, v in result.items() if k not in ("chat_history", "schema")}
+        return json_response({**response, "session_id": session.session_id})
+
+    except HTTPException as e:
+        raise e
+    except Exception as e:
+        print(f"Internal Server Error: {e}")
+        raise HTTPException(status_code=500, detail=f"An internal server error occurred: {str(e)}")
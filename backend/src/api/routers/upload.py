@@ -1,13 +1,38 @@
-from fastapi import APIRouter, UploadFile, File, HTTPException
+from fastapi import APIRouter, UploadFile, File, Form, Header, HTTPException
+from fastapi.concurrency import run_in_threadpool
+import hashlib
 import os
-import shutil
 import uuid
-from typing import Dict
+from typing import Dict, Optional
 
 # Import relative to the package structure. 
 # We assume this is in backend/src/api/routers/upload.py
 # python path should include backend/src
-from utils.file_converter import convert_to_sqlite
+from utils.upload_index import build_upload_index
+from utils.db_registry import DB_DIR, DB_REGISTRY, TEMP_DIR
+from utils.validators import validate_db_path
+from text_to_sql.config_loader import GLOBAL_CONFIG
+from text_to_sql.metrics import METRICS
+
+# Content hash -> converted database, shared by every upload of the same bytes
+upload_index = build_upload_index()
+
+
+def convert_to_sqlite(file_path: str, output_dir: str) -> str:
+    # Imported on first upload: the converter pulls in pandas
+    from utils.file_converter import convert_to_sqlite as convert
+    return convert(file_path, output_dir)
+
+
+def append_to_sqlite(file_path: str, db_path: str, table: str = None, mode: str = "append", key: str = None) -> Dict:
+    from utils.file_converter import append_to_sqlite as append
+    return append(file_path, db_path, table=table, mode=mode, key=key)
+
+
+def copy_database(db_path: str, output_dir: str) -> str:
+    from utils.file_converter import copy_database as copy
+    return copy(db_path, output_dir)
+
 
 router = APIRouter(
     prefix="/upload",
@@ -16,35 +41,155 @@ router = APIRouter(
 )
 
 @router.post("/")
-async def upload_file(file: UploadFile = File(...)):
+async def upload_file(file: UploadFile = File(...), x_user_id: Optional[str] = Header(None)):
     """
     Uploads a CSV or Excel file and converts it to a SQLite database.
+    Identical files are converted once: later uploads get the existing database.
+    The returned upload_id identifies this upload's reference on the database and is
+    needed to release it. The optional X-User-Id header is recorded as the database owner.
     """
+    config = GLOBAL_CONFIG.get('uploads', {})
+    temp_file_path = None
     try:
+        ext = os.path.splitext(file.filename or "")[1].lower()
+        if ext not in ['.csv', '.xls', '.xlsx']:
+            raise ValueError(f"Unsupported file format: {ext}")
+
         # Create a temporary file to save the upload
-        # Going up from api/routers to src to backend
-        base_dir = os.path.dirname(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
-        temp_dir = os.path.join(base_dir, 'temp')
-        os.makedirs(temp_dir, exist_ok=True)
-        
-        temp_file_path = os.path.join(temp_dir, f"{uuid.uuid4()}_{file.filename}")
-        
+        os.makedirs(TEMP_DIR, exist_ok=True)
+        temp_file_path = os.path.join(TEMP_DIR, f"{uuid.uuid4()}_{file.filename}")
+
+        # Hash the content while it is written, so duplicates cost no extra pass
+        digest = hashlib.sha256()
+        chunk_size = config.get('hash_chunk_size', 1024 * 1024)
         with open(temp_file_path, "wb") as buffer:
-            shutil.copyfileobj(file.file, buffer)
+            while chunk := await file.read(chunk_size):
+                digest.update(chunk)
+                buffer.write(chunk)
+        # The extension decides how the bytes are parsed, so it is part of the key
+        content_hash = f"{digest.hexdigest()}{ext}"
             
         # Define output directory for databases
-        db_dir = os.path.join(base_dir, 'databases')
-        os.makedirs(db_dir, exist_ok=True)
-        
-        # Convert to SQLite
-        db_path = convert_to_sqlite(temp_file_path, db_dir)
-        
-        # Cleanup temp file
-        os.remove(temp_file_path)
+        os.makedirs(DB_DIR, exist_ok=True)
         
-        return {"db_path": db_path, "filename": file.filename, "message": "File converted successfully."}
+        # Convert to SQLite, unless this exact content was converted before
+        if config.get('deduplicate', True):
+            db_path, deduplicated, upload_id = upload_index.get_or_convert(
+                content_hash, lambda: convert_to_sqlite(temp_file_path, DB_DIR)
+            )
+        else:
+            db_path, deduplicated, upload_id = convert_to_sqlite(temp_file_path, DB_DIR), False, None
+        METRICS.increment("upload.deduplicated" if deduplicated else "upload.converted")
+        if deduplicated and DB_REGISTRY.resolve(db_path):
+            DB_REGISTRY.touch(db_path)
+        else:
+            DB_REGISTRY.register(db_path, owner=x_user_id, source_filename=file.filename)
+
+        message = "File already converted; reusing the existing database." if deduplicated else "File converted successfully."
+        return {
+            "db_path": db_path,
+            "upload_id": upload_id,
+            "filename": file.filename,
+            "content_hash": content_hash,
+            "deduplicated": deduplicated,
+            "message": message,
+        }
         
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"File upload failed: {str(e)}")
+    finally:
+        # Cleanup temp file
+        if temp_file_path and os.path.exists(temp_file_path):
+            os.remove(temp_file_path)
+
+
+@router.post("/append")
+async def append_file(file: UploadFile = File(...), db_path: str = Form(...), table: Optional[str] = Form(None),
+                      mode: str = Form("append"), key: Optional[str] = Form(None),
+                      upload_id: Optional[str] = Form(None)):
+    """
+    Loads the rows of a CSV or Excel file into an existing table of an uploaded database
+    ('append', or 'upsert' on `key`, by default the inferred primary key). Summary tables,
+    samples and full-text indexes are updated incrementally; cached results of the
+    database are dropped, the cached schema and SQL are kept.
+
+    A database shared by several uploads of the same file is not changed: the rows go
+    into a copy, returned as the new db_path and upload_id, and the caller's reference
+    (`upload_id`, required in that case) on the shared database is released.
+    """
+    full_path = validate_db_path(db_path)
+    temp_file_path = None
+    try:
+        ext = os.path.splitext(file.filename or "")[1].lower()
+        if ext not in ['.csv', '.xls', '.xlsx']:
+            raise ValueError(f"Unsupported file format: {ext}")
+        os.makedirs(TEMP_DIR, exist_ok=True)
+        temp_file_path = os.path.join(TEMP_DIR, f"{uuid.uuid4()}_{file.filename}")
+
+        digest = hashlib.sha256()
+        chunk_size = GLOBAL_CONFIG.get('uploads', {}).get('hash_chunk_size', 1024 * 1024)
+        with open(temp_file_path, "wb") as buffer:
+            while chunk := await file.read(chunk_size):
+                digest.update(chunk)
+                buffer.write(chunk)
+
+        # The database no longer matches the file it was converted from
+        content_hash = f"{uuid.uuid4().hex}+{digest.hexdigest()}{ext}"
+        # Blocking work (copy, load, index updates under the database's lock) runs off the event loop
+        target, copied, new_upload_id, summary = await run_in_threadpool(
+            _append, temp_file_path, full_path, content_hash, table, mode, key, upload_id
+        )
+        METRICS.increment(f"upload.{mode}")
+        return {"db_path": target, "upload_id": new_upload_id, "copied": copied, "filename": file.filename, **summary}
+
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Append failed: {str(e)}")
+    finally:
+        if temp_file_path and os.path.exists(temp_file_path):
+            os.remove(temp_file_path)
+
+
+def _append(file_path: str, db_path: str, content_hash: str, table: Optional[str], mode: str,
+            key: Optional[str], upload_id: Optional[str]):
+    """Applies an append in place or to a copy of a shared database; returns (db_path, copied, upload_id, summary)."""
+    # Held until the index is updated: no upload takes a reference on a database being changed
+    with upload_index.locked(db_path):
+        if upload_index.references(db_path) <= 1:
+            summary = append_to_sqlite(file_path, db_path, table=table, mode=mode, key=key)
+            upload_index.rekey(db_path, content_hash)
+            DB_REGISTRY.update(db_path, size_bytes=os.path.getsize(db_path))
+            return db_path, False, upload_id, summary
+
+        # The copy takes over the caller's reference: only a holder of one may change the data
+        if not upload_id or not upload_index.holds(db_path, upload_id):
+            raise ValueError("This database is shared by several uploads; pass the upload_id returned by your upload.")
+        copy_path = copy_database(db_path, os.path.dirname(db_path))
+        try:
+            summary = append_to_sqlite(file_path, copy_path, table=table, mode=mode, key=key)
+        except Exception:
+            DB_REGISTRY.remove(copy_path, delete_file=True)
+            raise
+        entry = DB_REGISTRY.get(db_path) or {}
+        DB_REGISTRY.register(copy_path, owner=entry.get("owner"), source_filename=entry.get("source_filename"))
+        new_upload_id = upload_index.register(content_hash, copy_path)
+        upload_index.release(db_path, upload_id)
+        return copy_path, True, new_upload_id, summary
+
+
+@router.delete("/")
+def release_upload(db_path: str, upload_id: str):
+    """
+    Releases the reference taken by an upload (its upload_id) on a database. Databases
+    nobody references any more are deleted once the configured grace period has passed.
+    """
+    refcount = upload_index.release(os.path.abspath(db_path), upload_id)
+    if refcount is None:
+        raise HTTPException(status_code=404, detail="No reference of this upload on the database.")
+    removed = upload_index.collect_garbage()
+    for path in removed:
+        DB_REGISTRY.remove(path)
+    return {"db_path": db_path, "references": refcount, "collected": len(removed)}
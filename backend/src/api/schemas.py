@@ -1,5 +1,5 @@
 from pydantic import BaseModel
-from typing import List, Optional
+from typing import List, Literal, Optional
 from langchain_core.messages import BaseMessage, HumanMessage, AIMessage
 
 class Message(BaseModel):
@@ -20,3 +20,36 @@ class QueryRequest(BaseModel):
     chat_history: Optional[List[Message]] = []
     provider: Optional[str] = None
     model_name: Optional[str] = None
+    # 'inline' explains in the same request, 'deferred' returns an explanation_id
+    # to poll on /query/explanations/{id}, 'none' skips the explanation LLM call
+    explain: Literal["none", "inline", "deferred"] = "inline"
+    # Answer aggregate questions from a sample of large tables, with error bounds
+    approximate: bool = False
+    # SQL candidates generated and run in parallel, the most agreed-upon result wins
+    # (default: `candidates.default` in llm_config.yaml)
+    candidates: Optional[int] = None
+
+class ExportRequest(BaseModel):
+    db_path: str
+    sql: str
+    # 'csv' or 'ndjson'; `?format=` or the Accept header take precedence
+    format: Optional[Literal["csv", "ndjson"]] = None
+
+class BatchQueryRequest(BaseModel):
+    questions: List[str]
+    db_path: str
+    provider: Optional[str] = None
+    model_name: Optional[str] = None
+    concurrency: Optional[int] = None
+    explain: Literal["none", "inline", "deferred"] = "inline"
+
+class SessionCreateRequest(BaseModel):
+    db_path: str
+    provider: Optional[str] = None
+    model_name: Optional[str] = None
+
+class SessionQueryRequest(BaseModel):
+    question: str
+    provider: Optional[str] = None
+    model_name: Optional[str] = None
+    explain: Literal["none", "inline", "deferred"] = "inline"
@@ -0,0 +1,100 @@
+import csv
+import io
+from decimal import Decimal
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence
+
+import orjson
+from fastapi import HTTPException
+from fastapi.responses import Response, StreamingResponse
+
+# Response formats, chosen by the `format` query parameter or else the Accept header
+FORMATS = {
+    "json": "application/json",                  # Rows as objects (default)
+    "columnar": "application/vnd.af.columnar+json",  # {"columns": [...], "rows": [[...], ...]}
+    "csv": "text/csv",
+    "ndjson": "application/x-ndjson",
+}
+
+
+def _default(value: Any):
+    # orjson handles str/int/float (NaN and infinities become null), dates and datetimes natively
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        return bytes(value).hex()
+    if isinstance(value, Decimal):
+        return float(value)
+    if hasattr(value, "model_dump"):
+        return value.model_dump()
+    return str(value)
+
+
+def dumps(payload: Any) -> bytes:
+    return orjson.dumps(payload, default=_default, option=orjson.OPT_NON_STR_KEYS)
+
+
+def json_response(payload: Any, media_type: str = FORMATS["json"]) -> Response:
+    """Pre-encoded JSON, bypassing FastAPI's jsonable_encoder walk over every row."""
+    return Response(content=dumps(payload), media_type=media_type)
+
+
+def negotiate(format: Optional[str], accept: Optional[str]) -> str:
+    if format:
+        if format not in FORMATS:
+            raise HTTPException(status_code=400, detail=f"Unsupported format: {format} (expected one of {', '.join(FORMATS)})")
+        return format
+    for media_range in (accept or "").split(","):
+        media_type = media_range.split(";")[0].strip()
+        for name, candidate in FORMATS.items():
+            if media_type == candidate:
+                return name
+    return "json"
+
+
+def to_columnar(result: Dict[str, Any]) -> Dict[str, Any]:
+    """Replaces the list of row objects by one list of values per row (column names sent once)."""
+    columns = result.get("columns", [])
+    columnar = {k: v for k, v in result.items() if k != "data"}
+    columnar["rows"] = [list(row.values()) for row in result.get("data", [])]
+    columnar["columns"] = columns
+    return columnar
+
+
+def csv_chunks(columns: Sequence[str], rows: Iterable[Sequence[Any]], chunk_rows: int = 1000) -> Iterator[str]:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(columns)
+    for count, row in enumerate(rows, start=1):
+        writer.writerow(["" if v is None else v.hex() if isinstance(v, bytes) else v for v in row])
+        if count % chunk_rows == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+
+def ndjson_chunks(columns: Sequence[str], rows: Iterable[Sequence[Any]], chunk_rows: int = 1000) -> Iterator[bytes]:
+    lines: List[bytes] = []
+    for row in rows:
+        lines.append(dumps(dict(zip(columns, row))))
+        if len(lines) == chunk_rows:
+            yield b"\n".join(lines) + b"\n"
+            lines = []
+    if lines:
+        yield b"\n".join(lines) + b"\n"
+
+
+def export_response(fmt: str, columns: Sequence[str], rows: Iterable[Sequence[Any]], filename: str = None) -> StreamingResponse:
+    """Streams rows as CSV or NDJSON while they are read."""
+    chunks = csv_chunks(columns, rows) if fmt == "csv" else ndjson_chunks(columns, rows)
+    headers = {"Content-Disposition": f'attachment; filename="{filename}.{fmt}"'} if filename else None
+    return StreamingResponse(chunks, media_type=FORMATS[fmt], headers=headers)
+
+
+def render_result(payload: Dict[str, Any], fmt: str) -> Response:
+    """A /query response in the negotiated format; CSV and NDJSON carry the result rows only."""
+    result = payload.get("result") or {}
+    if fmt == "columnar":
+        return json_response({**payload, "result": to_columnar(result)}, FORMATS["columnar"])
+    if fmt in ("csv", "ndjson"):
+        columns = result.get("columns", [])
+        return export_response(fmt, columns, (list(row.values()) for row in result.get("data", [])))
+    return json_response(payload)
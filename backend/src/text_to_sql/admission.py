@@ -0,0 +1,152 @@
+import math
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+from .config_loader import GLOBAL_CONFIG
+from .metrics import METRICS
+from .shared_cache import worker_count
+
+
+class AdmissionRejected(Exception):
+    """Raised when a request can't be admitted within the allowed wait; carries the delay to advertise."""
+
+    def __init__(self, scope: str, retry_after: float):
+        super().__init__(f"Rate limit reached for {scope}; retry in {math.ceil(retry_after)}s.")
+        self.scope = scope
+        self.retry_after = retry_after
+
+
+class TokenBucket:
+    """
+    Refills at `rate_per_minute`, holds at most `burst` (default: one minute's worth).
+    Reservations may drive the level negative: the caller then waits for the debt to refill,
+    which keeps admitted requests in arrival order.
+    """
+
+    def __init__(self, rate_per_minute: float, burst: float = None):
+        self.rate = rate_per_minute / 60.0
+        self.capacity = burst or rate_per_minute
+        self.level = self.capacity
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float):
+        if now > self.updated:
+            self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+            self.updated = now
+
+    def wait_time(self, amount: float, now: float) -> float:
+        """Seconds until `amount` is available."""
+        self._refill(now)
+        # A request larger than the bucket only waits for a full bucket
+        amount = min(amount, self.capacity)
+        return max(0.0, (amount - self.level) / self.rate)
+
+    def consume(self, amount: float):
+        self.level -= min(amount, self.capacity)
+
+
+class AdmissionController:
+    """
+    Admission control in front of the LLM providers: token buckets per provider
+    (requests and estimated tokens per minute) and per client (requests per minute).
+    A request that would exceed a limit waits for its turn when the wait is short and
+    the wait queue has room; otherwise it is rejected at once with a retry delay, instead
+    of reaching the provider and coming back as a 429 retried by the client libraries.
+
+    Buckets live in the process: with several workers (serve.py), each one gets an equal
+    share of every limit, so together they stay within the configured rates.
+    """
+
+    def __init__(self, config: Dict[str, Any] = None, workers: int = None):
+        self.config = config if config is not None else GLOBAL_CONFIG.get('admission', {})
+        self.workers = workers or worker_count()
+        self._provider_buckets: Dict[str, Dict[str, TokenBucket]] = {}
+        self._client_buckets: "OrderedDict[str, TokenBucket]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._waiting = 0
+
+    def _buckets_for_provider(self, provider: str) -> Dict[str, TokenBucket]:
+        if provider not in self._provider_buckets:
+            limits = self.config.get('providers', {})
+            limits = limits.get(provider, limits.get('default')) or {}
+            buckets = {}
+            if limits.get('requests_per_minute'):
+                buckets["requests"] = self._bucket(limits['requests_per_minute'], limits.get('burst_requests'))
+            if limits.get('tokens_per_minute'):
+                buckets["tokens"] = self._bucket(limits['tokens_per_minute'], limits.get('burst_tokens'))
+            self._provider_buckets[provider] = buckets
+        return self._provider_buckets[provider]
+
+    def _bucket(self, rate_per_minute: float, burst: float = None) -> TokenBucket:
+        """A bucket holding this worker's share of the limit."""
+        return TokenBucket(rate_per_minute / self.workers, burst / self.workers if burst else None)
+
+    def _bucket_for_client(self, client_id: str) -> Optional[TokenBucket]:
+        limits = self.config.get('client', {})
+        if not client_id or not limits.get('requests_per_minute'):
+            return None
+        bucket = self._client_buckets.get(client_id)
+        if bucket is None:
+            bucket = self._client_buckets[client_id] = self._bucket(limits['requests_per_minute'], limits.get('burst'))
+            while len(self._client_buckets) > self.config.get('max_clients', 10000):
+                self._client_buckets.popitem(last=False)
+        self._client_buckets.move_to_end(client_id)
+        return bucket
+
+    def admit(self, provider: str, client_id: str = None, tokens: int = 0, block: bool = False, calls: int = 1) -> float:
+        """
+        Reserves one request for `client_id`, and `calls` requests (the LLM calls the query
+        will make) plus `tokens` estimated tokens for `provider` (either may be None to skip
+        its limits). Sleeps when a short wait is needed and returns the time waited.
+        Raises AdmissionRejected when the wait would exceed `max_wait_seconds` or the
+        queue is full, unless `block` is set (batch workers, already bounded by their own
+        concurrency, wait without taking a queue place).
+        """
+        if not self.config.get('enabled', True):
+            return 0.0
+        with self._lock:
+            now = time.monotonic()
+            charges = []
+            client_bucket = self._bucket_for_client(client_id)
+            if client_bucket is not None:
+                charges.append((f"client {client_id}", client_bucket, 1))
+            provider_buckets = self._buckets_for_provider(provider) if provider else {}
+            if "requests" in provider_buckets:
+                charges.append((f"provider {provider}", provider_buckets["requests"], calls))
+            if "tokens" in provider_buckets and tokens:
+                charges.append((f"provider {provider}", provider_buckets["tokens"], tokens))
+
+            waits = [(bucket.wait_time(amount, now), scope) for scope, bucket, amount in charges]
+            wait, scope = max(waits, default=(0.0, None))
+            if wait > 0 and not block:
+                if wait > self.config.get('max_wait_seconds', 5) or self._waiting >= self.config.get('max_queue', 64):
+                    METRICS.increment("admission.rejected", label=provider or "client")
+                    raise AdmissionRejected(scope, wait)
+            for _, bucket, amount in charges:
+                bucket.consume(amount)
+            queued = wait > 0 and not block
+            if queued:
+                self._waiting += 1
+
+        if wait > 0:
+            METRICS.increment("admission.queued", label=provider or "client")
+            METRICS.increment("admission.wait_seconds", wait, label=provider or "client")
+            try:
+                time.sleep(wait)
+            finally:
+                if queued:
+                    with self._lock:
+                        self._waiting -= 1
+        return wait
+
+    def estimated_calls(self, explain_mode: str) -> int:
+        # SQL generation, plus the explanation when it runs in the request
+        return 2 if explain_mode == "inline" else 1
+
+    def estimated_tokens(self, prompt_tokens: int, calls: int = 1) -> int:
+        return calls * (prompt_tokens + self.config.get('estimated_completion_tokens', 256))
+
+
+ADMISSION = AdmissionController()
@@ -0,0 +1,254 @@
+import math
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+
+from .config_loader import GLOBAL_CONFIG
+from .metrics import METRICS
+from .schema_inspector import INTERNAL_TABLE_PREFIX
+from .sql_executor import ReadOnlyConnectionPool, execute_query_and_format
+from .sql_rewrite import AGG_CALL, IDENT, NotRewritable, parse_aggregate_query, quote, rewrite_aggregate_query
+
+SAMPLES_TABLE = f"{INTERNAL_TABLE_PREFIX}samples"
+WEIGHT_COLUMN = f"{INTERNAL_TABLE_PREFIX}weight"
+VARIANCE_PREFIX = f"{INTERNAL_TABLE_PREFIX}var_"
+
+# Rows are drawn by a multiplicative hash of their rowid, so samples are reproducible
+_HASH_BUCKETS = 1000000
+_ROW_HASH = f"((rowid * 2654435761) % 4294967296) % {_HASH_BUCKETS}"
+
+_SINGLE_AGGREGATE = re.compile(rf"{AGG_CALL.pattern}(?:\s+(?:AS\s+)?{IDENT})?\s*$", re.IGNORECASE)
+
+# Two-sided normal quantiles for the supported confidence levels
+_Z_SCORES = {0.9: 1.645, 0.95: 1.96, 0.99: 2.576}
+
+
+def build_sample(conn: sqlite3.Connection, table: str, column_types: List[Dict[str, str]],
+                 config: Dict[str, Any] = None) -> Optional[str]:
+    """
+    Creates `_af_sample_<table>`, a weighted sample of a large table. Rows are stratified
+    on its lowest-cardinality text column (every stratum keeps at least `min_per_stratum`
+    rows, so small groups stay represented); each row carries its inverse inclusion
+    probability in `_af_weight`. Returns the sample table name, or None for small tables.
+    """
+    config = config if config is not None else GLOBAL_CONFIG.get('approximate', {})
+    if not config.get('enabled', True):
+        return None
+    rows = conn.execute(f"SELECT COUNT(*) FROM {quote(table)}").fetchone()[0]
+    target = config.get('sample_rows', 100000)
+    if rows < config.get('min_rows', 1000000) or rows <= target:
+        return None
+
+    # Stratify on the text/boolean column with the fewest distinct values (estimated on a prefix)
+    strata_column = None
+    candidates = [c["name"] for c in column_types if c["logical_type"] in ("text", "boolean")]
+    if candidates:
+        distinct = ", ".join(f"COUNT(DISTINCT {quote(c)})" for c in candidates)
+        counts = conn.execute(f"SELECT {distinct} FROM (SELECT * FROM {quote(table)} LIMIT 100000)").fetchone()
+        eligible = sorted((n, c) for n, c in zip(counts, candidates) if 1 < n <= config.get('max_strata', 50))
+        strata_column = eligible[0][1] if eligible else None
+
+    if strata_column:
+        strata = conn.execute(f"SELECT {quote(strata_column)}, COUNT(*) FROM {quote(table)} GROUP BY 1").fetchall()
+    else:
+        strata = [(None, rows)]
+
+    thresholds = []
+    for value, size in strata:
+        wanted = min(size, max(config.get('min_per_stratum', 1000), round(target * size / rows)))
+        threshold = max(1, min(_HASH_BUCKETS, round(_HASH_BUCKETS * wanted / size)))
+        thresholds.append((value, threshold, _HASH_BUCKETS / threshold))
+
+    name = f"{INTERNAL_TABLE_PREFIX}sample_{table}"
+    with conn:
+        conn.execute("DROP TABLE IF EXISTS temp._af_strata")
+        conn.execute("CREATE TEMP TABLE _af_strata (value, threshold INTEGER, weight REAL)")
+        conn.execute("CREATE INDEX temp._af_strata_value ON _af_strata (value)")
+        conn.executemany("INSERT INTO temp._af_strata VALUES (?, ?, ?)", thresholds)
+        match = f"s.value IS t.{quote(strata_column)}" if strata_column else "1"
+        conn.execute(f"DROP TABLE IF EXISTS {quote(name)}")
+        # CROSS JOIN keeps the big table as the outer loop: one scan, one index probe per row
+        conn.execute(
+            f"CREATE TABLE {quote(name)} AS SELECT t.*, s.weight AS {quote(WEIGHT_COLUMN)} "
+            f"FROM {quote(table)} AS t CROSS JOIN temp._af_strata AS s ON {match} "
+            f"WHERE {_ROW_HASH.replace('rowid', 't.rowid')} < s.threshold"
+        )
+        sample_rows = conn.execute(f"SELECT COUNT(*) FROM {quote(name)}").fetchone()[0]
+        conn.execute(
+            f"CREATE TABLE IF NOT EXISTS {SAMPLES_TABLE} ("
+            "base_table TEXT PRIMARY KEY, sample_table TEXT NOT NULL, base_rows INTEGER NOT NULL, "
+            "sample_rows INTEGER NOT NULL, strata_column TEXT, created_at REAL NOT NULL)"
+        )
+        conn.execute(
+            f"INSERT OR REPLACE INTO {SAMPLES_TABLE} VALUES (?, ?, ?, ?, ?, ?)",
+            (table, name, rows, sample_rows, strata_column, time.time())
+        )
+        conn.execute("DROP TABLE temp._af_strata")
+    return name
+
+
+def refresh_sample(conn: sqlite3.Connection, table: str, since_rowid: int) -> Optional[str]:
+    """
+    Adds the rows inserted after `since_rowid` to the sample of `table`, in the caller's
+    transaction. A new row is kept under its stratum's existing threshold (recovered from
+    the stored weight), so inclusion probabilities and weights stay valid; rows of a new
+    stratum are all kept, with weight 1. Returns the sample table name, or None.
+    """
+    try:
+        row = conn.execute(f"SELECT sample_table, strata_column FROM {SAMPLES_TABLE} WHERE base_table = ?", (table,)).fetchone()
+    except sqlite3.OperationalError:
+        return None
+    if row is None:
+        return None
+    name, strata_column = row
+    value = quote(strata_column) if strata_column else "NULL"
+    conn.execute("DROP TABLE IF EXISTS temp._af_strata")
+    conn.execute(
+        f"CREATE TEMP TABLE _af_strata AS SELECT DISTINCT {value} AS value, "
+        f"CAST(ROUND({_HASH_BUCKETS} / {quote(WEIGHT_COLUMN)}) AS INTEGER) AS threshold, {quote(WEIGHT_COLUMN)} AS weight "
+        f"FROM {quote(name)}"
+    )
+    match = f"s.value IS t.{quote(strata_column)}" if strata_column else "1"
+    conn.execute(
+        f"INSERT INTO {quote(name)} SELECT t.*, COALESCE(s.weight, 1.0) "
+        f"FROM {quote(table)} AS t LEFT JOIN temp._af_strata AS s ON {match} "
+        f"WHERE t.rowid > ? AND {_ROW_HASH.replace('rowid', 't.rowid')} < COALESCE(s.threshold, {_HASH_BUCKETS})",
+        (since_rowid,)
+    )
+    conn.execute("DROP TABLE temp._af_strata")
+    conn.execute(
+        f"UPDATE {SAMPLES_TABLE} SET base_rows = (SELECT COUNT(*) FROM {quote(table)}), "
+        f"sample_rows = (SELECT COUNT(*) FROM {quote(name)}) WHERE base_table = ?", (table,)
+    )
+    return name
+
+
+def _estimators(func: str, argument: str):
+    """(estimate, variance) SQL for a weighted aggregate; Horvitz-Thompson under Poisson sampling."""
+    w = quote(WEIGHT_COLUMN)
+    if func == "COUNT" and argument in ("*", "1"):
+        return f"CAST(ROUND(COALESCE(SUM({w}), 0)) AS INTEGER)", f"SUM({w} * ({w} - 1))"
+    if func in ("MIN", "MAX"):
+        # Extremes can't be estimated from a sample
+        raise NotRewritable()
+    present = f"({argument} IS NOT NULL)"
+    if func == "COUNT":
+        return f"CAST(ROUND(COALESCE(SUM({w} * {present}), 0)) AS INTEGER)", f"SUM({w} * ({w} - 1) * {present})"
+    if func in ("SUM", "TOTAL"):
+        return f"{func}({w} * {argument})", f"SUM({w} * ({w} - 1) * {argument} * {argument})"
+    # AVG: ratio estimator, variance by linearization around the estimate m
+    m = f"(SUM({w} * {argument}) / SUM({w} * {present}))"
+    variance = (
+        f"((SUM({w} * ({w} - 1) * {argument} * {argument}) - 2 * {m} * SUM({w} * ({w} - 1) * {argument}) "
+        f"+ {m} * {m} * SUM({w} * ({w} - 1) * {present})) / (SUM({w} * {present}) * SUM({w} * {present})))"
+    )
+    return m, variance
+
+
+def rewrite_for_sample(sql: str, sample_table: str) -> Optional[str]:
+    """
+    Rewrites an aggregate query to run on a weighted sample: COUNT/SUM/AVG become
+    weighted estimates, and each select item that is a single aggregate gets a hidden
+    `_af_var_<column>` item holding the variance of its estimate.
+    """
+    def replace(func: str, argument: str) -> str:
+        return _estimators(func, argument)[0]
+
+    def variance(item: str, column: str) -> List[str]:
+        # Margins are reported for items that are a single aggregate, not for expressions of them
+        call = _SINGLE_AGGREGATE.match(item)
+        if call is None:
+            return []
+        return [f"{_estimators(call.group(1).upper(), call.group(3))[1]} AS {quote(VARIANCE_PREFIX + column)}"]
+
+    return rewrite_aggregate_query(sql, sample_table, replace, extra_items=variance)
+
+
+class ApproximateQueries:
+    """
+    Answers aggregate queries from the weighted samples built at upload (`approximate`
+    mode). Results carry an `approximation` block with the sample size and a margin of
+    error per estimated value at the configured confidence level.
+    """
+
+    def __init__(self, config: Dict[str, Any] = None):
+        self.config = config if config is not None else GLOBAL_CONFIG.get('approximate', {})
+        self._catalog: "OrderedDict[str, Dict[str, Dict[str, Any]]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def samples(self, db_path: str, pool: ReadOnlyConnectionPool = None) -> Dict[str, Dict[str, Any]]:
+        with self._lock:
+            if db_path in self._catalog:
+                self._catalog.move_to_end(db_path)
+                return self._catalog[db_path]
+        result = execute_query_and_format(f"SELECT * FROM {SAMPLES_TABLE}", db_path, pool=pool)
+        entries = {row["base_table"].lower(): row for row in result.get("data", [])}
+        with self._lock:
+            self._catalog[db_path] = entries
+            while len(self._catalog) > 256:
+                self._catalog.popitem(last=False)
+        return entries
+
+    def forget(self, db_path: str):
+        """Drops the cached sample catalog of a database whose samples changed."""
+        with self._lock:
+            self._catalog.pop(db_path, None)
+
+    def execute(self, sql: str, db_path: str, pool: ReadOnlyConnectionPool = None, deadline: float = None) -> Optional[Dict[str, Any]]:
+        """Runs an eligible aggregate query on the sample of its table; None when it must run exactly."""
+        parsed = parse_aggregate_query(sql)
+        if parsed is None or not parsed["functions"] or parsed["functions"] & {"MIN", "MAX"}:
+            return None
+        sample = self.samples(db_path, pool=pool).get(parsed["table"].lower())
+        if sample is None:
+            return None
+        rewritten = rewrite_for_sample(sql, sample["sample_table"])
+        if rewritten is None:
+            return None
+        result = execute_query_and_format(rewritten, db_path, pool=pool, deadline=deadline)
+        if "error" in result:
+            return None
+
+        confidence = self.config.get('confidence', 0.95)
+        z = _Z_SCORES.get(confidence, 1.96)
+        hidden = [c for c in result["columns"] if c.startswith(VARIANCE_PREFIX)]
+        bounds = []
+        for row in result["data"]:
+            margins = {}
+            for column in hidden:
+                variance = row.pop(column)
+                margins[column[len(VARIANCE_PREFIX):]] = None if variance is None else z * math.sqrt(max(variance, 0.0))
+            bounds.append(margins)
+        result["columns"] = [c for c in result["columns"] if c not in hidden]
+
+        METRICS.increment("approximate.queries")
+        result["approximation"] = {
+            "sample_table": sample["sample_table"],
+            "base_rows": sample["base_rows"],
+            "sample_rows": sample["sample_rows"],
+            "sample_fraction": round(sample["sample_rows"] / sample["base_rows"], 6),
+            "confidence": confidence,
+            "error_bounds": bounds,
+        }
+        return result
+
+
+def approximation_note(result: Dict[str, Any]) -> Optional[str]:
+    """Sentence for the explanation prompt when the figures are sample estimates."""
+    approximation = (result or {}).get("approximation")
+    if not approximation:
+        return None
+    margins = approximation["error_bounds"][0] if approximation["error_bounds"] else {}
+    margin_text = ", ".join(f"{column} ±{bound:,.4g}" for column, bound in margins.items() if bound is not None)
+    return (
+        f"These figures are estimates computed on a {approximation['sample_fraction']:.2%} sample of "
+        f"{approximation['base_rows']:,} rows; true values are within the margins"
+        f"{f' ({margin_text}, first row)' if margin_text else ''} with {approximation['confidence']:.0%} confidence. "
+        "Say that the figures are approximate."
+    )
+
+
+APPROXIMATE = ApproximateQueries()
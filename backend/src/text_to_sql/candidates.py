@@ -0,0 +1,76 @@
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional
+
+from .config_loader import GLOBAL_CONFIG
+from .metrics import METRICS
+from .sql_executor import ReadOnlyConnectionPool, execute_query_and_format
+from .sql_safety import SQLSecurityError, validate_sql_safety
+
+
+def result_signature(result: Dict[str, Any]) -> tuple:
+    """
+    What two candidates must share to "agree": the same rows, in any order, compared by
+    value (column names and float noise ignored).
+    """
+    def normalize(value):
+        return round(value, 6) if isinstance(value, float) else value
+
+    rows = [tuple(normalize(v) for v in row.values()) for row in result.get("data", [])]
+    return len(result.get("columns", [])), tuple(sorted(rows, key=repr))
+
+
+def select_candidate(candidates: List[str], db_path: str, pool: ReadOnlyConnectionPool = None,
+                     time_budget: float = None,
+                     execute: Callable[[str, ReadOnlyConnectionPool, float], Dict[str, Any]] = None) -> Dict[str, Any]:
+    """
+    Validates and runs SQL candidates in parallel on read-only connections, each
+    interrupted after `time_budget` seconds. Picks the result most candidates agree on
+    (ties go to the earliest candidate), else the first valid one. Returns the chosen
+    `sql` and `result`, or the `error` of the first candidate when none ran.
+
+    `execute(sql, pool, deadline)` runs one validated candidate; default: directly on the
+    database (the workflow passes its own chain: result cache, summary tables...).
+    """
+    config = GLOBAL_CONFIG.get('candidates', {})
+    time_budget = time_budget or config.get('time_budget_seconds', 5)
+    deadline = time.monotonic() + time_budget
+    execute = execute or (lambda sql, pool, deadline: execute_query_and_format(sql, db_path, pool, deadline))
+
+    outcomes: List[Optional[Dict[str, Any]]] = [None] * len(candidates)
+    runnable = []
+    for index, sql in enumerate(candidates):
+        try:
+            runnable.append((index, validate_sql_safety(sql)))
+        except SQLSecurityError as e:
+            outcomes[index] = {"error": str(e)}
+
+    own_pool = pool is None and len(runnable) > 1
+    if own_pool:
+        pool = ReadOnlyConnectionPool(db_path, size=len(runnable))
+    try:
+        with ThreadPoolExecutor(max_workers=max(1, len(runnable))) as executor:
+            futures = {index: executor.submit(execute, sql, pool, deadline) for index, sql in runnable}
+            for index, future in futures.items():
+                outcomes[index] = future.result()
+    finally:
+        if own_pool:
+            pool.close()
+
+    valid = [i for i, outcome in enumerate(outcomes) if "error" not in outcome]
+    METRICS.increment("candidates.generated", len(candidates))
+    METRICS.increment("candidates.valid", len(valid))
+    if not valid:
+        return {"sql": candidates[0], "result": None, "error": outcomes[0]["error"]}
+
+    signatures = {i: result_signature(outcomes[i]) for i in valid}
+    votes = Counter(signatures.values())
+    best_votes = max(votes.values())
+    chosen = next(i for i in valid if votes[signatures[i]] == best_votes)
+    METRICS.increment("candidates.agreement" if best_votes > 1 else "candidates.first_valid")
+
+    # A copy: the outcome may be a cached result
+    result = {**outcomes[chosen], "candidates": {"generated": len(candidates), "valid": len(valid),
+                                                 "agreeing": best_votes, "chosen": chosen}}
+    return {"sql": candidates[chosen], "result": result, "error": None}
@@ -0,0 +1,137 @@
+import difflib
+import random
+import re
+from typing import Any, Dict, List
+
+from .config_loader import GLOBAL_CONFIG
+
+# Error classes and what the workflow does about them
+SECURITY = "security"    # Stop: the query is refused
+SYNTAX = "syntax"        # Regenerate the SQL with feedback on the error
+SCHEMA = "schema"        # Regenerate, pointing at the names that exist
+TRANSIENT = "transient"  # Run the same step again after a backoff, no new LLM call
+FATAL = "fatal"          # Stop: retrying can't help
+
+# Execution stopped at its deadline (candidate time budget, execution timeout): SQLite's
+# whole message, so a table or column named "interrupted" doesn't match
+_DEADLINE_PATTERN = r"^interrupted$"
+
+# Locks and I/O errors of SQLite clear up on their own, whichever step met them
+_SQLITE_TRANSIENT = r"database is locked|database table is locked|disk I/O error"
+
+# Errors of the SQL execution. SQLite's schema and syntax messages come first: they quote
+# identifiers of the user's data, which may contain any of the words matched further down.
+_EXECUTION_PATTERNS = [
+    (SECURITY, r"Security Violation"),
+    (SCHEMA, r"no such (?:table|column)|ambiguous column name|has no column named"),
+    (SYNTAX, r"syntax error|incomplete input|unrecognized token|no such function|misuse of|"
+             r"wrong number of arguments|near \"|Safety Check Error|"
+             r"You can only execute one statement"),
+    (FATAL, r"Database file not found|file is not a database|database disk image is malformed"),
+    # A query stopped at its deadline would be stopped again if re-run: a cheaper query is
+    # generated instead
+    (SYNTAX, _DEADLINE_PATTERN),
+    (TRANSIENT, _SQLITE_TRANSIENT),
+]
+
+# Errors of the LLM call: provider configuration, HTTP statuses, overload and rate limits.
+# The SQL is never at fault here, so a timed-out call is transient.
+_GENERATION_PATTERNS = [
+    (SECURITY, r"Security Violation"),
+    (FATAL, r"API_KEY not found|Unsupported LLM provider|Please install|authentication|invalid api key|"
+            r"permission denied|\b401\b|\b403\b"),
+    (TRANSIENT, _SQLITE_TRANSIENT + r"|timed? ?out|timeout|rate limit|too many requests|\b429\b|\b50[234]\b|"
+                r"overloaded|temporarily|connection (?:error|reset|refused|aborted)"),
+]
+_COMPILED_EXECUTION = [(cls, re.compile(pattern, re.IGNORECASE)) for cls, pattern in _EXECUTION_PATTERNS]
+_COMPILED_GENERATION = [(cls, re.compile(pattern, re.IGNORECASE)) for cls, pattern in _GENERATION_PATTERNS]
+
+_DEADLINE = re.compile(_DEADLINE_PATTERN, re.IGNORECASE)
+_MISSING_NAME = re.compile(r"no such (?:table|column): ([\w.\"`\[\]]+)", re.IGNORECASE)
+# Table and column names in the schema text given to the LLM: `Table 'x':` / `  - col:` lines
+# (verbose style) or `x(col type, ...)` lines (compact style, names with other characters in "")
+_VERBOSE_TABLE = re.compile(r"^Table '([^']+)':")
+_VERBOSE_COLUMN = re.compile(r"^\s+- ([^:'\n]+):")
+_NAME = r'"(?:[^"]|"")*"|[A-Za-z_]\w*'
+_COMPACT_TABLE = re.compile(rf"^({_NAME})\((.*)\)$")
+_COMPACT_COLUMN = re.compile(rf'\s*({_NAME}|[^\s,"]+)(?:"(?:[^"]|"")*"|[^,"])*,?')
+_SAME_AS = re.compile(rf"same as ({_NAME})")
+
+
+def classify_error(error: str, generation: bool = False) -> str:
+    """
+    Maps an error message to SECURITY, SYNTAX, SCHEMA, TRANSIENT or FATAL.
+    Unrecognized execution errors are treated as SYNTAX (the SQL is at fault); unrecognized
+    generation errors (the LLM call itself failed) as FATAL.
+    """
+    for cls, pattern in _COMPILED_GENERATION if generation else _COMPILED_EXECUTION:
+        if pattern.search(error or ""):
+            return cls
+    return FATAL if generation else SYNTAX
+
+
+def _unquote_name(name: str) -> str:
+    return name[1:-1].replace('""', '"') if name.startswith('"') else name
+
+
+def schema_names(schema: str) -> List[str]:
+    """Table and column names of a schema text, in order, whatever its style (see render_schema)."""
+    names, columns = [], {}
+    for line in (schema or "").splitlines():
+        match = _VERBOSE_TABLE.match(line) or _VERBOSE_COLUMN.match(line)
+        if match:
+            names.append(match.group(1).strip())
+            continue
+        match = _COMPACT_TABLE.match(line)
+        if match:
+            table = _unquote_name(match.group(1))
+            same = _SAME_AS.fullmatch(match.group(2))
+            if same:
+                # Tables written `name(same as other)` have the other table's columns
+                columns[table] = columns.get(_unquote_name(same.group(1)), [])
+            else:
+                columns[table] = [_unquote_name(m.group(1)) for m in _COMPACT_COLUMN.finditer(match.group(2))]
+            names += [table, *columns[table]]
+    return names
+
+
+def targeted_feedback(error_class: str, error: str, sql: str, schema: str) -> str:
+    """Correction instructions for a regeneration, specific to the kind of error."""
+    if error_class == SCHEMA:
+        lines = [f"The query `{sql}` refers to a table or column that does not exist."]
+        missing = _MISSING_NAME.search(error or "")
+        if missing:
+            name = missing.group(1).strip('"`[]').split(".")[-1]
+            close = difflib.get_close_matches(name, schema_names(schema), n=3, cutoff=0.5)
+            if close:
+                lines.append(f"Instead of '{name}', did you mean: {', '.join(close)}?")
+        lines.append("Use only the tables and columns listed in the schema, quoted exactly as written.")
+        return " ".join(lines)
+    if _DEADLINE.search((error or "").strip()):
+        return (
+            f"The query `{sql}` took too long and was stopped. Rewrite it as a cheaper SQLite SELECT "
+            "statement (filter early, avoid unneeded joins and subqueries, use LIMIT)."
+        )
+    return (
+        f"The query `{sql}` is not valid SQLite. Rewrite it as a single SQLite SELECT statement "
+        "(no ILIKE, TOP, or functions SQLite lacks)."
+    )
+
+
+class RetryPolicy:
+    """Per-class retry budgets and the exponential backoff used before transient retries."""
+
+    def __init__(self, config: Dict[str, Any] = None):
+        self.config = config if config is not None else GLOBAL_CONFIG.get('retries', {})
+        max_retries = GLOBAL_CONFIG.get('settings', {}).get('max_retries', 3)
+        self.budgets = {SYNTAX: max_retries, SCHEMA: max_retries, TRANSIENT: 2, **self.config.get('budgets', {})}
+
+    def allows(self, error_class: str, failures: int) -> bool:
+        """Whether another retry fits the budget after `failures` failures of this class."""
+        return failures <= self.budgets.get(error_class, 0)
+
+    def backoff_seconds(self, attempt: int) -> float:
+        """Delay before the `attempt`-th retry (1-based), with full jitter."""
+        base = self.config.get('backoff_base_seconds', 0.2)
+        delay = min(self.config.get('backoff_max_seconds', 2.0), base * 2 ** (attempt - 1))
+        return random.uniform(0, delay) if self.config.get('jitter', True) else delay
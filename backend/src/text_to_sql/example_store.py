@@ -0,0 +1,197 @@
+import hashlib
+import heapq
+import math
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import Counter, defaultdict
+from typing import Any, Dict, List, Optional, Tuple
+
+from .config_loader import GLOBAL_CONFIG
+from .error_classifier import schema_names
+
+_BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+_WORD = re.compile(r"\w+", re.UNICODE)
+# Question words that say nothing about the SQL (English and French)
+_STOP_WORDS = frozenset(
+    "a an and are by can do does for from give how i in is it list me of on or per please show "
+    "that the there this to what which who with "
+    "au aux avec combien dans de des donne du en est et il la le les moi par pour quel quelle "
+    "quels quelles qui sont sur un une".split()
+)
+
+
+def schema_fingerprint(schema: str) -> str:
+    """
+    Identifies a schema by its table and column names only, so examples carry over to
+    every upload of the same file layout (notes and types may differ between databases).
+    """
+    names = schema_names(schema) or [schema]
+    return hashlib.sha1("\n".join(names).encode("utf-8")).hexdigest()
+
+
+def normalize_question(question: str) -> str:
+    return " ".join(_WORD.findall(question.lower()))
+
+
+def _terms(normalized: str) -> List[str]:
+    words = [w for w in normalized.split() if w not in _STOP_WORDS]
+    return words + [f"{a} {b}" for a, b in zip(words, words[1:])]
+
+
+class _TfIdfIndex:
+    """
+    TF-IDF vectors (words and word pairs) of the questions of one schema, with cosine search.
+    Weights depend on every question, so they are computed again after changes only, into
+    an inverted index: a search scores the questions sharing a term with it.
+    """
+
+    def __init__(self):
+        self.entries: Dict[str, Tuple[str, str, Counter]] = {}  # normalized -> (question, sql, term counts)
+        self.document_frequency: Counter = Counter()
+        self._postings: Optional[Dict[str, List[Tuple[str, float]]]] = None
+
+    def add(self, normalized: str, question: str, sql: str):
+        """Adds a question, or replaces the SQL of one already indexed."""
+        if normalized in self.entries:
+            self.entries[normalized] = (question, sql, self.entries[normalized][2])
+            return
+        counts = Counter(_terms(normalized))
+        self.entries[normalized] = (question, sql, counts)
+        self.document_frequency.update(counts.keys())
+        self._postings = None
+
+    def _vector(self, counts: Dict[str, float]) -> Dict[str, float]:
+        # Smoothed IDF: terms shared by every question still count a little
+        total = len(self.entries) + 1
+        vector = {t: c * (math.log(total / (1 + self.document_frequency.get(t, 0))) + 1) for t, c in counts.items()}
+        norm = math.sqrt(sum(v * v for v in vector.values())) or 1.0
+        return {t: v / norm for t, v in vector.items()}
+
+    def _build_postings(self) -> Dict[str, List[Tuple[str, float]]]:
+        postings = defaultdict(list)
+        for normalized, (_, _, counts) in self.entries.items():
+            for term, weight in self._vector(counts).items():
+                postings[term].append((normalized, weight))
+        return postings
+
+    def search(self, question: str, k: int) -> List[Tuple[float, str, str]]:
+        if self._postings is None:
+            self._postings = self._build_postings()
+        scores: Dict[str, float] = defaultdict(float)
+        for term, weight in self._vector(Counter(_terms(normalize_question(question)))).items():
+            for normalized, document_weight in self._postings.get(term, ()):
+                scores[normalized] += weight * document_weight
+        best = heapq.nlargest(k, scores.items(), key=lambda item: item[1])
+        return [(score, *self.entries[normalized][:2]) for normalized, score in best]
+
+
+class ExampleStore:
+    """
+    Question -> SQL pairs that ran successfully, keyed by schema fingerprint and kept in a
+    local SQLite file shared by the workers. Similar past questions are given to the LLM as
+    few-shot examples. A question asked before on the same schema reuses its SQL directly
+    when it was produced by the same provider and model within `exact_ttl_seconds`; as in
+    the SQL cache, the latest SQL that succeeded for a question replaces the previous one.
+    Each process keeps a TF-IDF index per schema, topped up from the file as rows arrive.
+    """
+
+    def __init__(self, path: str, config: Dict[str, Any] = None):
+        self.config = config if config is not None else GLOBAL_CONFIG.get('examples', {})
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.path = path
+        self._indexes: Dict[str, _TfIdfIndex] = defaultdict(_TfIdfIndex)
+        self._exact: Dict[Tuple[str, str], Tuple[str, str, str, float]] = {}
+        self._loaded_id = 0
+        self._lock = threading.Lock()
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS examples ("
+                "id INTEGER PRIMARY KEY AUTOINCREMENT, fingerprint TEXT NOT NULL, question TEXT NOT NULL, "
+                "normalized TEXT NOT NULL, sql TEXT NOT NULL, created_at REAL NOT NULL, "
+                "provider TEXT, model_name TEXT, "
+                "UNIQUE (fingerprint, normalized))"
+            )
+            # Files created before examples recorded their provider and model
+            columns = {row[1] for row in conn.execute("PRAGMA table_info(examples)")}
+            for column in ("provider", "model_name"):
+                if column not in columns:
+                    conn.execute(f"ALTER TABLE examples ADD COLUMN {column} TEXT")
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(self.path, timeout=5)
+
+    def _refresh(self):
+        """Loads rows added or replaced since the last call (by this or another worker)."""
+        with self._lock:
+            with self._connect() as conn:
+                rows = conn.execute(
+                    "SELECT id, fingerprint, question, normalized, sql, provider, model_name, created_at "
+                    "FROM examples WHERE id > ? ORDER BY id", (self._loaded_id,)
+                ).fetchall()
+            for row_id, fingerprint, question, normalized, sql, provider, model_name, created_at in rows:
+                self._indexes[fingerprint].add(normalized, question, sql)
+                self._exact[(fingerprint, normalized)] = (sql, provider, model_name, created_at)
+                self._loaded_id = row_id
+
+    def add(self, fingerprint: str, question: str, sql: str, provider: str = None, model_name: str = None):
+        normalized = normalize_question(question)
+        if not normalized:
+            return
+        ttl = self.config.get('exact_ttl_seconds', 86400)
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT sql, provider, model_name, created_at FROM examples WHERE fingerprint = ? AND normalized = ?",
+                (fingerprint, normalized)
+            ).fetchone()
+            if row is None:
+                count = conn.execute("SELECT COUNT(*) FROM examples WHERE fingerprint = ?", (fingerprint,)).fetchone()[0]
+                if count >= self.config.get('max_per_schema', 5000):
+                    return
+            elif tuple(row[:3]) == (sql, provider, model_name) and time.time() - row[3] < ttl / 2:
+                # Same answer, still fresh: nothing for the other workers to reload
+                return
+            # The latest success replaces the question's SQL; the new row id lets every worker reload it
+            conn.execute(
+                "INSERT OR REPLACE INTO examples (fingerprint, question, normalized, sql, created_at, provider, model_name) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (fingerprint, question.strip(), normalized, sql, time.time(), provider, model_name)
+            )
+
+    def exact(self, fingerprint: str, question: str, provider: str = None, model_name: str = None) -> Optional[str]:
+        """The SQL of the same question on this schema, if the same provider and model produced it recently."""
+        self._refresh()
+        known = self._exact.get((fingerprint, normalize_question(question)))
+        if known is None:
+            return None
+        sql, known_provider, known_model, created_at = known
+        if (known_provider, known_model) != (provider, model_name):
+            return None
+        if time.time() - created_at > self.config.get('exact_ttl_seconds', 86400):
+            return None
+        return sql
+
+    def similar(self, fingerprint: str, question: str, k: int = None) -> List[Dict[str, Any]]:
+        """The `k` most similar past questions on this schema, above `min_similarity`."""
+        self._refresh()
+        index = self._indexes.get(fingerprint)
+        if index is None:
+            return []
+        k = k or self.config.get('top_k', 3)
+        with self._lock:
+            matches = index.search(question, k)
+        threshold = self.config.get('min_similarity', 0.3)
+        return [{"question": q, "sql": sql, "score": round(score, 3)} for score, q, sql in matches if score >= threshold]
+
+
+def build_example_store() -> ExampleStore:
+    config = GLOBAL_CONFIG.get('examples', {})
+    path = config.get('sqlite_path') or os.path.join(_BACKEND_DIR, 'state', 'examples.db')
+    return ExampleStore(path, config)
+
+
+EXAMPLES = build_example_store()
@@ -0,0 +1,50 @@
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional
+
+from .config_loader import GLOBAL_CONFIG
+from .shared_cache import build_cache
+
+
+class ExplanationJobs:
+    """
+    Computes result explanations in the background for `explain: deferred` queries.
+    Job states live in a bounded cache until fetched or expired; with shared state
+    (multi-worker mode) any worker can answer the poll, whichever one runs the job.
+    """
+
+    def __init__(self, max_workers: int = None, max_jobs: int = None, ttl_seconds: int = None):
+        config = GLOBAL_CONFIG.get('explanations', {})
+        self.max_jobs = max_jobs or config.get('max_jobs', 1000)
+        self.ttl_seconds = ttl_seconds or config.get('ttl_seconds', 900)
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers or config.get('max_workers', 4),
+            thread_name_prefix="explain"
+        )
+        self._jobs = build_cache("explanations", max_entries=self.max_jobs, ttl_seconds=self.ttl_seconds)
+
+    def submit(self, fn: Callable[..., str], *args, **kwargs) -> str:
+        job_id = uuid.uuid4().hex
+        self._jobs.set(job_id, {"status": "pending", "explanation": None, "error": None, "created_at": time.time()})
+        self._executor.submit(self._run, job_id, fn, *args, **kwargs)
+        return job_id
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        job = self._jobs.get(job_id)
+        if job is None:
+            return None
+        return {"explanation_id": job_id, **job}
+
+    def _run(self, job_id: str, fn: Callable[..., str], *args, **kwargs):
+        try:
+            explanation, error, status = fn(*args, **kwargs), None, "done"
+        except Exception as e:
+            explanation, error, status = None, str(e), "error"
+        job = self._jobs.get(job_id)
+        if job is not None:
+            job.update(status=status, explanation=explanation, error=error)
+            # Expiry still counts from submission
+            remaining = self.ttl_seconds - (time.time() - job["created_at"])
+            if remaining > 0:
+                self._jobs.set(job_id, job, ttl_seconds=remaining)
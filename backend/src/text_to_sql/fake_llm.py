@@ -0,0 +1,103 @@
+import random
+import re
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage, SystemMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+
+# First table of the schema, verbose (`Table 'x':`) or compact (`x(...)`) style
+_TABLE_PATTERN = re.compile(r"Table '([^']+)'|^([A-Za-z_]\w*)\(", re.MULTILINE)
+
+
+class FakeSQLChatModel(BaseChatModel):
+    """
+    Deterministic offline stand-in for a chat provider, used by tests and benchmarks.
+
+    SQL prompts (a system message with the schema, then the question) are answered from
+    `canned_sql`, a list of {pattern, sql} rules matched against the question; `{table}`
+    in the SQL is replaced with the first table of the schema. Other prompts
+    (explanations, summaries) get `canned_answer`. Each call sleeps for a latency
+    drawn from a seeded distribution.
+    """
+
+    canned_sql: List[Dict[str, str]] = []
+    default_sql: str = "SELECT * FROM [{table}] LIMIT 5"
+    canned_answer: str = "The data shows the requested values."
+    latency: Dict[str, Any] = {}
+    seed: int = 42
+    model_name: str = "fake-sql"
+
+    _rng: Any = None
+    _rng_lock: Any = None
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self._rng = random.Random(self.seed)
+        self._rng_lock = threading.Lock()
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake-sql"
+
+    @property
+    def _identifying_params(self) -> Dict[str, Any]:
+        return {"model_name": self.model_name, "seed": self.seed}
+
+    def sample_latency(self) -> float:
+        """Returns a latency in seconds drawn from the configured distribution."""
+        distribution = self.latency.get('distribution', 'constant')
+        mean = self.latency.get('mean_ms', 0) / 1000
+        spread = self.latency.get('stddev_ms', 0) / 1000
+
+        with self._rng_lock:
+            if distribution == 'uniform':
+                value = self._rng.uniform(self.latency.get('min_ms', 0) / 1000, self.latency.get('max_ms', 0) / 1000)
+            elif distribution == 'normal':
+                value = self._rng.gauss(mean, spread)
+            elif distribution == 'lognormal':
+                # mean_ms is the median; sigma controls the tail
+                value = mean * self._rng.lognormvariate(0, self.latency.get('sigma', 0.5))
+            else:
+                value = mean
+
+        if 'max_ms' in self.latency and distribution != 'uniform':
+            value = min(value, self.latency['max_ms'] / 1000)
+        return max(0.0, value)
+
+    def respond(self, messages: List[BaseMessage]) -> str:
+        # SQL prompts are a system message holding the schema, followed by the question.
+        # Explanation prompts also have a system message and a human turn, but no schema;
+        # summaries have no system message.
+        questions = [m.content for m in messages if isinstance(m, HumanMessage)]
+        if not questions or not isinstance(messages[0], SystemMessage):
+            return self.canned_answer
+        match = _TABLE_PATTERN.search(str(messages[0].content))
+        if match is None:
+            return self.canned_answer
+        table = match.group(1) or match.group(2)
+
+        # The question is the last human turn that is not retry feedback
+        question = next((q for q in reversed(questions) if not q.startswith("PREVIOUS ERROR")), questions[-1])
+        for rule in self.canned_sql:
+            if re.search(rule.get('pattern', ''), question, re.IGNORECASE):
+                return rule['sql'].replace("{table}", table)
+        return self.default_sql.replace("{table}", table)
+
+    def _generate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                  run_manager=None, **kwargs: Any) -> ChatResult:
+        delay = self.sample_latency()
+        if delay:
+            time.sleep(delay)
+
+        content = self.respond(messages)
+        input_tokens = sum(len(str(m.content)) for m in messages) // 4
+        output_tokens = len(content) // 4
+        message = AIMessage(content=content, usage_metadata={
+            "input_tokens": input_tokens,
+            "output_tokens": output_tokens,
+            "total_tokens": input_tokens + output_tokens,
+        })
+        return ChatResult(generations=[ChatGeneration(message=message)])
@@ -0,0 +1,190 @@
+import json
+import re
+import sqlite3
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+
+from .config_loader import GLOBAL_CONFIG
+from .metrics import METRICS
+from .schema_inspector import INTERNAL_TABLE_PREFIX
+from .sql_executor import ReadOnlyConnectionPool, execute_query_and_format
+from .sql_rewrite import FROM_CLAUSE, IDENT, quote, unquote
+
+FULLTEXT_TABLE = f"{INTERNAL_TABLE_PREFIX}fulltext"
+
+# The trigram tokenizer indexes every 3-character substring, so shorter patterns can't use it
+MIN_PATTERN_LENGTH = 3
+
+# `col LIKE '%text%'`, optionally table-qualified or wrapped in LOWER()/UPPER(); text without wildcards
+_CONTAINS = re.compile(
+    rf"(?<![\w.`\]\"])(?P<not>NOT\s+)?"
+    rf"(?:(?P<fn>LOWER|UPPER)\s*\(\s*)?(?P<column>(?:{IDENT}\s*\.\s*)?{IDENT})(?(fn)\s*\))"
+    rf"\s+(?P<negated>NOT\s+)?LIKE\s+'%(?P<text>(?:[^'%_]|'')+)%'(?!\s*ESCAPE\b)",
+    re.IGNORECASE
+)
+_UNSUPPORTED = re.compile(r"\b(?:JOIN|UNION|INTERSECT|EXCEPT|WITH)\b|\(\s*SELECT\b", re.IGNORECASE)
+_ROWID_ALIASES = {"rowid", "oid", "_rowid_"}
+
+
+def rewrite_contains(sql: str, fts_table: str, table: str, columns: List[str]) -> Optional[str]:
+    """
+    Rewrites the `LIKE '%text%'` predicates of a single-table query on indexed `columns`
+    into rowid lookups in `fts_table`. The trigram index matches substrings without
+    regard to case, like LIKE does; NOT LIKE and patterns with inner wildcards or
+    fewer than 3 characters are left alone. Returns None when nothing was rewritten.
+    """
+    sql = sql.strip().rstrip(";")
+    if _UNSUPPORTED.search(sql) or len(re.findall(r"\bFROM\b", sql, re.IGNORECASE)) != 1:
+        return None
+    from_clause = FROM_CLAUSE.search(sql)
+    if from_clause is None or unquote(from_clause.group("table")).lower() != table.lower():
+        return None
+    indexed = {c.lower(): c for c in columns}
+    rewritten = []
+
+    def replace(match: re.Match) -> str:
+        column = indexed.get(unquote(re.split(r"\s*\.\s*", match.group("column"))[-1]).lower())
+        text = match.group("text").replace("''", "'")
+        if match.group("not") or match.group("negated") or column is None or len(text) < MIN_PATTERN_LENGTH:
+            return match.group(0)
+        query = '"' + column.replace('"', '""') + '" : "' + text.replace('"', '""') + '"'
+        rewritten.append(column)
+        literal = "'" + query.replace("'", "''") + "'"
+        return f"rowid IN (SELECT rowid FROM {quote(fts_table)} WHERE {quote(fts_table)} MATCH {literal})"
+
+    where = re.search(r"\bWHERE\b", sql, re.IGNORECASE)
+    if where is None:
+        return None
+    sql = sql[:where.end()] + _CONTAINS.sub(replace, sql[where.end():])
+    return sql if rewritten else None
+
+
+class FullTextSearch:
+    """
+    FTS5 trigram indexes (`_af_fts_<table>`) over the high-cardinality text columns of
+    uploaded tables, so "name contains X" questions don't scan the whole table. The
+    indexes are external-content tables: they store the index only, not a copy of the
+    text. Eligible `LIKE '%...%'` predicates are rewritten into index lookups; anything
+    SQLite rejects runs unchanged.
+    """
+
+    def __init__(self, config: Dict[str, Any] = None):
+        self.config = config if config is not None else GLOBAL_CONFIG.get('fulltext', {})
+        self._catalog: "OrderedDict[str, Dict[str, Dict[str, Any]]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return self.config.get('enabled', True)
+
+    # --- Building ---
+
+    def build_at_upload(self, conn: sqlite3.Connection, table: str, column_types: List[Dict[str, str]]) -> Optional[str]:
+        """Indexes the text columns of `table` whose values are mostly distinct; returns the index name, if built."""
+        if not self.enabled or not self.config.get('build_at_upload', True):
+            return None
+        if any(c["name"].lower() in _ROWID_ALIASES for c in column_types):
+            return None  # `rowid` would not name the row id in rewritten queries
+        rows = conn.execute(f"SELECT COUNT(*) FROM {quote(table)}").fetchone()[0]
+        if rows < self.config.get('min_rows', 10000):
+            return None
+
+        candidates = [c["name"] for c in column_types if c["logical_type"] == "text"]
+        if not candidates:
+            return None
+        # Cardinality and length estimated on a prefix of the table
+        sample = self.config.get('cardinality_sample', 100000)
+        stats = ", ".join(f"COUNT(DISTINCT {quote(c)}), AVG(LENGTH({quote(c)}))" for c in candidates)
+        values = conn.execute(f"SELECT COUNT(*), {stats} FROM (SELECT * FROM {quote(table)} LIMIT {int(sample)})").fetchone()
+        sampled, values = values[0], values[1:]
+        columns = [
+            c for c, distinct, length in zip(candidates, values[0::2], values[1::2])
+            if distinct >= sampled * self.config.get('min_distinct_ratio', 0.2)
+            and (length or 0) >= self.config.get('min_average_length', 4)
+        ][:self.config.get('max_columns', 4)]
+        if not columns:
+            return None
+
+        name = f"{INTERNAL_TABLE_PREFIX}fts_{table}"
+        definition = ", ".join(quote(c) for c in columns)
+        content = table.replace("'", "''")
+        try:
+            with conn:
+                conn.execute(f"DROP TABLE IF EXISTS {quote(name)}")
+                conn.execute(
+                    f"CREATE VIRTUAL TABLE {quote(name)} USING fts5({definition}, "
+                    f"content='{content}', content_rowid='rowid', tokenize='trigram')"
+                )
+                conn.execute(f"INSERT INTO {quote(name)} ({quote(name)}) VALUES ('rebuild')")
+                conn.execute(
+                    f"CREATE TABLE IF NOT EXISTS {FULLTEXT_TABLE} ("
+                    "name TEXT PRIMARY KEY, base_table TEXT NOT NULL, columns TEXT NOT NULL)"
+                )
+                conn.execute(f"INSERT OR REPLACE INTO {FULLTEXT_TABLE} VALUES (?, ?, ?)", (name, table, json.dumps(columns)))
+        except sqlite3.OperationalError as e:
+            # SQLite builds without FTS5 or the trigram tokenizer (< 3.34): queries keep scanning
+            print(f"Full-text index skipped for {table}: {e}")
+            return None
+        return name
+
+    def refresh(self, conn: sqlite3.Connection, table: str, since_rowid: int = None) -> Optional[str]:
+        """
+        Indexes the rows of `table` added after `since_rowid`, in the caller's transaction;
+        without it (rows changed in place), rebuilds the index. Returns the index name, or None.
+        """
+        try:
+            row = conn.execute(f"SELECT name, columns FROM {FULLTEXT_TABLE} WHERE base_table = ?", (table,)).fetchone()
+        except sqlite3.OperationalError:
+            return None
+        if row is None:
+            return None
+        name, columns = row[0], ", ".join(quote(c) for c in json.loads(row[1]))
+        if since_rowid is None:
+            conn.execute(f"INSERT INTO {quote(name)} ({quote(name)}) VALUES ('rebuild')")
+        else:
+            conn.execute(
+                f"INSERT INTO {quote(name)} (rowid, {columns}) SELECT rowid, {columns} FROM {quote(table)} WHERE rowid > ?",
+                (since_rowid,)
+            )
+        return name
+
+    def forget(self, db_path: str):
+        with self._lock:
+            self._catalog.pop(db_path, None)
+
+    # --- Query path ---
+
+    def catalog(self, db_path: str, pool: ReadOnlyConnectionPool = None) -> Dict[str, Dict[str, Any]]:
+        with self._lock:
+            if db_path in self._catalog:
+                self._catalog.move_to_end(db_path)
+                return self._catalog[db_path]
+        result = execute_query_and_format(f"SELECT name, base_table, columns FROM {FULLTEXT_TABLE}", db_path, pool=pool)
+        entries = {row["base_table"].lower(): dict(row, columns=json.loads(row["columns"])) for row in result.get("data", [])}
+        with self._lock:
+            self._catalog[db_path] = entries
+            while len(self._catalog) > self.config.get('catalog_size', 256):
+                self._catalog.popitem(last=False)
+        return entries
+
+    def try_execute(self, sql: str, db_path: str, pool: ReadOnlyConnectionPool = None, deadline: float = None) -> Optional[Dict[str, Any]]:
+        """Runs `sql` with its substring filters answered by a full-text index; None when none applies."""
+        if not self.enabled or not re.search(r"\bLIKE\b", sql, re.IGNORECASE):
+            return None
+        from_clause = FROM_CLAUSE.search(sql)
+        index = self.catalog(db_path, pool=pool).get(unquote(from_clause.group("table")).lower()) if from_clause else None
+        if index is None:
+            return None
+        rewritten = rewrite_contains(sql, index["name"], index["base_table"], index["columns"])
+        if rewritten is None:
+            return None
+        result = execute_query_and_format(rewritten, db_path, pool=pool, deadline=deadline)
+        if "error" in result:
+            return None
+        METRICS.increment("fulltext.rewrites")
+        result["fulltext"] = index["name"]
+        return result
+
+
+FULLTEXT = FullTextSearch()
@@ -0,0 +1,191 @@
+import hashlib
+import re
+from collections import OrderedDict
+from typing import Callable, List, Optional
+
+from langchain_core.messages import BaseMessage, AIMessage, HumanMessage
+from .config_loader import GLOBAL_CONFIG
+from .llm_provider import LLMProvider
+
+# Lines that look like tabular results (markdown tables, JSON rows, TSV dumps)
+_TABLE_LINE = re.compile(r'^\s*(\|.*\||[\[{].*[\]}],?|([^\t]*\t){2,}.*)\s*$')
+
+_tokenizers = {}
+
+# Assistant turn answering the summary of older messages
+_SUMMARY_ACK = "Noted."
+
+
+def count_tokens(text: str, provider: str = None) -> int:
+    """
+    Estimates the number of tokens in `text` for the given provider.
+    Uses tiktoken for OpenAI when it is installed, otherwise a chars-per-token ratio.
+    """
+    if not text:
+        return 0
+
+    provider = provider or LLMProvider.active_provider()
+
+    if provider == 'openai':
+        if provider not in _tokenizers:
+            try:
+                import tiktoken
+                model = GLOBAL_CONFIG.get('providers', {}).get('openai', {}).get('model_name', 'gpt-4o')
+                _tokenizers[provider] = tiktoken.encoding_for_model(model)
+            except Exception:
+                # tiktoken missing or encoding files unavailable offline
+                _tokenizers[provider] = None
+        encoder = _tokenizers[provider]
+        if encoder is not None:
+            return len(encoder.encode(text))
+
+    ratios = GLOBAL_CONFIG.get('history', {}).get('chars_per_token', {})
+    ratio = ratios.get(provider, ratios.get('default', 4))
+    return max(1, int(len(text) / ratio + 0.5))
+
+
+class HistoryManager:
+    """
+    Keeps the chat history sent to the LLM within a token budget.
+
+    The last `keep_last_turns` exchanges are kept verbatim (minus bulky tabular
+    content), older messages are folded into a single summary exchange. Summaries
+    are cached by conversation prefix so a growing conversation only summarizes
+    the newly aged-out messages.
+    """
+
+    def __init__(self, config: dict = None):
+        config = config if config is not None else GLOBAL_CONFIG.get('history', {})
+        self.keep_last_turns = config.get('keep_last_turns', 4)
+        self.token_budget = config.get('token_budget', 1500)
+        self.summary_mode = config.get('summary_mode', 'extractive')
+        self.max_message_chars = config.get('max_message_chars', 600)
+        self.summary_prompt = GLOBAL_CONFIG.get('prompts', {}).get('summary_prompt') or (
+            "Summarize the following conversation between a user and a data assistant "
+            "in a few sentences. Keep table names, column names, filters and SQL logic.\n\n"
+            "{conversation}"
+        )
+        self._cache_size = config.get('summary_cache_size', 256)
+        self._summary_cache: "OrderedDict[str, str]" = OrderedDict()
+
+    def strip_bulky_content(self, message: BaseMessage) -> BaseMessage:
+        """Drops tabular result dumps from assistant messages and caps their length."""
+        if not isinstance(message, AIMessage) or not isinstance(message.content, str):
+            return message
+
+        lines = [line for line in message.content.splitlines() if not _TABLE_LINE.match(line)]
+        content = "\n".join(lines).strip()
+        if len(content) > self.max_message_chars:
+            content = content[:self.max_message_chars].rstrip() + " [...]"
+        if content == message.content:
+            return message
+        return AIMessage(content=content)
+
+    def compact(self, messages: List[BaseMessage], provider: str = None,
+                summarizer: Optional[Callable[[str], str]] = None) -> List[BaseMessage]:
+        """
+        Returns a history that fits in the token budget.
+
+        Args:
+            messages: Full chat history, oldest first.
+            provider: Provider used for token counting.
+            summarizer: Callable turning a conversation transcript into a summary.
+                        Only used when `summary_mode` is 'llm'.
+        """
+        if not messages:
+            return []
+
+        messages = [self.strip_bulky_content(m) for m in messages]
+        split = max(0, len(messages) - self.keep_last_turns * 2)
+        older, recent = messages[:split], messages[split:]
+
+        # Age out recent messages until the verbatim part fits in the budget
+        recent_tokens = [count_tokens(m.content, provider) for m in recent]
+        while len(recent) > 1 and sum(recent_tokens) > self.token_budget:
+            older.append(recent.pop(0))
+            recent_tokens.pop(0)
+        # The summary exchange ends on an assistant turn: the kept turns start on a user turn
+        while older and recent and not isinstance(recent[0], HumanMessage):
+            older.append(recent.pop(0))
+            recent_tokens.pop(0)
+
+        compacted = []
+        if older:
+            prefix = "Summary of the earlier conversation: "
+            summary = self._summarize(older, summarizer)
+            summary_budget = (self.token_budget - sum(recent_tokens) - count_tokens(prefix, provider)
+                              - count_tokens(_SUMMARY_ACK, provider))
+            summary = self._truncate(summary, summary_budget, provider)
+            if summary:
+                # A user/assistant exchange, not a system message: several providers reject
+                # or ignore system messages that don't come first
+                compacted += [HumanMessage(content=prefix + summary), AIMessage(content=_SUMMARY_ACK)]
+
+        if recent and sum(recent_tokens) > self.token_budget:
+            # A single message larger than the budget
+            last = recent[-1]
+            recent[-1] = type(last)(content=self._truncate(last.content, self.token_budget, provider))
+
+        return compacted + recent
+
+    def _summarize(self, older: List[BaseMessage], summarizer: Optional[Callable[[str], str]]) -> str:
+        # Cumulative prefix hashes so we can resume from the longest summarized prefix
+        hasher = hashlib.sha1(self.summary_mode.encode())
+        prefix_keys = []
+        for message in older:
+            hasher.update(f"{message.type}:{message.content}\x00".encode("utf-8", "replace"))
+            prefix_keys.append(hasher.hexdigest())
+
+        start, previous = 0, ""
+        for i in range(len(prefix_keys) - 1, -1, -1):
+            if prefix_keys[i] in self._summary_cache:
+                self._summary_cache.move_to_end(prefix_keys[i])
+                start, previous = i + 1, self._summary_cache[prefix_keys[i]]
+                break
+
+        if start == len(older):
+            return previous
+
+        pending = older[start:]
+        if self.summary_mode == 'llm' and summarizer is not None:
+            transcript = "\n".join(f"{m.type}: {m.content}" for m in pending)
+            if previous:
+                transcript = f"Earlier summary: {previous}\n{transcript}"
+            try:
+                summary = summarizer(self.summary_prompt.format(conversation=transcript)).strip()
+            except Exception as e:
+                print(f"History summarization failed, falling back to extractive: {e}")
+                summary = self._extractive_summary(pending, previous)
+        else:
+            summary = self._extractive_summary(pending, previous)
+
+        self._summary_cache[prefix_keys[-1]] = summary
+        while len(self._summary_cache) > self._cache_size:
+            self._summary_cache.popitem(last=False)
+        return summary
+
+    @staticmethod
+    def _extractive_summary(messages: List[BaseMessage], previous: str = "") -> str:
+        """Keeps the user questions and the SQL that answered them, without an LLM call."""
+        parts = [previous] if previous else []
+        for message in messages:
+            content = message.content if isinstance(message.content, str) else str(message.content)
+            if isinstance(message, HumanMessage):
+                parts.append(f"User asked: {content.strip()}")
+            else:
+                sql_lines = [line.strip() for line in content.splitlines() if line.strip().upper().startswith("SQL:")]
+                if sql_lines:
+                    parts.append(f"Assistant ran {sql_lines[-1]}")
+        return " | ".join(parts)
+
+    @staticmethod
+    def _truncate(text: str, budget: int, provider: str = None) -> str:
+        if budget <= 0:
+            return ""
+        tokens = count_tokens(text, provider)
+        if tokens <= budget:
+            return text
+        # Leave room for the truncation marker
+        keep = max(0, int(len(text) * (budget - 2) / tokens))
+        # Keep the tail: the most recent part of a summary or message is the most relevant
+        return "[...] " + text[len(text) - keep:].lstrip()
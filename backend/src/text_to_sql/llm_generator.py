@@ -1,17 +1,20 @@
 from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
 from langchain_core.output_parsers import StrOutputParser
-from langchain_core.messages import BaseMessage
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage
 from typing import List, Dict, Any
+import hashlib
 import re
 import json
+from concurrent.futures import ThreadPoolExecutor
 from .config_loader import GLOBAL_CONFIG
 from .llm_provider import LLMProvider
+from .history_manager import HistoryManager
+from .metrics import METRICS
 
 class LLMGenerator:
     def __init__(self):
-        # Default LLM and chain setup
-        llm_provider = LLMProvider()
-        self.default_llm = llm_provider.get_llm()
+        # The default LLM is created on first use, so a missing API key doesn't break startup
+        self._default_llm = None
 
         # Load prompts from config or use default
         self.system_prompt_template = GLOBAL_CONFIG.get('prompts', {}).get('system_prompt')
@@ -25,7 +28,7 @@ class LLMGenerator:
                 "3. Always limit your results to 100 rows if no limit is specified.\n"
                 "4. Return ONLY the SQL query, no markdown, no explanations.\n"
                 "5. Use standard SQLite syntax.\n\n"
-                "Schema:\n{schema}\n{correction_instruction}"
+                "Schema:\n{schema}"
             )
 
         self.answer_prompt_template = GLOBAL_CONFIG.get('prompts', {}).get('answer_prompt')
@@ -37,10 +40,33 @@ class LLMGenerator:
                 "Provide a concise natural language answer based on the data."
             )
 
-        self.default_chain = self._build_chain(self.default_llm, self.system_prompt_template, ["chat_history", "question", "schema", "correction_instruction"])
-    
-    def _build_chain(self, llm, template, input_variables):
+        self.history_manager = HistoryManager()
+
+        self.prompt_cache = GLOBAL_CONFIG.get('prompt_cache', {})
+
+        # Static instructions + schema come first so providers can cache the prefix;
+        # history, question and retry feedback follow.
+        self.query_prompt = self._build_prompt(self.system_prompt_template, ["examples", "chat_history", "question", "schema", "feedback"])
+
+    @property
+    def default_llm(self):
+        if self._default_llm is None:
+            self._default_llm = LLMProvider.get_llm()
+        return self._default_llm
+
+    @default_llm.setter
+    def default_llm(self, llm):
+        self._default_llm = llm
+
+    @property
+    def default_chain(self):
+        return self.query_prompt | self.default_llm | StrOutputParser()
+
+    def _build_prompt(self, template, input_variables):
         messages = [("system", template)]
+        if "examples" in input_variables:
+             # Past question/SQL pairs on the same schema, after the cacheable system prefix
+             messages.append(MessagesPlaceholder(variable_name="examples", optional=True))
         if "chat_history" in input_variables:
              messages.append(MessagesPlaceholder(variable_name="chat_history"))
         
@@ -48,9 +74,46 @@ class LLMGenerator:
         # The prompt template might not verify all vars, but we construct the chat prompt here
         if "question" in input_variables:
              messages.append(("human", "{question}"))
-             
-        prompt = ChatPromptTemplate.from_messages(messages)
-        return prompt | llm | StrOutputParser()
+
+        if "feedback" in input_variables:
+             messages.append(MessagesPlaceholder(variable_name="feedback", optional=True))
+
+        return ChatPromptTemplate.from_messages(messages)
+
+    def _build_chain(self, llm, template, input_variables):
+        return self._build_prompt(template, input_variables) | llm | StrOutputParser()
+
+    def _get_llm(self, provider: str = None, model_name: str = None):
+        if not provider and not model_name:
+            return self.default_llm
+        return LLMProvider.get_llm(provider=provider, model_name=model_name)
+
+    def _cache_hints(self, provider: str, schema: str) -> Dict[str, Any]:
+        """
+        Provider-specific invocation kwargs that help prompt-prefix caching.
+        Groq and Gemini cache identical prefixes implicitly; OpenAI additionally
+        routes on `prompt_cache_key`, so requests sharing a schema land on the same cache.
+        """
+        if not self.prompt_cache.get('enabled', True):
+            return {}
+        provider = provider or LLMProvider.active_provider()
+        if provider == 'openai':
+            prefix = self.system_prompt_template + schema
+            return {"prompt_cache_key": "sql-" + hashlib.sha1(prefix.encode("utf-8")).hexdigest()[:16]}
+        return {}
+
+    @staticmethod
+    def _record_usage(response, provider: str = None):
+        """Tracks prompt, cached-prompt and completion tokens reported by the provider."""
+        provider = provider or LLMProvider.active_provider()
+        usage = getattr(response, "usage_metadata", None) or {}
+        cached = (usage.get("input_token_details") or {}).get("cache_read") or 0
+
+        METRICS.increment("llm.calls", label=provider)
+        METRICS.increment("llm.prompt_tokens", usage.get("input_tokens", 0), label=provider)
+        METRICS.increment("llm.cached_prompt_tokens", cached, label=provider)
+        METRICS.increment("llm.completion_tokens", usage.get("output_tokens", 0), label=provider)
+        return cached
 
     def _get_chain(self, provider: str = None, model_name: str = None, prompt_type: str = "query"):
         if not provider and not model_name:
@@ -63,7 +126,7 @@ class LLMGenerator:
         # Dynamic creation
         llm = LLMProvider.get_llm(provider=provider, model_name=model_name)
         if prompt_type == "query":
-            return self._build_chain(llm, self.system_prompt_template, ["chat_history", "question", "schema", "correction_instruction"])
+            return self.query_prompt | llm | StrOutputParser()
         else:
             return self._build_chain(llm, self.answer_prompt_template, ["question", "data_preview", "sql"])
 
@@ -87,39 +150,126 @@ class LLMGenerator:
         
         return sql
 
-    def generate_query(self, question: str, schema: str, chat_history: List[BaseMessage] = None, error: str = "", provider: str = None, model_name: str = None) -> str:
+    def generate_query(self, question: str, schema: str, chat_history: List[BaseMessage] = None, error: str = "", provider: str = None, model_name: str = None, correction: str = None, examples: List[Dict[str, Any]] = None) -> str:
         if chat_history is None:
             chat_history = []
-            
-        correction_instruction = ""
-        if error:
-            correction_instruction = f"\n\nPREVIOUS ERROR: {error}\nCORRECTION: Please fix the SQL query to resolve the error above."
-            
-        invocation_params = {
-            "schema": schema,
-            "question": question,
-            "chat_history": chat_history,
-            "correction_instruction": correction_instruction
-        }
+
+        chat_history = self.history_manager.compact(
+            chat_history,
+            provider=provider,
+            summarizer=lambda text: self._summarize(text, provider, model_name)
+        )
+
+        invocation_params = self._query_params(question, schema, chat_history, error, correction, examples)
         print(f"--- LLM INVOCATION (Provider: {provider or 'Default'}, Model: {model_name or 'Default'}) ---")
         print(f"Question: {question}")
-        print(f"Schema length: {len(schema)} chars")
+        print(f"Schema length: {len(schema)} chars, history: {len(chat_history)} messages, examples: {len(examples or [])}")
         
-        chain = self._get_chain(provider, model_name, "query")
-        raw_sql = chain.invoke(invocation_params)
-        print(f"Raw LLM output: {raw_sql}")
+        llm = self._get_llm(provider, model_name)
+        hints = self._cache_hints(provider, schema)
+        if hints:
+            llm = llm.bind(**hints)
+        response = (self.query_prompt | llm).invoke(invocation_params)
+        cached_tokens = self._record_usage(response, provider)
+        raw_sql = StrOutputParser().invoke(response)
+        print(f"Raw LLM output: {raw_sql} (cached prompt tokens: {cached_tokens})")
         
         clean_sql = self.clean_sql(raw_sql)
         print(f"Cleaned SQL: {clean_sql}")
         
         return clean_sql
 
-    def generate_explanation(self, question: str, sql: str, data: List[Dict[str, Any]], provider: str = None, model_name: str = None) -> str:
+    def _query_params(self, question: str, schema: str, chat_history: List[BaseMessage], error: str = "", correction: str = None,
+                      examples: List[Dict[str, Any]] = None) -> Dict[str, Any]:
+        feedback = []
+        if error:
+            correction = correction or "Please fix the SQL query to resolve the error above."
+            feedback.append(HumanMessage(content=f"PREVIOUS ERROR: {error}\nCORRECTION: {correction}"))
+        few_shot = []
+        for example in examples or []:
+            few_shot.extend([HumanMessage(content=example["question"]), AIMessage(content=example["sql"])])
+        return {
+            "schema": schema,
+            "question": question,
+            "examples": few_shot,
+            "chat_history": chat_history,
+            "feedback": feedback
+        }
+
+    def generate_candidates(self, question: str, schema: str, n: int, chat_history: List[BaseMessage] = None, error: str = "", provider: str = None, model_name: str = None, correction: str = None, examples: List[Dict[str, Any]] = None) -> List[str]:
+        """
+        Generates up to `n` distinct SQL candidates for the same prompt. The first is the
+        usual deterministic answer; the others are sampled at `candidates.temperature`.
+        Providers listed in `candidates.n_sampling` return all samples from one request,
+        the others get concurrent requests.
+        """
+        config = GLOBAL_CONFIG.get('candidates', {})
+        provider_name = provider or LLMProvider.active_provider()
+        chat_history = self.history_manager.compact(
+            chat_history or [],
+            provider=provider,
+            summarizer=lambda text: self._summarize(text, provider, model_name)
+        )
+        messages = self.query_prompt.invoke(self._query_params(question, schema, chat_history, error, correction, examples)).to_messages()
+        llm = self._get_llm(provider, model_name)
+        hints = self._cache_hints(provider, schema)
+        if hints:
+            llm = llm.bind(**hints)
+        temperature = config.get('temperature', 0.7)
+        print(f"--- LLM INVOCATION x{n} (Provider: {provider or 'Default'}, Model: {model_name or 'Default'}) ---")
+
+        def sample(index: int) -> List[str]:
+            response = llm.invoke(messages, **({"temperature": temperature} if index else {}))
+            self._record_usage(response, provider)
+            return [StrOutputParser().invoke(response)]
+
+        def sample_many(count: int) -> List[str]:
+            try:
+                result = llm.generate([messages], n=count, temperature=temperature)
+                METRICS.increment("llm.calls", label=provider_name)
+                return [generation.text for generation in result.generations[0]]
+            except Exception as e:
+                print(f"n-sampling failed, falling back to separate requests: {e}")
+                return [text for index in range(1, count + 1) for text in sample(index)]
+
+        outputs, errors = [], []
+        with ThreadPoolExecutor(max_workers=n) as executor:
+            futures = [executor.submit(sample, 0)]
+            if n > 1 and provider_name in config.get('n_sampling', []):
+                futures.append(executor.submit(sample_many, n - 1))
+            else:
+                futures.extend(executor.submit(sample, index) for index in range(1, n))
+            # The deterministic answer stays first
+            for future in futures:
+                try:
+                    outputs.extend(future.result())
+                except Exception as e:
+                    errors.append(e)
+        if not outputs:
+            raise errors[0]
+
+        candidates = []
+        for raw_sql in outputs:
+            clean_sql = self.clean_sql(raw_sql)
+            if clean_sql and clean_sql not in candidates:
+                candidates.append(clean_sql)
+        print(f"Candidates: {candidates}")
+        return candidates
+
+    def _summarize(self, text: str, provider: str = None, model_name: str = None) -> str:
+        """Runs a plain completion, used by the history manager to summarize old turns."""
+        llm = self.default_llm if not provider and not model_name else LLMProvider.get_llm(provider=provider, model_name=model_name)
+        return (llm | StrOutputParser()).invoke(text)
+
+    def generate_explanation(self, question: str, sql: str, data: List[Dict[str, Any]], provider: str = None, model_name: str = None, note: str = None) -> str:
         """
         Generates a natural language explanation of the data results.
+        `note` adds context the answer must mention (e.g. that figures are sample estimates).
         """
         # Format data preview (limit to first 5 rows to save tokens)
         data_preview = json.dumps(data[:5], indent=2, default=str)
+        if note:
+            data_preview += f"\n\nNote: {note}"
 
         print(f"--- GENERATING EXPLANATION (Provider: {provider or 'Default'}, Model: {model_name or 'Default'}) ---")
         
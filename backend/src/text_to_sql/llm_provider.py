@@ -1,21 +1,28 @@
 import os
 from dotenv import load_dotenv
-from langchain_openai import ChatOpenAI
 from .config_loader import GLOBAL_CONFIG
 
 load_dotenv()
 
 class LLMProvider:
+    @staticmethod
+    def active_provider() -> str:
+        """The default provider: LLM_PROVIDER env var, else `settings.active_provider`."""
+        return os.getenv('LLM_PROVIDER') or GLOBAL_CONFIG.get('settings', {}).get('active_provider', 'openai')
+
     @staticmethod
     def get_llm(provider: str = None, model_name: str = None):
         settings = GLOBAL_CONFIG.get('settings', {})
         if not provider:
-            provider = settings.get('active_provider', 'openai')
+            provider = LLMProvider.active_provider()
         
         temperature = settings.get('temperature', 0)
         max_retries = settings.get('max_retries', 3)
 
+        # Provider SDKs are imported when selected: they dominate startup time
         if provider == 'openai':
+            from langchain_openai import ChatOpenAI
+
             api_key = os.getenv('OPENAI_API_KEY')
             if not api_key:
                 raise ValueError("OPENAI_API_KEY not found in environment variables.")
@@ -86,5 +93,19 @@ class LLMProvider:
                 api_key=api_key
             )
         
+        elif provider == 'fake':
+            # Offline deterministic provider for tests and benchmarks, no API key needed
+            from .fake_llm import FakeSQLChatModel
+
+            fake_config = GLOBAL_CONFIG.get('providers', {}).get('fake', {})
+            return FakeSQLChatModel(
+                model_name=model_name or fake_config.get('model_name', 'fake-sql'),
+                latency=fake_config.get('latency', {}),
+                seed=fake_config.get('seed', 42),
+                canned_sql=fake_config.get('canned_sql', []),
+                default_sql=fake_config.get('default_sql', FakeSQLChatModel.model_fields['default_sql'].default),
+                canned_answer=fake_config.get('canned_answer', FakeSQLChatModel.model_fields['canned_answer'].default)
+            )
+
         else:
             raise ValueError(f"Unsupported LLM provider: {provider}")
\ No newline at end of file
@@ -0,0 +1,37 @@
+import threading
+from collections import defaultdict
+from typing import Dict
+
+
+class Metrics:
+    """
+    Thread-safe in-process counters.
+    Each counter keeps a total and an optional breakdown by label (e.g. provider).
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters: Dict[str, Dict[str, float]] = defaultdict(lambda: defaultdict(float))
+
+    def increment(self, name: str, value: float = 1, label: str = None):
+        with self._lock:
+            counter = self._counters[name]
+            counter["total"] += value
+            if label:
+                counter[label] += value
+
+    def get(self, name: str, label: str = "total") -> float:
+        with self._lock:
+            return self._counters.get(name, {}).get(label, 0)
+
+    def snapshot(self) -> Dict[str, Dict[str, float]]:
+        with self._lock:
+            return {name: dict(counter) for name, counter in self._counters.items()}
+
+    def reset(self):
+        with self._lock:
+            self._counters.clear()
+
+
+# Global instance
+METRICS = Metrics()
@@ -0,0 +1,284 @@
+import json
+import sqlite3
+import threading
+import time
+from collections import Counter, OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
+
+from .config_loader import GLOBAL_CONFIG
+from .metrics import METRICS
+from .schema_inspector import INTERNAL_TABLE_PREFIX, get_logical_types, get_preaggregates
+from .shared_cache import invalidate_database
+from .sql_executor import ReadOnlyConnectionPool, execute_query_and_format
+from .sql_rewrite import NotRewritable, column_name, parse_aggregate_query, quote, rewrite_aggregate_query
+
+AGGREGATES_TABLE = f"{INTERNAL_TABLE_PREFIX}aggregates"
+ROWS_COLUMN = f"{INTERNAL_TABLE_PREFIX}rows"
+
+
+def rewrite_for_aggregate(sql: str, aggregate: str) -> Optional[str]:
+    """
+    Rewrites an aggregate query to read from a summary table: COUNT/SUM/MIN/MAX/AVG
+    become re-aggregations of the stored partial results. References to columns the
+    summary table doesn't have make SQLite reject the query, so callers fall back.
+    """
+    def replace(func: str, argument: str) -> str:
+        if func == "COUNT" and argument in ("*", "1"):
+            return f"COALESCE(SUM({quote(ROWS_COLUMN)}), 0)"
+        column = column_name(argument)
+        if column is None:
+            raise NotRewritable()
+        partial = lambda kind: quote(f"{INTERNAL_TABLE_PREFIX}{kind}_{column}")
+        if func == "COUNT":
+            return f"COALESCE(SUM({partial('count')}), 0)"
+        if func in ("SUM", "TOTAL"):
+            return f"{func}({partial('sum')})"
+        if func == "AVG":
+            return f"(1.0 * SUM({partial('sum')}) / SUM({partial('count')}))"
+        return f"{func}({partial(func.lower())})"
+
+    return rewrite_aggregate_query(sql, aggregate, replace)
+
+
+class PreAggregations:
+    """
+    Materialized summary tables (`_af_agg_*`) for frequent "total X by Y" questions.
+
+    They are built at upload for low-cardinality columns of large tables, and later for
+    GROUP BY shapes the workflow keeps executing. Eligible queries are rewritten to read
+    the smallest matching summary table; anything SQLite rejects runs on the base table.
+    """
+
+    def __init__(self, config: Dict[str, Any] = None):
+        self.config = config if config is not None else GLOBAL_CONFIG.get('preaggregations', {})
+        self._catalog: "OrderedDict[str, List[Dict[str, Any]]]" = OrderedDict()
+        self._patterns: Counter = Counter()
+        self._building = set()
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="preagg")
+
+    @property
+    def enabled(self) -> bool:
+        return self.config.get('enabled', True)
+
+    # --- Building ---
+
+    def build(self, conn: sqlite3.Connection, table: str, dimensions: List[str], source: str) -> Optional[str]:
+        """Creates a summary table of `table` grouped by `dimensions`; returns its name, or None if not worth it."""
+        cursor = conn.cursor()
+        declared = {row[1]: (row[2] or "").upper() for row in cursor.execute(f"PRAGMA table_info({quote(table)})")}
+        columns = list(declared)
+        logical = get_logical_types(cursor)
+        by_lower = {c.lower(): c for c in columns}
+        if not dimensions or any(d.lower() not in by_lower for d in dimensions):
+            return None
+        dimensions = [by_lower[d.lower()] for d in dimensions]
+
+        measures = [f"COUNT(*) AS {quote(ROWS_COLUMN)}"]
+        for column in columns:
+            if column in dimensions:
+                continue
+            kind = logical.get((table, column)) or ("real" if declared[column] in ("INTEGER", "REAL", "NUMERIC") else "text")
+            q = quote(column)
+            partial = lambda name: quote(f"{INTERNAL_TABLE_PREFIX}{name}_{column}")
+            measures.append(f"COUNT({q}) AS {partial('count')}")
+            if kind in ("integer", "real", "boolean"):
+                measures.append(f"SUM({q}) AS {partial('sum')}")
+            if kind in ("integer", "real", "date", "datetime"):
+                measures.append(f"MIN({q}) AS {partial('min')}")
+                measures.append(f"MAX({q}) AS {partial('max')}")
+
+        existing = {a["name"] for a in get_preaggregates(cursor)}
+        index = 1
+        while f"{INTERNAL_TABLE_PREFIX}agg_{index}" in existing:
+            index += 1
+        name = f"{INTERNAL_TABLE_PREFIX}agg_{index}"
+        dims = ", ".join(quote(d) for d in dimensions)
+
+        with conn:
+            conn.execute(
+                f"CREATE TABLE IF NOT EXISTS {AGGREGATES_TABLE} ("
+                "name TEXT PRIMARY KEY, base_table TEXT NOT NULL, dimensions TEXT NOT NULL, "
+                "row_count INTEGER NOT NULL, source TEXT NOT NULL, created_at REAL NOT NULL)"
+            )
+            conn.execute(f"CREATE TABLE {quote(name)} AS SELECT {dims}, {', '.join(measures)} FROM {quote(table)} GROUP BY {dims}")
+            groups = conn.execute(f"SELECT COUNT(*) FROM {quote(name)}").fetchone()[0]
+            base_rows = conn.execute(f"SELECT SUM({quote(ROWS_COLUMN)}) FROM {quote(name)}").fetchone()[0] or 0
+            # A summary nearly as large as its table saves nothing
+            if groups > self.config.get('max_groups', 10000) or groups > base_rows * self.config.get('max_ratio', 0.2):
+                conn.execute(f"DROP TABLE {quote(name)}")
+                return None
+            conn.execute(
+                f"INSERT INTO {AGGREGATES_TABLE} VALUES (?, ?, ?, ?, ?, ?)",
+                (name, table, json.dumps(dimensions), groups, source, time.time())
+            )
+        return name
+
+    def build_at_upload(self, conn: sqlite3.Connection, table: str, column_types: List[Dict[str, str]]) -> List[str]:
+        """Builds one-column summaries for the lowest-cardinality columns of a large uploaded table."""
+        if not self.enabled or not self.config.get('build_at_upload', True):
+            return []
+        rows = conn.execute(f"SELECT COUNT(*) FROM {quote(table)}").fetchone()[0]
+        if rows < self.config.get('min_rows', 100000):
+            return []
+
+        # Cardinality estimated on a prefix of the table, confirmed by the build itself
+        candidates = [c["name"] for c in column_types if c["logical_type"] in ("text", "boolean", "date")]
+        if not candidates:
+            return []
+        sample = self.config.get('cardinality_sample', 100000)
+        distinct = ", ".join(f"COUNT(DISTINCT {quote(c)})" for c in candidates)
+        counts = conn.execute(f"SELECT {distinct} FROM (SELECT * FROM {quote(table)} LIMIT {int(sample)})").fetchone()
+        low = sorted((n, c) for n, c in zip(counts, candidates) if 1 < n <= self.config.get('max_groups', 10000))
+
+        built = []
+        for _, column in low[:self.config.get('max_dimensions_at_upload', 4)]:
+            name = self.build(conn, table, [column], source="upload")
+            if name:
+                built.append(name)
+        return built
+
+    def refresh(self, conn: sqlite3.Connection, table: str, since_rowid: int = None) -> List[str]:
+        """
+        Brings the summaries of `table` up to date in the caller's transaction. With
+        `since_rowid`, the partials of the rows added after it are merged into the stored
+        ones (cost proportional to the groups, not the table); without, rows were changed
+        in place and the summaries are recomputed.
+        """
+        refreshed = []
+        for aggregate in get_preaggregates(conn.cursor()):
+            if aggregate["base_table"] != table:
+                continue
+            name, dims = aggregate["name"], ", ".join(quote(d) for d in aggregate["dimensions"])
+            measures, merges = [], []
+            for column in [row[1] for row in conn.execute(f"PRAGMA table_info({quote(name)})")][len(aggregate["dimensions"]):]:
+                if column == ROWS_COLUMN:
+                    func, source = "count", "*"
+                else:
+                    func, source = column[len(INTERNAL_TABLE_PREFIX):].split("_", 1)
+                    source = quote(source)
+                measures.append(f"{func.upper()}({source})")
+                merges.append(f"{'SUM' if func in ('count', 'sum') else func.upper()}({quote(column)})")
+
+            where = f" WHERE rowid > {int(since_rowid)}" if since_rowid is not None else ""
+            partials = f"SELECT {dims}, {', '.join(measures)} FROM {quote(table)}{where} GROUP BY {dims}"
+            if since_rowid is None:
+                conn.execute(f"DELETE FROM {quote(name)}")
+                conn.execute(f"INSERT INTO {quote(name)} {partials}")
+            else:
+                conn.execute("DROP TABLE IF EXISTS temp._af_merged")
+                conn.execute(
+                    f"CREATE TEMP TABLE _af_merged AS SELECT {dims}, {', '.join(merges)} "
+                    f"FROM (SELECT * FROM {quote(name)} UNION ALL {partials}) GROUP BY {dims}"
+                )
+                conn.execute(f"DELETE FROM {quote(name)}")
+                conn.execute(f"INSERT INTO {quote(name)} SELECT * FROM temp._af_merged")
+                conn.execute("DROP TABLE temp._af_merged")
+            groups = conn.execute(f"SELECT COUNT(*) FROM {quote(name)}").fetchone()[0]
+            conn.execute(f"UPDATE {AGGREGATES_TABLE} SET row_count = ? WHERE name = ?", (groups, name))
+            refreshed.append(name)
+        return refreshed
+
+    def forget(self, db_path: str):
+        """Drops the cached catalog of a database whose summaries changed."""
+        with self._lock:
+            self._catalog.pop(db_path, None)
+
+    # --- Query path ---
+
+    def catalog(self, db_path: str, pool: ReadOnlyConnectionPool = None) -> List[Dict[str, Any]]:
+        with self._lock:
+            if db_path in self._catalog:
+                self._catalog.move_to_end(db_path)
+                return self._catalog[db_path]
+        result = execute_query_and_format(
+            f"SELECT name, base_table, dimensions, row_count FROM {AGGREGATES_TABLE} ORDER BY row_count", db_path, pool=pool
+        )
+        entries = [dict(r, dimensions=json.loads(r["dimensions"])) for r in result.get("data", [])]
+        with self._lock:
+            self._catalog[db_path] = entries
+            while len(self._catalog) > self.config.get('catalog_size', 256):
+                self._catalog.popitem(last=False)
+        return entries
+
+    def try_execute(self, sql: str, db_path: str, pool: ReadOnlyConnectionPool = None,
+                    parsed: Dict[str, Any] = None, deadline: float = None) -> Optional[Dict[str, Any]]:
+        """Runs `sql` on a summary table that can answer it exactly; None if there is none."""
+        parsed = parsed or parse_aggregate_query(sql)
+        if parsed is None or not self.enabled:
+            return None
+
+        # SQLite identifiers are case-insensitive, and so is the matching
+        group_by = {c.lower() for c in parsed["group_by"] or []}
+        for aggregate in self.catalog(db_path, pool=pool):
+            if aggregate["base_table"].lower() != parsed["table"].lower():
+                continue
+            if not group_by <= {d.lower() for d in aggregate["dimensions"]}:
+                continue
+            rewritten = rewrite_for_aggregate(sql, aggregate["name"])
+            if rewritten is None:
+                return None
+            result = execute_query_and_format(rewritten, db_path, pool=pool, deadline=deadline)
+            if "error" not in result:
+                METRICS.increment("preaggregations.hits")
+                result["preaggregate"] = aggregate["name"]
+                return result
+        return None
+
+    def execute(self, sql: str, db_path: str, pool: ReadOnlyConnectionPool = None, deadline: float = None) -> Dict[str, Any]:
+        """
+        Runs `sql`, from a summary table when one can answer it. The result is the same
+        as on the base table; `preaggregate` names the summary table that was used.
+        """
+        parsed = parse_aggregate_query(sql) if self.enabled else None
+        if parsed is None:
+            return execute_query_and_format(sql, db_path, pool=pool, deadline=deadline)
+
+        result = self.try_execute(sql, db_path, pool=pool, parsed=parsed, deadline=deadline)
+        if result is not None:
+            return result
+
+        result = execute_query_and_format(sql, db_path, pool=pool, deadline=deadline)
+        if "error" not in result:
+            self.observe(db_path, parsed)
+        return result
+
+    def observe(self, db_path: str, parsed: Dict[str, Any]):
+        """Counts GROUP BY shapes answered from base tables and builds a summary for recurring ones."""
+        if not parsed["group_by"] or not self.config.get('build_observed', True):
+            return
+        key = (db_path, parsed["table"], tuple(sorted(parsed["group_by"])))
+        with self._lock:
+            self._patterns[key] += 1
+            if self._patterns[key] < self.config.get('observe_threshold', 3) or key in self._building:
+                return
+            self._building.add(key)
+        self._executor.submit(self._build_observed, key)
+
+    def _build_observed(self, key: Tuple[str, str, Tuple[str, ...]]):
+        db_path, table, dimensions = key
+        try:
+            with sqlite3.connect(db_path, timeout=30) as conn:
+                existing = [a for a in get_preaggregates(conn.cursor()) if a["base_table"] == table]
+                rows = conn.execute(f"SELECT COUNT(*) FROM {quote(table)}").fetchone()[0]
+                if rows < self.config.get('min_rows', 100000) or len(existing) >= self.config.get('max_per_table', 10):
+                    return
+                if any(set(dimensions) <= set(a["dimensions"]) for a in existing):
+                    return
+                name = self.build(conn, table, list(dimensions), source="observed")
+            if name:
+                print(f"Built summary table {name} for {table} by {', '.join(dimensions)}")
+                with self._lock:
+                    self._catalog.pop(db_path, None)
+                # The schema note lists the new grouping
+                invalidate_database(db_path, schema_only=True)
+        except sqlite3.Error as e:
+            print(f"Summary table build failed for {table}: {e}")
+        finally:
+            with self._lock:
+                self._patterns.pop(key, None)
+                self._building.discard(key)
+
+
+PREAGGREGATIONS = PreAggregations()
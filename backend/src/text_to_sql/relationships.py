@@ -0,0 +1,176 @@
+import heapq
+import sqlite3
+from typing import Any, Dict, List, Optional
+
+from .config_loader import GLOBAL_CONFIG
+from .schema_inspector import INTERNAL_TABLE_PREFIX, get_logical_types, list_user_tables
+from .sql_rewrite import quote
+
+RELATIONSHIPS_TABLE = f"{INTERNAL_TABLE_PREFIX}relationships"
+
+# Only these columns can be keys; reals, dates and booleans make poor join columns
+_KEY_TYPES = ("integer", "text")
+_KEY_SUFFIXES = ("id", "_id", "code", "_code", "key", "_key", "ref", "_ref")
+
+
+def _table_nouns(table: str) -> set:
+    base = table.lower()
+    base = base[len("data_"):] if base.startswith("data_") else base
+    nouns = {base}
+    if base.endswith("ies"):
+        nouns.add(base[:-3] + "y")
+    elif base.endswith("s"):
+        nouns.add(base[:-1])
+    return nouns
+
+
+def _is_key_name(column: str, table: str) -> bool:
+    name = column.lower()
+    return name.endswith(_KEY_SUFFIXES) or name in _table_nouns(table)
+
+
+def _refers_to(column: str, table: str, key: str) -> bool:
+    """Whether the name of `column` points at `table`.`key` (customer_id, customerid, customer -> customers.id)."""
+    name, key = column.lower(), key.lower()
+    if name == key and key != "id":
+        return True
+    for noun in _table_nouns(table):
+        if name in (noun, f"{noun}_{key}", f"{noun}{key}", f"{noun}_id", f"{noun}id"):
+            return True
+    return False
+
+
+def profile_column(conn: sqlite3.Connection, table: str, column: str) -> Dict[str, Any]:
+    """Row, null and distinct counts of a column (counted by SQLite), and whether its values are unique."""
+    rows, values, distinct = conn.execute(
+        f"SELECT COUNT(*), COUNT({quote(column)}), COUNT(DISTINCT {quote(column)}) FROM {quote(table)}"
+    ).fetchone()
+    return {"rows": rows, "nulls": rows - values, "distinct": distinct, "unique": rows > 0 and distinct == values == rows}
+
+
+def _distinct_values(conn: sqlite3.Connection, table: str, column: str):
+    return conn.execute(f"SELECT DISTINCT {quote(column)} FROM {quote(table)} WHERE {quote(column)} IS NOT NULL")
+
+
+def value_hashes(conn: sqlite3.Connection, table: str, column: str) -> set:
+    """Hashes of every distinct value of a column; only read for inferred keys."""
+    return {hash(str(value)) for (value,) in _distinct_values(conn, table, column)}
+
+
+def bottom_hashes(conn: sqlite3.Connection, table: str, column: str, k: int) -> List[int]:
+    """The `k` smallest distinct value hashes of a column, kept in a bounded heap while reading."""
+    heap: List[int] = []  # Negated: the largest hash kept is on top
+    for (value,) in _distinct_values(conn, table, column):
+        digest = -hash(str(value))
+        if len(heap) < k:
+            heapq.heappush(heap, digest)
+        elif digest > heap[0]:
+            heapq.heapreplace(heap, digest)
+    return sorted(-digest for digest in heap)
+
+
+def infer_relationships(conn: sqlite3.Connection, config: Dict[str, Any] = None) -> List[Dict[str, Any]]:
+    """
+    Infers a primary key per table (a unique, non-null integer or text column, preferring
+    key-like names, else the first column) and foreign-key candidates: columns whose
+    values are included in another table's key, checked on a bottom-k sample of their
+    distinct value hashes. Integer columns also need a name pointing at the other table,
+    since small integers are included in almost any id range. Records the findings in
+    `_af_relationships`, indexes the keys and returns them. Key indexes are not unique:
+    a key is only a guess from the rows seen so far, later appends may repeat its values.
+
+    Only the inferred keys have all their value hashes held in memory; other columns keep
+    the bottom-k sample.
+    """
+    config = config if config is not None else GLOBAL_CONFIG.get('relationships', {})
+    if not config.get('enabled', True):
+        return []
+    cursor = conn.cursor()
+    logical = get_logical_types(cursor)
+    max_values = config.get('max_key_values', 2000000)
+    sample_size = config.get('sample_values', 1000)
+
+    profiles: Dict[str, Dict[str, Dict[str, Any]]] = {}
+    keys: Dict[str, str] = {}
+    for table in list_user_tables(cursor):
+        columns = [row[1] for row in conn.execute(f"PRAGMA table_info({quote(table)})")]
+        profiles[table] = {
+            c: profile_column(conn, table, c)
+            for c in columns if logical.get((table, c), "text") in _KEY_TYPES
+        }
+        unique = [c for c in columns if c in profiles[table] and profiles[table][c]["unique"]
+                  and profiles[table][c]["distinct"] <= max_values]
+        if not unique or profiles[table][unique[0]]["rows"] < config.get('min_rows', 2):
+            continue
+        named = [c for c in unique if _is_key_name(c, table)]
+        if named:
+            keys[table] = named[0]
+        elif unique[0] == columns[0]:
+            keys[table] = columns[0]
+
+    found = [{"table": t, "column": c, "kind": "primary_key", "ref_table": None, "ref_column": None, "inclusion": 1.0}
+             for t, c in keys.items()]
+    key_hashes = {table: value_hashes(conn, table, column) for table, column in keys.items()}
+    for table, columns in profiles.items():
+        for column, profile in columns.items():
+            if column == keys.get(table) or not profile["distinct"]:
+                continue
+            candidates = []
+            for ref_table, ref_column in keys.items():
+                if ref_table == table:
+                    continue
+                if logical.get((table, column), "text") != logical.get((ref_table, ref_column), "text"):
+                    continue
+                named = _refers_to(column, ref_table, ref_column)
+                if not named and (logical.get((table, column), "text") == "integer"
+                                  or profile["distinct"] < config.get('min_distinct', 2)):
+                    continue
+                candidates.append((ref_table, ref_column))
+            if not candidates:
+                continue
+            sample = bottom_hashes(conn, table, column, sample_size)
+            for ref_table, ref_column in candidates:
+                inclusion = sum(1 for h in sample if h in key_hashes[ref_table]) / len(sample)
+                if inclusion >= config.get('min_inclusion', 0.98):
+                    found.append({"table": table, "column": column, "kind": "foreign_key",
+                                  "ref_table": ref_table, "ref_column": ref_column, "inclusion": round(inclusion, 4)})
+                    break
+
+    with conn:
+        conn.execute(
+            f"CREATE TABLE IF NOT EXISTS {RELATIONSHIPS_TABLE} ("
+            "table_name TEXT NOT NULL, column_name TEXT NOT NULL, kind TEXT NOT NULL, "
+            "ref_table TEXT, ref_column TEXT, inclusion REAL NOT NULL, PRIMARY KEY (table_name, column_name, kind))"
+        )
+        conn.execute(f"DELETE FROM {RELATIONSHIPS_TABLE}")
+        for r in found:
+            conn.execute(
+                f"INSERT INTO {RELATIONSHIPS_TABLE} VALUES (?, ?, ?, ?, ?, ?)",
+                (r["table"], r["column"], r["kind"], r["ref_table"], r["ref_column"], r["inclusion"])
+            )
+            if config.get('create_indexes', True):
+                prefix = "pk" if r["kind"] == "primary_key" else "fk"
+                index = quote(f"{INTERNAL_TABLE_PREFIX}{prefix}_{r['table']}_{r['column']}")
+                conn.execute(f"CREATE INDEX IF NOT EXISTS {index} ON {quote(r['table'])} ({quote(r['column'])})")
+    return found
+
+
+def drop_broken_keys(conn: sqlite3.Connection, table: str) -> List[str]:
+    """
+    Checks the inferred primary keys of `table` again after rows were added; a key whose
+    values are no longer unique is dropped, with the foreign keys pointing at it. Their
+    indexes stay (they still serve joins). Returns the dropped key columns.
+    """
+    try:
+        keys = [row[0] for row in conn.execute(
+            f"SELECT column_name FROM {RELATIONSHIPS_TABLE} WHERE table_name = ? AND kind = 'primary_key'", (table,)
+        )]
+    except sqlite3.OperationalError:
+        return []
+    dropped = [column for column in keys if not profile_column(conn, table, column)["unique"]]
+    for column in dropped:
+        conn.execute(
+            f"DELETE FROM {RELATIONSHIPS_TABLE} WHERE (table_name = ? AND column_name = ? AND kind = 'primary_key') "
+            "OR (ref_table = ? AND ref_column = ?)", (table, column, table, column)
+        )
+    return dropped
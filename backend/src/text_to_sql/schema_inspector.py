@@ -1,40 +1,279 @@
+import json
+import re
 import sqlite3
 import os
+from typing import Any, Dict, List, Optional, Tuple
+
+from .config_loader import GLOBAL_CONFIG
+from .shared_cache import SCHEMA_CACHE
+from .sql_executor import open_readonly_connection
+
+# Tables created by the app itself (metadata, caches...) rather than from the uploaded file
+INTERNAL_TABLE_PREFIX = "_af_"
+
+# Structured schema snapshots live next to their database
+SNAPSHOT_SUFFIX = ".schema.json"
+
+# How inferred logical types are described to the LLM when the SQL type alone is ambiguous
+LOGICAL_TYPE_NOTES = {
+    "date": "date as 'YYYY-MM-DD' text",
+    "datetime": "datetime as 'YYYY-MM-DD HH:MM:SS' text",
+    "boolean": "boolean 0/1",
+}
+
+
+def list_user_tables(cursor: sqlite3.Cursor) -> List[str]:
+    """Returns the data tables of the database, without internal or SQLite tables."""
+    cursor.execute("SELECT name FROM sqlite_master WHERE type='table';")
+    return [row[0] for row in cursor.fetchall() if not row[0].startswith((INTERNAL_TABLE_PREFIX, "sqlite_"))]
+
+
+def get_logical_types(cursor: sqlite3.Cursor) -> Dict[Tuple[str, str], str]:
+    """Logical column types recorded at upload time, keyed by (table, column)."""
+    try:
+        cursor.execute(f"SELECT table_name, column_name, logical_type FROM {INTERNAL_TABLE_PREFIX}columns;")
+    except sqlite3.OperationalError:
+        # Databases created before type inference have no metadata table
+        return {}
+    return {(row[0], row[1]): row[2] for row in cursor.fetchall()}
+
+
+def get_preaggregates(cursor: sqlite3.Cursor) -> List[Dict[str, Any]]:
+    """Summary tables built from the data tables (see text_to_sql.preaggregations)."""
+    try:
+        cursor.execute(f"SELECT name, base_table, dimensions FROM {INTERNAL_TABLE_PREFIX}aggregates;")
+    except sqlite3.OperationalError:
+        return []
+    return [{"name": row[0], "base_table": row[1], "dimensions": json.loads(row[2])} for row in cursor.fetchall()]
+
+
+def get_fulltext_indexes(cursor: sqlite3.Cursor) -> List[Dict[str, Any]]:
+    """Full-text indexes over text columns (see text_to_sql.fulltext)."""
+    try:
+        cursor.execute(f"SELECT name, base_table, columns FROM {INTERNAL_TABLE_PREFIX}fulltext;")
+    except sqlite3.OperationalError:
+        return []
+    return [{"name": row[0], "base_table": row[1], "columns": json.loads(row[2])} for row in cursor.fetchall()]
+
+
+def get_relationships(cursor: sqlite3.Cursor) -> Dict[Tuple[str, str], Dict[str, Any]]:
+    """Keys inferred after upload (see text_to_sql.relationships), keyed by (table, column)."""
+    try:
+        cursor.execute(f"SELECT table_name, column_name, kind, ref_table, ref_column FROM {INTERNAL_TABLE_PREFIX}relationships;")
+    except sqlite3.OperationalError:
+        return {}
+    return {(row[0], row[1]): {"kind": row[2], "ref_table": row[3], "ref_column": row[4]} for row in cursor.fetchall()}
+
+
+def extract_schema(conn: sqlite3.Connection) -> Dict[str, Any]:
+    """
+    Structured schema of a database: its data tables with their columns (declared and
+    logical types, inferred keys), and the summary tables and full-text indexes the
+    query path uses. JSON-serializable, for snapshots.
+    """
+    cursor = conn.cursor()
+    logical_types = get_logical_types(cursor)
+    relationships = get_relationships(cursor)
+    tables = []
+    for table_name in list_user_tables(cursor):
+        columns = []
+        for col in cursor.execute(f"PRAGMA table_info('{table_name}');").fetchall():
+            relationship = relationships.get((table_name, col[1]), {})
+            references = None
+            if relationship.get("kind") == "foreign_key":
+                references = {"table": relationship["ref_table"], "column": relationship["ref_column"]}
+            columns.append({
+                "name": col[1],
+                "type": col[2],
+                "primary_key": bool(col[5]) or relationship.get("kind") == "primary_key",
+                "logical_type": logical_types.get((table_name, col[1])),
+                "references": references,
+            })
+        tables.append({"name": table_name, "columns": columns})
+    return {
+        "source": "sqlite",
+        "tables": tables,
+        "aggregates": get_preaggregates(cursor),
+        "fulltext": get_fulltext_indexes(cursor),
+    }
+
+
+SCHEMA_STYLES = ("verbose", "compact")
+# Compact style: short names of the declared and logical types
+_SHORT_TYPES = {"INTEGER": "int", "REAL": "real", "TEXT": "text", "BLOB": "blob", "NUMERIC": "num",
+                "date": "date", "datetime": "datetime", "boolean": "bool"}
+_PLAIN_NAME = re.compile(r"[A-Za-z_]\w*")
+
+
+def _compact_name(name: str) -> str:
+    return name if _PLAIN_NAME.fullmatch(name) else '"' + name.replace('"', '""') + '"'
+
+
+def _render_verbose(tables: List[Dict[str, Any]]) -> str:
+    schema_str = ""
+    for table in tables:
+        schema_str += f"Table '{table['name']}':\n"
+        for col in table["columns"]:
+            is_pk = " (PRIMARY KEY)" if col["primary_key"] else ""
+            if col.get("references"):
+                is_pk = f" (FOREIGN KEY -> '{col['references']['table']}'.{col['references']['column']})"
+            note = LOGICAL_TYPE_NOTES.get(col.get("logical_type"))
+            note = f" ({note})" if note else ""
+            schema_str += f"  - {col['name']}: {col['type']}{is_pk}{note}\n"
+        schema_str += "\n"
+    return schema_str
+
+
+def _render_compact(tables: List[Dict[str, Any]], abbreviate: bool, deduplicate: bool) -> str:
+    """
+    One line per table, `name(column type, ...)`, with a legend for the key markers and
+    the types stored as text. A table with the same columns as an earlier one (sheets of
+    the same layout) is written `name(same as other)`.
+    """
+    lines, seen, used = [], {}, set()
+    for table in tables:
+        columns = []
+        for col in table["columns"]:
+            logical = col.get("logical_type") if col.get("logical_type") in LOGICAL_TYPE_NOTES else None
+            sql_type = logical or col["type"]
+            sql_type = _SHORT_TYPES.get(sql_type, sql_type.lower()) if abbreviate else sql_type.upper()
+            if logical:
+                used.add((sql_type, LOGICAL_TYPE_NOTES[logical]))
+            column = f"{_compact_name(col['name'])} {sql_type}".rstrip()
+            if col.get("references"):
+                column += f" fk {_compact_name(col['references']['table'])}.{_compact_name(col['references']['column'])}"
+                used.add(("fk t.c", "foreign key to t.c"))
+            elif col["primary_key"]:
+                column += " pk"
+                used.add(("pk", "primary key"))
+            columns.append(column)
+        body = ", ".join(columns)
+        name = _compact_name(table["name"])
+        if deduplicate and body and body in seen:
+            lines.append(f"{name}(same as {seen[body]})")
+        else:
+            seen.setdefault(body, name)
+            lines.append(f"{name}({body})")
+    if not lines:
+        return ""
+    legend = "Tables as name(column type, ...)"
+    if used:
+        legend += "; " + "; ".join(f"{marker}: {meaning}" for marker, meaning in sorted(used))
+    return legend + "\n" + "\n".join(lines) + "\n\n"
+
+
+def render_schema(payload: Dict[str, Any], config: Dict[str, Any] = None) -> str:
+    """
+    The schema text given to the LLM, from a structured schema, in the style set by the
+    'schema_format' section: `verbose` (a line per column) or `compact` (a line per table).
+    """
+    config = config if config is not None else GLOBAL_CONFIG.get('schema_format', {})
+    style = config.get('style', 'verbose')
+    if style == "compact":
+        schema_str = _render_compact(payload["tables"], config.get('abbreviate_types', True), config.get('deduplicate', True))
+    else:
+        if style not in SCHEMA_STYLES:
+            print(f"Unknown schema_format.style '{style}', using 'verbose'.")
+        schema_str = _render_verbose(payload["tables"])
+
+    # Summary tables are used automatically; telling the LLM makes it keep the GROUP BY shape simple
+    aggregates = payload.get("aggregates")
+    if aggregates:
+        schema_str += "Note: totals, counts, averages, minimums and maximums grouped by these columns are precomputed, " \
+                      "so such GROUP BY queries on the table are fast (write them against the table itself):\n"
+        for aggregate in aggregates:
+            schema_str += f"  - '{aggregate['base_table']}' by {', '.join(aggregate['dimensions'])}\n"
+        schema_str += "\n"
+
+    # The index is used through LIKE rewrites, so the LLM only needs to know substring search is cheap
+    fulltext = payload.get("fulltext")
+    if fulltext:
+        schema_str += "Note: substring searches written as `column LIKE '%text%'` (at least 3 characters) " \
+                      "are indexed on these columns, so prefer that form for \"contains\" questions:\n"
+        for index in fulltext:
+            schema_str += f"  - '{index['base_table']}' on {', '.join(index['columns'])}\n"
+        schema_str += "\n"
+
+    return schema_str if schema_str else "Database is empty (no tables found)."
+
+
+def schema_snapshot_path(db_path: str) -> str:
+    return db_path + SNAPSHOT_SUFFIX
+
+
+def _file_fingerprint(db_path: str) -> List[List[int]]:
+    # Writes land in the -wal file until a checkpoint, so it is part of the fingerprint
+    # (once it holds frames: read-only connections leave an empty one behind)
+    fingerprint = []
+    for path in (db_path, db_path + "-wal"):
+        if os.path.exists(path):
+            stat = os.stat(path)
+            if stat.st_size or path == db_path:
+                fingerprint.append([stat.st_size, stat.st_mtime_ns])
+    return fingerprint
+
+
+def save_schema_snapshot(db_path: str, payload: Dict[str, Any], fingerprint: List[List[int]] = None):
+    """
+    Writes the structured schema next to the database, stamped with the file's size and
+    mtime (`fingerprint`: taken before the schema was read, so a concurrent change shows).
+    """
+    path = schema_snapshot_path(db_path)
+    fingerprint = fingerprint if fingerprint is not None else _file_fingerprint(db_path)
+    try:
+        with open(path + ".tmp", "w", encoding="utf-8") as f:
+            json.dump({**payload, "fingerprint": fingerprint}, f)
+        os.replace(path + ".tmp", path)
+    except OSError as e:
+        print(f"Schema snapshot not written for {db_path}: {e}")
+
+
+def load_schema_snapshot(db_path: str) -> Optional[Dict[str, Any]]:
+    """The snapshot of a database, unless the file changed since it was taken."""
+    try:
+        with open(schema_snapshot_path(db_path), encoding="utf-8") as f:
+            payload = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if payload.pop("fingerprint", None) != _file_fingerprint(db_path):
+        return None
+    return payload
+
 
 def get_db_schema(db_path: str) -> str:
     """
     Inspects an SQLite database and returns a string representation of its schema.
+    A snapshot written next to the database is used while the file is unchanged.
     """
     if not db_path or not os.path.exists(db_path):
         return f"Error: Database file not found at {db_path}"
 
+    payload = load_schema_snapshot(db_path)
+    if payload is not None:
+        return render_schema(payload)
+
+    fingerprint = _file_fingerprint(db_path)
     try:
         # Connect in read-only mode for safety
-        db_uri = f"file:{db_path}?mode=ro"
-        with sqlite3.connect(db_uri, uri=True) as conn:
-            cursor = conn.cursor()
-            
-            # Get list of tables
-            cursor.execute("SELECT name FROM sqlite_master WHERE type='table';")
-            tables = [table[0] for table in cursor.fetchall()]
-            
-            schema_str = ""
-            for table_name in tables:
-                # Get schema for each table
-                cursor.execute(f"PRAGMA table_info('{table_name}');")
-                columns = cursor.fetchall()
-                
-                schema_str += f"Table '{table_name}':\n"
-                for col in columns:
-                    col_name = col[1]
-                    col_type = col[2]
-                    is_pk = " (PRIMARY KEY)" if col[5] else ""
-                    schema_str += f"  - {col_name}: {col_type}{is_pk}\n"
-                schema_str += "\n"
-                
-            return schema_str if schema_str else "Database is empty (no tables found)."
-
+        conn = open_readonly_connection(db_path)
+        try:
+            payload = extract_schema(conn)
+        finally:
+            conn.close()
     except sqlite3.OperationalError as e:
         return f"Error inspecting schema: {str(e)}"
     except Exception as e:
         return f"An unexpected error occurred: {str(e)}"
+
+    save_schema_snapshot(db_path, payload, fingerprint)
+    return render_schema(payload)
+
+
+def get_cached_db_schema(db_path: str) -> str:
+    """get_db_schema, through the schema cache shared by workers. Errors are not cached."""
+    schema = SCHEMA_CACHE.get(db_path)
+    if schema is None:
+        schema = get_db_schema(db_path)
+        if not schema.startswith("Error"):
+            SCHEMA_CACHE.set(db_path, schema)
+    return schema
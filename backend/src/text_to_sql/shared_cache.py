@@ -0,0 +1,189 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Optional
+
+from .config_loader import GLOBAL_CONFIG
+
+_BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Set by the production entrypoint (serve.py): state must be visible to every worker process
+SHARED_STATE_ENV = "AF_SHARED_STATE"
+
+
+# Number of worker processes started by serve.py, each with its own in-process state
+WORKERS_ENV = "AF_WORKERS"
+
+
+def shared_state_enabled() -> bool:
+    return os.environ.get(SHARED_STATE_ENV) == "1"
+
+
+def worker_count() -> int:
+    try:
+        return max(1, int(os.environ.get(WORKERS_ENV) or 1))
+    except ValueError:
+        return 1
+
+
+class InMemoryCache:
+    """Bounded LRU of JSON-serializable values with a per-entry TTL, local to the process."""
+
+    def __init__(self, max_entries: int = 10000, ttl_seconds: int = 3600):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[Any]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry[1] < time.time():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            # Stored serialized, so callers can't mutate a cached value
+            return json.loads(entry[0])
+
+    def set(self, key: str, value: Any, ttl_seconds: int = None):
+        expires = time.time() + (ttl_seconds or self.ttl_seconds)
+        with self._lock:
+            self._entries[key] = (json.dumps(value, default=str), expires)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def delete(self, key: str):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def delete_prefix(self, prefix: str):
+        with self._lock:
+            for key in [k for k in self._entries if k.startswith(prefix)]:
+                del self._entries[key]
+
+
+class SQLiteCache:
+    """
+    Cache in a local SQLite file (WAL mode) shared by every worker process, so one
+    worker's schemas, SQL, results and job states serve the others. Each instance is
+    a namespace of the same file.
+    """
+
+    _PRUNE_EVERY = 200  # Writes between two expiry/size sweeps
+
+    def __init__(self, path: str, namespace: str, max_entries: int = 10000, ttl_seconds: int = 3600):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.path = path
+        self.namespace = namespace
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._local = threading.local()
+        self._writes = 0
+        conn = self._connect()
+        conn.execute("PRAGMA journal_mode=WAL")
+        with conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS cache ("
+                "namespace TEXT NOT NULL, key TEXT NOT NULL, value TEXT NOT NULL, expires_at REAL NOT NULL, "
+                "PRIMARY KEY (namespace, key))"
+            )
+
+    def _connect(self) -> sqlite3.Connection:
+        # One connection per thread; SQLite handles locking between processes
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5)
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def get(self, key: str) -> Optional[Any]:
+        row = self._connect().execute(
+            "SELECT value, expires_at FROM cache WHERE namespace = ? AND key = ?", (self.namespace, key)
+        ).fetchone()
+        if row is None or row[1] < time.time():
+            return None
+        return json.loads(row[0])
+
+    def set(self, key: str, value: Any, ttl_seconds: int = None):
+        expires = time.time() + (ttl_seconds or self.ttl_seconds)
+        conn = self._connect()
+        with conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO cache (namespace, key, value, expires_at) VALUES (?, ?, ?, ?)",
+                (self.namespace, key, json.dumps(value, default=str), expires)
+            )
+        self._writes += 1
+        if self._writes % self._PRUNE_EVERY == 0:
+            self.prune()
+
+    def delete(self, key: str):
+        conn = self._connect()
+        with conn:
+            conn.execute("DELETE FROM cache WHERE namespace = ? AND key = ?", (self.namespace, key))
+
+    def delete_prefix(self, prefix: str):
+        conn = self._connect()
+        escaped = prefix.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+        with conn:
+            conn.execute(
+                "DELETE FROM cache WHERE namespace = ? AND key LIKE ? ESCAPE '\\'", (self.namespace, escaped + "%")
+            )
+
+    def prune(self):
+        """Drops expired entries, then the soonest-expiring ones above `max_entries`."""
+        conn = self._connect()
+        with conn:
+            conn.execute("DELETE FROM cache WHERE namespace = ? AND expires_at < ?", (self.namespace, time.time()))
+            conn.execute(
+                "DELETE FROM cache WHERE namespace = ? AND key IN ("
+                "SELECT key FROM cache WHERE namespace = ? ORDER BY expires_at DESC LIMIT -1 OFFSET ?)",
+                (self.namespace, self.namespace, self.max_entries)
+            )
+
+
+def build_cache(namespace: str, max_entries: int = None, ttl_seconds: int = None):
+    """
+    Creates a cache for one namespace ('schema', 'sql', 'result', 'explanations'...),
+    shared between worker processes when the 'cache' backend is 'sqlite' or when
+    running under the production entrypoint.
+    """
+    config = GLOBAL_CONFIG.get('cache', {})
+    max_entries = max_entries or config.get('max_entries', 10000)
+    ttl_seconds = ttl_seconds or config.get('ttl_seconds', 3600)
+    if shared_state_enabled() or config.get('backend', 'memory') == 'sqlite':
+        path = config.get('sqlite_path') or os.path.join(_BACKEND_DIR, 'state', 'cache.db')
+        return SQLiteCache(path, namespace, max_entries=max_entries, ttl_seconds=ttl_seconds)
+    return InMemoryCache(max_entries=max_entries, ttl_seconds=ttl_seconds)
+
+
+_cache_config = GLOBAL_CONFIG.get('cache', {})
+
+# Query-path caches. Keys start with the database path, so a database's entries can be
+# dropped together when its content changes or it is deleted.
+SCHEMA_CACHE = build_cache("schema", ttl_seconds=_cache_config.get('schema_ttl_seconds', 3600))
+SQL_CACHE = build_cache("sql", ttl_seconds=_cache_config.get('sql_ttl_seconds', 86400))
+RESULT_CACHE = build_cache("result", ttl_seconds=_cache_config.get('result_ttl_seconds', 600))
+
+
+def database_key(db_path: str, *parts: str) -> str:
+    return "\n".join([db_path, *parts])
+
+
+def invalidate_database(db_path: str, schema_only: bool = False, results_only: bool = False):
+    """
+    Drops the cached schema, SQL and results of a database; only the schema with
+    `schema_only` (new derived tables), only the results with `results_only` (new rows).
+    """
+    if not results_only:
+        SCHEMA_CACHE.delete(db_path)
+    if not schema_only:
+        RESULT_CACHE.delete_prefix(db_path + "\n")
+    if not schema_only and not results_only:
+        SQL_CACHE.delete_prefix(db_path + "\n")
@@ -1,11 +1,172 @@
 
 import sqlite3
 import os
+import queue
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Any, Dict, Optional
 
-def execute_query_and_format(sql: str, db_path: str) -> dict:
+from .config_loader import GLOBAL_CONFIG
+
+
+def apply_read_pragmas(conn: sqlite3.Connection, db_path: str, config: Dict[str, Any] = None):
+    """
+    Memory-maps the database file (up to `mmap_max_mb`), so pages are read from the OS
+    cache without a copy per read, and gives the connection a larger page cache.
+    """
+    config = config if config is not None else GLOBAL_CONFIG.get('read_path', {})
+    cache_mb = config.get('cache_size_mb', 16)
+    if cache_mb:
+        # Negative values are in KiB rather than pages
+        conn.execute(f"PRAGMA cache_size = -{int(cache_mb * 1024)}")
+    max_mmap = int(config.get('mmap_max_mb', 1024) * 1024 * 1024)
+    if max_mmap:
+        try:
+            size = os.path.getsize(db_path)
+        except OSError:
+            size = 0
+        # Pages past the mapping (rows appended later) are read the usual way
+        conn.execute(f"PRAGMA mmap_size = {min(size, max_mmap)}")
+
+
+def open_readonly_connection(db_path: str, check_same_thread: bool = True) -> sqlite3.Connection:
+    """Opens a read-only connection, so write statements fail at the SQLite level."""
+    db_uri = f"file:{db_path}?mode=ro"
+    conn = sqlite3.connect(db_uri, uri=True, timeout=5, check_same_thread=check_same_thread)
+    apply_read_pragmas(conn, db_path)
+    return conn
+
+
+def prewarm(db_path: str, chunk_bytes: int = 1024 * 1024) -> int:
+    """Reads a database (and its WAL) once so its pages are in the OS cache before the first query. Returns bytes read."""
+    total = 0
+    for path in (db_path, db_path + "-wal"):
+        if not os.path.exists(path):
+            continue
+        with open(path, "rb", buffering=0) as f:
+            while True:
+                chunk = f.read(chunk_bytes)
+                if not chunk:
+                    break
+                total += len(chunk)
+    return total
+
+
+class ReadOnlyConnectionPool:
+    """
+    A small pool of read-only connections to one database, shared between threads
+    (e.g. the questions of a batch) to avoid reopening the file for every query.
+    """
+
+    def __init__(self, db_path: str, size: int = 4):
+        self.db_path = db_path
+        self.size = size
+        # The file the connections were opened on, to notice when the path is replaced
+        stat = os.stat(db_path) if os.path.exists(db_path) else None
+        self.identity = (stat.st_dev, stat.st_ino) if stat else None
+        self._idle = queue.Queue()
+        self._created = 0
+        self._lock = threading.Lock()
+        self._closed = False
+
+    @contextmanager
+    def connection(self):
+        conn = None
+        while conn is None:
+            if self._closed:
+                # Closed while still in use (e.g. evicted from READ_POOLS): a connection for this query only
+                conn = open_readonly_connection(self.db_path, check_same_thread=False)
+                break
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                with self._lock:
+                    if self._created < self.size:
+                        conn = open_readonly_connection(self.db_path, check_same_thread=False)
+                        self._created += 1
+                if conn is None:
+                    try:
+                        conn = self._idle.get(timeout=0.1)
+                    except queue.Empty:
+                        pass
+        try:
+            yield conn
+        finally:
+            if self._closed:
+                conn.close()
+            else:
+                self._idle.put(conn)
+
+    def close(self):
+        self._closed = True
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                break
+
+
+class ReadPools:
+    """
+    Connection pools kept open between queries, one per recently queried database
+    (least recently used ones are closed). Their page caches and memory maps stay
+    warm, instead of starting empty with each new connection.
+    """
+
+    def __init__(self, config: Dict[str, Any] = None):
+        self.config = config if config is not None else GLOBAL_CONFIG.get('read_path', {})
+        self._pools: "OrderedDict[str, ReadOnlyConnectionPool]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, db_path: str) -> Optional[ReadOnlyConnectionPool]:
+        """The pool of `db_path`, or None when connections are not kept."""
+        if not self.config.get('keep_connections', True):
+            return None
+        stat = os.stat(db_path)
+        stale = []
+        with self._lock:
+            pool = self._pools.get(db_path)
+            if pool is not None and pool.identity != (stat.st_dev, stat.st_ino):
+                # The file was deleted and recreated: the open connections read the old one
+                stale.append(self._pools.pop(db_path))
+                pool = None
+            if pool is None:
+                pool = ReadOnlyConnectionPool(db_path, size=self.config.get('connections_per_database', 8))
+                self._pools[db_path] = pool
+                while len(self._pools) > self.config.get('max_databases', 16):
+                    stale.append(self._pools.popitem(last=False)[1])
+            else:
+                self._pools.move_to_end(db_path)
+        for old in stale:
+            old.close()
+        return pool
+
+    def discard(self, db_path: str):
+        """Closes the connections of a database about to be deleted or rewritten."""
+        with self._lock:
+            pool = self._pools.pop(db_path, None)
+        if pool is not None:
+            pool.close()
+
+    def clear(self):
+        with self._lock:
+            pools, self._pools = list(self._pools.values()), OrderedDict()
+        for pool in pools:
+            pool.close()
+
+
+READ_POOLS = ReadPools()
+
+
+def execute_query_and_format(sql: str, db_path: str, pool: ReadOnlyConnectionPool = None, deadline: float = None) -> dict:
     """
     Executes a SQL query on a given database and returns the result in a 
     JSON-serializable format. It enforces security best practices.
+    When a connection pool is given, a pooled connection is used; otherwise the
+    database's pool in READ_POOLS (or a new connection when pools are disabled).
+    A `deadline` (time.monotonic() value) interrupts the query once passed.
     """
     # MOCK BEHAVIOR FOR TESTING
     if os.environ.get("USE_MOCK_DB") == "True":
@@ -23,27 +184,16 @@ def execute_query_and_format(sql: str, db_path: str) -> dict:
         return {"error": f"Database file not found at {db_path}"}
 
     try:
-        db_uri = f"file:{db_path}?mode=ro"
-        with sqlite3.connect(db_uri, uri=True, timeout=5) as conn:
-            cursor = conn.cursor()
-            
-            # This is a hack to handle empty queries from the LLM
-            if not sql.strip():
-                return {"columns": [], "data": []}
-
-            cursor.execute(sql)
-            
-            if cursor.description:
-                columns = [description[0] for description in cursor.description]
-                rows = cursor.fetchall()
-                
-                data = []
-                for row in rows:
-                    data.append(dict(zip(columns, row)))
-                    
-                return {"columns": columns, "data": data}
-            else:
-                return {"message": "Query executed successfully (no data returned)."}
+        pool = pool or READ_POOLS.get(db_path)
+        if pool is not None:
+            with pool.connection() as conn:
+                return _run_query(conn, sql, deadline)
+
+        conn = open_readonly_connection(db_path)
+        try:
+            return _run_query(conn, sql, deadline)
+        finally:
+            conn.close()
                 
     except sqlite3.OperationalError as e:
         if "attempt to write a readonly database" in str(e):
@@ -51,3 +201,32 @@ def execute_query_and_format(sql: str, db_path: str) -> dict:
         return {"error": str(e)}
     except Exception as e:
         return {"error": str(e)}
+
+
+def _run_query(conn: sqlite3.Connection, sql: str, deadline: float = None) -> dict:
+    cursor = conn.cursor()
+
+    # This is a hack to handle empty queries from the LLM
+    if not sql.strip():
+        return {"columns": [], "data": []}
+
+    if deadline is not None:
+        # Checked every few thousand VM instructions; a non-zero return aborts with "interrupted"
+        conn.set_progress_handler(lambda: time.monotonic() > deadline, 10000)
+    try:
+        cursor.execute(sql)
+        rows = cursor.fetchall() if cursor.description else None
+    finally:
+        if deadline is not None:
+            conn.set_progress_handler(None, 0)
+
+    if cursor.description:
+        columns = [description[0] for description in cursor.description]
+
+        data = []
+        for row in rows:
+            data.append(dict(zip(columns, row)))
+
+        return {"columns": columns, "data": data}
+    else:
+        return {"message": "Query executed successfully (no data returned)."}
@@ -0,0 +1,168 @@
+import re
+from typing import Any, Callable, Dict, List, Optional
+
+# Helpers shared by the query rewrites that redirect single-table aggregate queries
+# to derived tables (summary tables, samples). They recognize a deliberately narrow
+# SQL shape with regular expressions; anything else is left to run unchanged.
+
+IDENT = r'(?:\[[^\]]+\]|"(?:[^"]|"")+"|`[^`]+`|[A-Za-z_]\w*)'
+_CLAUSE_KEYWORDS = r"(?:WHERE|GROUP|HAVING|ORDER|LIMIT|WINDOW)"
+FROM_CLAUSE = re.compile(
+    rf"\bFROM\s+(?P<table>{IDENT})(?:\s+(?:AS\s+)?(?!{_CLAUSE_KEYWORDS}\b)[A-Za-z_]\w*)?\s*(?=$|;|\b{_CLAUSE_KEYWORDS}\b)",
+    re.IGNORECASE
+)
+GROUP_BY = re.compile(r"\bGROUP\s+BY\s+(?P<columns>.*?)\s*(?=\bHAVING\b|\bORDER\b|\bLIMIT\b|;|$)", re.IGNORECASE | re.DOTALL)
+AGG_CALL = re.compile(r"\b(SUM|TOTAL|COUNT|AVG|MIN|MAX)\s*\(\s*(DISTINCT\s+)?(\*|[^()]*?)\s*\)", re.IGNORECASE)
+SELECT_LIST = re.compile(r"\s*SELECT\s+(?P<items>.*?)\s+FROM\b", re.IGNORECASE | re.DOTALL)
+# Shapes a derived table can't answer: several tables, nested queries, non-decomposable aggregates
+_UNSUPPORTED = re.compile(
+    r"\b(?:JOIN|UNION|INTERSECT|EXCEPT|WITH|OVER|GROUP_CONCAT|STRING_AGG|JSON_GROUP_ARRAY|JSON_GROUP_OBJECT|ROWID)\b|\(\s*SELECT\b",
+    re.IGNORECASE
+)
+_ALIAS = re.compile(rf"(?:\)|\w|\]|\"|`)\s+(?:AS\s+)?(?!END\b)(?P<alias>{IDENT})\s*$", re.IGNORECASE)
+
+
+class NotRewritable(Exception):
+    """Raised by aggregate replacements that can't express a call on the derived table."""
+
+
+def unquote(identifier: str) -> str:
+    identifier = identifier.strip()
+    if identifier[:1] in ('[', '`'):
+        return identifier[1:-1]
+    if identifier[:1] == '"':
+        return identifier[1:-1].replace('""', '"')
+    return identifier
+
+
+def quote(name: str) -> str:
+    # Backticks, not double quotes: SQLite reads an unknown "name" as a string literal,
+    # which would turn a column missing from a derived table into a silently wrong answer
+    return '`' + name.replace('`', '``') + '`'
+
+
+def backtick_identifiers(sql: str) -> str:
+    """Rewrites "double-quoted" identifiers with backticks, leaving 'string literals' alone."""
+    out, i = [], 0
+    while i < len(sql):
+        ch = sql[i]
+        if ch in "'`[":
+            end_char = ']' if ch == '[' else ch
+            end = sql.find(end_char, i + 1)
+            end = len(sql) - 1 if end == -1 else end
+            out.append(sql[i:end + 1])
+            i = end + 1
+        elif ch == '"':
+            end = i + 1
+            while end < len(sql) and not (sql[end] == '"' and sql[end + 1:end + 2] != '"'):
+                end += 2 if sql[end] == '"' else 1
+            out.append(quote(sql[i + 1:end].replace('""', '"')))
+            i = end + 1
+        else:
+            out.append(ch)
+            i += 1
+    return "".join(out)
+
+
+def column_name(expression: str) -> Optional[str]:
+    """Bare (optionally table-qualified) column reference -> column name; None for expressions."""
+    match = re.fullmatch(rf"(?:{IDENT}\s*\.\s*)?({IDENT})", expression.strip())
+    return unquote(match.group(1)) if match else None
+
+
+def select_alias(item: str) -> Optional[str]:
+    """The alias of a SELECT list item (`SUM(x) AS total`, `COUNT(*) n`), if any."""
+    match = _ALIAS.search(item.strip())
+    return unquote(match.group("alias")) if match else None
+
+
+def split_top_level(text: str) -> List[str]:
+    """Splits on commas that are not inside parentheses or quotes."""
+    parts, depth, quote_char, current = [], 0, None, []
+    for ch in text:
+        if quote_char:
+            quote_char = None if ch == quote_char else quote_char
+        elif ch in "'\"`":
+            quote_char = ch
+        elif ch == '[':
+            quote_char = ']'
+        elif ch == '(':
+            depth += 1
+        elif ch == ')':
+            depth -= 1
+        elif ch == ',' and depth == 0:
+            parts.append("".join(current))
+            current = []
+            continue
+        current.append(ch)
+    parts.append("".join(current))
+    return parts
+
+
+def parse_aggregate_query(sql: str) -> Optional[Dict[str, Any]]:
+    """
+    Recognizes single-table aggregate queries ("total X by Y"). Returns the base table,
+    the bare GROUP BY columns (None when grouping by expressions) and the aggregate
+    functions used, or None.
+    """
+    sql = sql.strip().rstrip(";")
+    if _UNSUPPORTED.search(sql) or len(re.findall(r"\bFROM\b", sql, re.IGNORECASE)) != 1:
+        return None
+    from_clause = FROM_CLAUSE.search(sql)
+    if from_clause is None:
+        return None
+    calls = list(AGG_CALL.finditer(sql))
+    group_by = GROUP_BY.search(sql)
+    if not calls and not group_by:
+        return None
+    if any(call.group(2) for call in calls):
+        return None  # COUNT(DISTINCT x) can't be re-aggregated
+
+    columns = []
+    if group_by:
+        for part in split_top_level(group_by.group("columns")):
+            name = column_name(part)
+            if name is None:
+                columns = None
+                break
+            columns.append(name)
+    return {
+        "table": unquote(from_clause.group("table")),
+        "group_by": columns,
+        "functions": {call.group(1).upper() for call in calls},
+    }
+
+
+def rewrite_aggregate_query(sql: str, table: str, replace_call: Callable[[str, str], str],
+                            extra_items: Callable[[str, str], List[str]] = None) -> Optional[str]:
+    """
+    Points a single-table aggregate query at `table`, replacing every aggregate call with
+    `replace_call(function, argument)`. Un-aliased rewritten items keep their original
+    text as column name. `extra_items(item, column)` may append hidden SELECT items.
+    Returns None when a replacement raises NotRewritable.
+    """
+    original = sql.strip().rstrip(";")
+    sql = backtick_identifiers(original)
+    select, original_select = SELECT_LIST.match(sql), SELECT_LIST.match(original)
+    if select is None or original_select is None:
+        return None
+
+    substitute = lambda text: AGG_CALL.sub(lambda call: replace_call(call.group(1).upper(), call.group(3)), text)
+    try:
+        items, extras = [], []
+        for item, original_item in zip(split_top_level(select.group("items")), split_top_level(original_select.group("items"))):
+            rewritten, column = substitute(item).strip(), select_alias(original_item) or original_item.strip()
+            if rewritten != item.strip() and select_alias(item) is None:
+                rewritten = f"{rewritten} AS {quote(column)}"
+            items.append(rewritten)
+            if extra_items:
+                extras.extend(extra_items(item.strip(), column))
+        rest = substitute(sql[select.end("items"):])
+    except NotRewritable:
+        return None
+
+    from_clause = FROM_CLAUSE.search(rest)
+    if from_clause is None:
+        return None
+    rest = rest[:from_clause.start("table")] + quote(table) + rest[from_clause.end("table"):]
+    return sql[:select.start("items")] + ", ".join(items + extras) + rest
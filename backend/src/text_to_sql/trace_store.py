@@ -0,0 +1,212 @@
+import json
+import os
+import random
+import sqlite3
+import threading
+import time
+import uuid
+import zlib
+from collections import deque
+from typing import Any, Dict, List, Optional
+
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage
+
+from .config_loader import GLOBAL_CONFIG
+
+_BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Kept in the trace inputs (schema, history) or owned by the caller (pool), not in each step
+_SKIPPED_FIELDS = ("connection_pool", "schema", "chat_history", "trace_id")
+
+
+def messages_to_json(messages: List[BaseMessage]) -> List[Dict[str, str]]:
+    return [{"role": "assistant" if isinstance(m, AIMessage) else "user", "content": str(m.content)}
+            for m in messages or []]
+
+
+def messages_from_json(messages: List[Dict[str, str]]) -> List[BaseMessage]:
+    return [AIMessage(content=m["content"]) if m["role"] == "assistant" else HumanMessage(content=m["content"])
+            for m in messages or []]
+
+
+def _compact(update: Dict[str, Any], max_rows: int) -> Dict[str, Any]:
+    """A state update without the large fields; result rows past `max_rows` are counted, not kept."""
+    compact = {k: v for k, v in (update or {}).items() if k not in _SKIPPED_FIELDS}
+    result = compact.get("result")
+    if isinstance(result, dict) and len(result.get("data") or []) > max_rows:
+        compact["result"] = {**result, "data": result["data"][:max_rows], "row_count": len(result["data"])}
+    # Copied now: later nodes update the same result dict in place
+    return json.loads(json.dumps(compact, default=str))
+
+
+def row_count(result: Optional[Dict[str, Any]]) -> Optional[int]:
+    if not isinstance(result, dict) or "data" not in result:
+        return None
+    return result.get("row_count", len(result["data"]))
+
+
+class TraceStore:
+    """
+    Traces of workflow runs: the inputs of a query and every node transition (state
+    update and duration), kept in a local SQLite file as zlib-compressed JSON, one row
+    per query. Steps are buffered in memory and written once the run ends.
+    `benchmarks/replay_traces.py` replays them offline.
+    """
+
+    def __init__(self, path: str, config: Dict[str, Any] = None):
+        self.config = config if config is not None else GLOBAL_CONFIG.get('tracing', {})
+        self.path = path
+        self._pending: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+        self._initialized = False
+
+    @property
+    def enabled(self) -> bool:
+        return self.config.get('enabled', False)
+
+    def _connect(self) -> sqlite3.Connection:
+        if not self._initialized:
+            # Created on first use: tracing is off by default
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            with sqlite3.connect(self.path, timeout=5) as conn:
+                conn.execute("PRAGMA journal_mode=WAL")
+                conn.execute(
+                    "CREATE TABLE IF NOT EXISTS traces ("
+                    "trace_id TEXT PRIMARY KEY, created_at REAL NOT NULL, question TEXT NOT NULL, "
+                    "db_path TEXT NOT NULL, status TEXT NOT NULL, total_ms REAL NOT NULL, "
+                    "nodes TEXT NOT NULL, payload BLOB NOT NULL)"
+                )
+            self._initialized = True
+        return sqlite3.connect(self.path, timeout=5)
+
+    # --- Recording ---
+
+    def start(self, inputs: Dict[str, Any]) -> Optional[str]:
+        """Opens a trace for a run (subject to `sample_rate`); returns its id, or None when not traced."""
+        if not self.enabled or random.random() >= self.config.get('sample_rate', 1.0):
+            return None
+        trace_id = uuid.uuid4().hex
+        inputs = {k: v for k, v in inputs.items() if k != "connection_pool"}
+        inputs["chat_history"] = messages_to_json(inputs.get("chat_history"))
+        with self._lock:
+            self._pending[trace_id] = {"inputs": inputs, "steps": [], "created_at": time.time(),
+                                       "started": time.perf_counter()}
+        return trace_id
+
+    def record_step(self, trace_id: str, node: str, started: float, seconds: float, update: Dict[str, Any]):
+        with self._lock:
+            trace = self._pending.get(trace_id)
+            if trace is None:
+                return
+            trace["steps"].append({
+                "node": node,
+                "offset_ms": round((started - trace["started"]) * 1000, 3),
+                "ms": round(seconds * 1000, 3),
+                "update": _compact(update, self.config.get('max_result_rows', 20)),
+            })
+
+    def finish(self, trace_id: Optional[str], final_state: Dict[str, Any] = None, error: str = None):
+        """Writes the trace of a finished run (`error`: the run raised instead of returning)."""
+        if trace_id is None:
+            return
+        with self._lock:
+            trace = self._pending.pop(trace_id, None)
+        if trace is None:
+            return
+        total_ms = (time.perf_counter() - trace["started"]) * 1000
+        final_state = final_state or {}
+        error = error or final_state.get("error")
+        trace["final"] = {
+            "sql": final_state.get("sql"),
+            "error": error,
+            "error_class": final_state.get("error_class"),
+            "retry_count": final_state.get("retry_count"),
+            "row_count": row_count(final_state.get("result")),
+        }
+        payload = zlib.compress(json.dumps(
+            {k: v for k, v in trace.items() if k != "started"}, default=str
+        ).encode("utf-8"))
+        try:
+            with self._connect() as conn:
+                conn.execute(
+                    "INSERT OR REPLACE INTO traces VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                    (trace_id, trace["created_at"], trace["inputs"].get("question", ""),
+                     trace["inputs"].get("db_path", ""), "error" if error else "ok", round(total_ms, 3),
+                     ">".join(s["node"] for s in trace["steps"]), payload)
+                )
+                # Oldest traces go first past the limit
+                conn.execute(
+                    "DELETE FROM traces WHERE trace_id NOT IN "
+                    "(SELECT trace_id FROM traces ORDER BY created_at DESC LIMIT ?)",
+                    (self.config.get('max_traces', 10000),)
+                )
+        except sqlite3.Error as e:
+            # A trace is never worth failing the query
+            print(f"Trace {trace_id} not written: {e}")
+
+    # --- Reading ---
+
+    def get(self, trace_id: str) -> Optional[Dict[str, Any]]:
+        with self._connect() as conn:
+            row = conn.execute("SELECT trace_id, total_ms, payload FROM traces WHERE trace_id = ?", (trace_id,)).fetchone()
+        if row is None:
+            return None
+        return {"trace_id": row[0], "total_ms": row[1], **json.loads(zlib.decompress(row[2]))}
+
+    def list(self, limit: int = 20, slowest: bool = False, min_ms: float = 0) -> List[Dict[str, Any]]:
+        """Trace summaries, most recent (or slowest) first."""
+        order = "total_ms DESC" if slowest else "created_at DESC"
+        with self._connect() as conn:
+            rows = conn.execute(
+                f"SELECT trace_id, created_at, question, db_path, status, total_ms, nodes FROM traces "
+                f"WHERE total_ms >= ? ORDER BY {order} LIMIT ?", (min_ms, limit)
+            ).fetchall()
+        columns = ["trace_id", "created_at", "question", "db_path", "status", "total_ms", "nodes"]
+        return [dict(zip(columns, row)) for row in rows]
+
+
+class ReplayGenerator:
+    """
+    Stands in for LLMGenerator when a trace is replayed: SQL and explanations come from
+    the trace's recorded node outputs, in order, and a recorded generation failure is
+    raised again. With `simulate_latency`, each answer waits as long as the recorded node.
+    """
+
+    def __init__(self, trace: Dict[str, Any], simulate_latency: bool = False):
+        steps = trace.get("steps", [])
+        self._generations = deque(s for s in steps if s["node"] == "generate")
+        self._explanations = deque(s for s in steps if s["node"] == "explain")
+        self.simulate_latency = simulate_latency
+
+    def _next(self, recorded: deque) -> Dict[str, Any]:
+        if not recorded:
+            raise RuntimeError("Replay: the trace has no more recorded LLM outputs for this step.")
+        step = recorded.popleft()
+        if self.simulate_latency:
+            time.sleep(step["ms"] / 1000)
+        return step["update"]
+
+    def generate_query(self, **kwargs) -> str:
+        update = self._next(self._generations)
+        if update.get("error"):
+            raise RuntimeError(update["error"].replace("Generation Error: ", "", 1))
+        return update["sql"]
+
+    def generate_candidates(self, n: int = 1, **kwargs) -> List[str]:
+        update = self._next(self._generations)
+        if update.get("error"):
+            raise RuntimeError(update["error"].replace("Generation Error: ", "", 1))
+        return update.get("sql_candidates") or [update["sql"]]
+
+    def generate_explanation(self, **kwargs) -> str:
+        update = self._next(self._explanations)
+        return (update.get("result") or {}).get("message", "")
+
+
+def build_trace_store() -> TraceStore:
+    config = GLOBAL_CONFIG.get('tracing', {})
+    path = config.get('sqlite_path') or os.path.join(_BACKEND_DIR, 'state', 'traces.db')
+    return TraceStore(path, config)
+
+
+TRACES = build_trace_store()
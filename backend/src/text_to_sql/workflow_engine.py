@@ -1,10 +1,22 @@
+import hashlib
+import os
+import threading
+import time
 from typing import TypedDict, Annotated, Dict, Any, List
 from langchain_core.messages import BaseMessage
-from langgraph.graph import StateGraph, END
 from .llm_generator import LLMGenerator
 from .sql_safety import validate_sql_safety, SQLSecurityError
-from .sql_executor import execute_query_and_format
-from .schema_inspector import get_db_schema
+from .sql_executor import ReadOnlyConnectionPool
+from .preaggregations import PREAGGREGATIONS
+from .approximate import APPROXIMATE, approximation_note
+from .fulltext import FULLTEXT
+from .candidates import select_candidate
+from .example_store import EXAMPLES, schema_fingerprint
+from .schema_inspector import get_cached_db_schema
+from .shared_cache import SQL_CACHE, RESULT_CACHE, database_key
+from .error_classifier import SECURITY, TRANSIENT, FATAL, RetryPolicy, classify_error, targeted_feedback
+from .metrics import METRICS
+from .trace_store import TRACES
 from .config_loader import GLOBAL_CONFIG
 
 class AgentState(TypedDict):
@@ -19,76 +31,237 @@ class AgentState(TypedDict):
     explanation: str
     provider: str
     model_name: str
+    connection_pool: ReadOnlyConnectionPool
+    explain_mode: str
+    approximate: bool
+    error_class: str
+    error_step: str
+    attempts: Dict[str, int]
+    candidates: int
+    sql_candidates: List[str]
+    trace_id: str
 
 class WorkflowEngine:
     def __init__(self):
         self.llm_generator = LLMGenerator()
         self.max_retries = GLOBAL_CONFIG.get('settings', {}).get('max_retries', 3)
-        self.workflow = self._build_graph()
+        self.retry_policy = RetryPolicy()
+        # Compiled on first use (or by warm_up): LangGraph is slow to import
+        self._workflow = None
+        self._workflow_lock = threading.Lock()
+
+    @property
+    def workflow(self):
+        if self._workflow is None:
+            with self._workflow_lock:
+                if self._workflow is None:
+                    self._workflow = self._build_graph()
+        return self._workflow
+
+    def warm_up(self):
+        """Compiles the graph ahead of the first query (called in the background at startup)."""
+        self.workflow
 
     def _build_graph(self):
+        from langgraph.graph import StateGraph, END
+
         workflow = StateGraph(AgentState)
 
         # Define Nodes
-        workflow.add_node("generate", self.generate_step)
-        workflow.add_node("execute", self.execute_step)
-        workflow.add_node("explain", self.explain_step)
+        workflow.add_node("generate", self._traced("generate", self.generate_step))
+        workflow.add_node("execute", self._traced("execute", self.execute_step))
+        workflow.add_node("explain", self._traced("explain", self.explain_step))
+        workflow.add_node("backoff", self._traced("backoff", self.backoff_step))
 
         # Define Edges
         workflow.set_entry_point("generate")
-        workflow.add_edge("generate", "execute")
+        workflow.add_conditional_edges(
+            "generate",
+            self.check_generation_status,
+            {"execute": "execute", "backoff": "backoff", "error": END}
+        )
         
-        # Conditional edge Check Execution -> (Retry / Explain / Error)
+        # Conditional edge Check Execution -> (Retry / Backoff / Explain / Done / Error)
         workflow.add_conditional_edges(
             "execute",
             self.check_execution_status,
             {
                 "success": "explain", # Go to explanation on success
-                "retry": "generate",
+                "done": END, # Success without inline explanation ('none' / 'deferred')
+                "retry": "generate", # Syntax/schema errors: regenerate with feedback
+                "backoff": "backoff", # Transient errors: wait, then run the same SQL again
                 "error": END
             }
         )
+        # After the wait, repeat the step that failed
+        workflow.add_conditional_edges(
+            "backoff",
+            lambda state: state['error_step'],
+            {"generate": "generate", "execute": "execute"}
+        )
         
         # Explain -> END
         workflow.add_edge("explain", END)
 
         return workflow.compile()
 
+    @staticmethod
+    def _traced(node: str, step):
+        """Records the node's state update and duration in the run's trace, when it has one."""
+        def run_step(state: AgentState) -> AgentState:
+            trace_id = state.get('trace_id')
+            if not trace_id:
+                return step(state)
+            started = time.perf_counter()
+            update = step(state)
+            TRACES.record_step(trace_id, node, started, time.perf_counter() - started, update)
+            return update
+        return run_step
+
     def generate_step(self, state: AgentState) -> AgentState:
         print(f"--- GENERATING SQL (Attempt {state['retry_count'] + 1}) ---")
+        # A question already answered on this database (by any worker) reuses its SQL
+        key = self._sql_cache_key(state)
+        if key and state['retry_count'] == 0:
+            cached_sql = SQL_CACHE.get(key)
+            if cached_sql:
+                METRICS.increment("cache.sql_hits")
+                return {"sql": cached_sql, "sql_candidates": None, "retry_count": 1, "error": None, "error_class": None}
+        # A standalone question already answered on a schema of the same shape reuses that SQL
+        examples_config = GLOBAL_CONFIG.get('examples', {})
+        examples = []
+        if examples_config.get('enabled', True):
+            fingerprint = schema_fingerprint(state['schema'])
+            if state['retry_count'] == 0 and not state.get('chat_history') and examples_config.get('exact_match', True):
+                known_sql = EXAMPLES.exact(fingerprint, state['question'], state.get('provider'), state.get('model_name'))
+                if known_sql:
+                    METRICS.increment("examples.exact_hits")
+                    return {"sql": known_sql, "sql_candidates": None, "retry_count": 1, "error": None, "error_class": None}
+            examples = EXAMPLES.similar(fingerprint, state['question'])
+            METRICS.increment("examples.injected", len(examples))
+
+        # Only SQL errors are fed back; a failed LLM call is simply repeated
+        error = state.get('error') if state.get('error_step') == "execute" else None
+        correction = None
+        if error:
+            correction = targeted_feedback(state.get('error_class'), error, state['sql'], state['schema'])
         try:
+            if (state.get('candidates') or 1) > 1:
+                # Several candidates at once, settled by execute_step
+                candidates = self.llm_generator.generate_candidates(
+                    question=state['question'],
+                    schema=state['schema'],
+                    n=state['candidates'],
+                    chat_history=state['chat_history'],
+                    error=error,
+                    correction=correction,
+                    examples=examples,
+                    provider=state.get('provider'),
+                    model_name=state.get('model_name')
+                )
+                return {"sql": candidates[0], "sql_candidates": candidates,
+                        "retry_count": state['retry_count'] + 1, "error": None, "error_class": None}
             sql = self.llm_generator.generate_query(
                 question=state['question'],
                 schema=state['schema'],
                 chat_history=state['chat_history'],
-                error=state.get('error'),
+                error=error,
+                correction=correction,
+                examples=examples,
                 provider=state.get('provider'),
                 model_name=state.get('model_name')
             )
-            return {"sql": sql, "retry_count": state['retry_count'] + 1}
+            return {"sql": sql, "sql_candidates": None, "retry_count": state['retry_count'] + 1, "error": None, "error_class": None}
         except Exception as e:
-             return {"error": f"Generation Error: {str(e)}"}
+            return self._failure(state, f"Generation Error: {str(e)}", "generate")
+
+    def _failure(self, state: AgentState, error: str, step: str) -> AgentState:
+        """Records a failed step: its error class and the per-class failure count."""
+        error_class = classify_error(error, generation=step == "generate")
+        attempts = dict(state.get('attempts') or {})
+        attempts[error_class] = attempts.get(error_class, 0) + 1
+        return {"error": error, "error_class": error_class, "error_step": step, "attempts": attempts, "result": None}
+
+    def backoff_step(self, state: AgentState) -> AgentState:
+        attempt = state['attempts'].get(TRANSIENT, 1)
+        delay = self.retry_policy.backoff_seconds(attempt)
+        print(f"--- TRANSIENT ERROR, RETRYING {state['error_step'].upper()} IN {delay:.2f}s ---")
+        METRICS.increment("retries.attempts", label=TRANSIENT)
+        if state['error_step'] == "execute":
+            # The same SQL runs again: no regeneration round-trip
+            METRICS.increment("retries.llm_calls_saved", label=TRANSIENT)
+        time.sleep(delay)
+        return {}
 
     def execute_step(self, state: AgentState) -> AgentState:
         print("--- EXECUTING SQL ---")
         sql = state['sql']
+        pool = state.get('connection_pool')
+
+        if len(state.get('sql_candidates') or []) > 1:
+            # Candidates run in parallel; the result most of them agree on wins
+            chosen = select_candidate(state['sql_candidates'], state['db_path'], pool=pool,
+                                      execute=lambda sql, pool, deadline: self._run_sql(state, sql, pool, deadline))
+            if chosen["error"]:
+                return self._failure(state, chosen["error"], "execute")
+            self._remember(state, chosen["sql"])
+            return {"result": chosen["result"], "error": None, "sql": chosen["sql"]}
         
         # 1. Safety Check
         try:
             safe_sql = validate_sql_safety(sql)
         except SQLSecurityError as e:
-            return {"error": str(e), "result": None}
+            return self._failure(state, str(e), "execute")
         except Exception as e:
-            return {"error": f"Safety Check Error: {str(e)}", "result": None}
+            return self._failure(state, f"Safety Check Error: {str(e)}", "execute")
 
         # 2. Execution
-        result = execute_query_and_format(safe_sql, state['db_path'])
-        
+        result = self._run_sql(state, safe_sql, pool)
         if "error" in result:
-            return {"error": result["error"], "result": None}
+            return self._failure(state, result["error"], "execute")
+        self._remember(state, safe_sql)
         
         return {"result": result, "error": None, "sql": safe_sql}
 
+    def _run_sql(self, state: AgentState, safe_sql: str, pool: ReadOnlyConnectionPool = None,
+                 deadline: float = None) -> Dict[str, Any]:
+        """
+        Runs validated SQL from the result cache, else from an exact summary table, then the
+        sample in approximate mode, then the table (substring filters through its full-text
+        index when it has one). Used for the single query and for each candidate.
+        """
+        result_key = database_key(state['db_path'], "approx" if state.get('approximate') else "exact", safe_sql)
+        result = RESULT_CACHE.get(result_key)
+        if result is not None:
+            METRICS.increment("cache.result_hits")
+            return result
+        if state.get('approximate'):
+            result = PREAGGREGATIONS.try_execute(safe_sql, state['db_path'], pool=pool, deadline=deadline) \
+                or APPROXIMATE.execute(safe_sql, state['db_path'], pool=pool, deadline=deadline)
+        if result is None:
+            result = FULLTEXT.try_execute(safe_sql, state['db_path'], pool=pool, deadline=deadline) \
+                or PREAGGREGATIONS.execute(safe_sql, state['db_path'], pool=pool, deadline=deadline)
+
+        if "error" not in result and len(result.get("data", [])) <= GLOBAL_CONFIG.get('cache', {}).get('result_max_rows', 1000):
+            RESULT_CACHE.set(result_key, result)
+        return result
+
+    def _remember(self, state: AgentState, sql: str):
+        """Keeps the SQL of a successful standalone question for the SQL cache and the example store."""
+        key = self._sql_cache_key(state)
+        if key:
+            SQL_CACHE.set(key, sql)
+            if GLOBAL_CONFIG.get('examples', {}).get('enabled', True):
+                EXAMPLES.add(schema_fingerprint(state['schema']), state['question'], sql, state.get('provider'), state.get('model_name'))
+
+    @staticmethod
+    def _sql_cache_key(state: AgentState):
+        # Follow-up questions depend on the conversation, so only standalone ones are cached
+        if state.get('chat_history'):
+            return None
+        fingerprint = "\n".join([str(state.get('provider')), str(state.get('model_name')), state['schema'], state['question'].strip()])
+        return database_key(state['db_path'], hashlib.sha1(fingerprint.encode("utf-8")).hexdigest())
+
     def explain_step(self, state: AgentState) -> AgentState:
         print("--- GENERATING EXPLANATION ---")
         result_data = state['result'].get('data', [])
@@ -102,7 +275,8 @@ class WorkflowEngine:
             sql=state['sql'],
             data=result_data,
             provider=state.get('provider'),
-            model_name=state.get('model_name')
+            model_name=state.get('model_name'),
+            note=approximation_note(state['result'])
         )
         
         # Augment the result object with the message/explanation
@@ -110,19 +284,42 @@ class WorkflowEngine:
         new_result['message'] = explanation
         return {"result": new_result}
 
+    def check_generation_status(self, state: AgentState):
+        if not state.get('error'):
+            return "execute"
+        return self._route_failure(state)
+
     def check_execution_status(self, state: AgentState):
         if state.get('error'):
-            if "Security Violation" in state['error']:
-                return "error" # Stop immediately on security issues
-            
-            if state['retry_count'] < self.max_retries:
-                return "retry"
-            else:
-                return "error"
+            return self._route_failure(state)
+        if state.get('explain_mode', 'inline') != 'inline':
+            return "done"
         return "success"
 
-    def run(self, question: str, db_path: str, chat_history: List[BaseMessage], provider: str = None, model_name: str = None):
-        schema = get_db_schema(db_path)
+    def _route_failure(self, state: AgentState) -> str:
+        error_class, attempts = state['error_class'], state.get('attempts') or {}
+        if error_class in (SECURITY, FATAL):
+            # Stop immediately; the old loop regenerated until max_retries regardless
+            if error_class == FATAL and state['error_step'] == "execute":
+                METRICS.increment("retries.llm_calls_saved", max(0, self.max_retries - state['retry_count']), label=FATAL)
+            return "error"
+        if not self.retry_policy.allows(error_class, attempts.get(error_class, 0)):
+            METRICS.increment("retries.exhausted", label=error_class)
+            return "error"
+        if error_class == TRANSIENT:
+            return "backoff"
+        if state['retry_count'] >= self.max_retries:
+            METRICS.increment("retries.exhausted", label=error_class)
+            return "error"
+        METRICS.increment("retries.attempts", label=error_class)
+        return "retry"
+
+    def run(self, question: str, db_path: str, chat_history: List[BaseMessage], provider: str = None, model_name: str = None, schema: str = None, connection_pool: ReadOnlyConnectionPool = None, explain_mode: str = "inline", approximate: bool = False, candidates: int = 1):
+        # Cache keys must use the absolute path invalidate_database drops entries by
+        db_path = os.path.abspath(db_path)
+        # Callers holding a cached schema (e.g. sessions) skip re-introspection
+        if schema is None:
+            schema = get_cached_db_schema(db_path)
         if schema.startswith("Error"):
             return {"error": schema}
 
@@ -137,7 +334,26 @@ class WorkflowEngine:
             "db_path": db_path,
             "explanation": "",
             "provider": provider,
-            "model_name": model_name
+            "model_name": model_name,
+            "connection_pool": connection_pool,
+            "explain_mode": explain_mode,
+            "approximate": approximate,
+            "error_class": None,
+            "error_step": None,
+            "attempts": {},
+            "candidates": candidates,
+            "sql_candidates": None
         }
         
-        return self.workflow.invoke(initial_state)
\ No newline at end of file
+        trace_id = TRACES.start(initial_state)
+        if trace_id:
+            initial_state["trace_id"] = trace_id
+        try:
+            final_state = self.workflow.invoke(initial_state)
+        except Exception as e:
+            TRACES.finish(trace_id, error=str(e))
+            raise
+        TRACES.finish(trace_id, final_state)
+        # The pool belongs to the caller and is not part of the response
+        final_state.pop("connection_pool", None)
+        return final_state
\ No newline at end of file
@@ -0,0 +1,326 @@
+import os
+import sqlite3
+import threading
+import time
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from text_to_sql.config_loader import GLOBAL_CONFIG
+from text_to_sql.schema_inspector import schema_snapshot_path
+from text_to_sql.shared_cache import invalidate_database
+from text_to_sql.sql_executor import READ_POOLS, prewarm
+
+_BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+_lifecycle_config = GLOBAL_CONFIG.get('lifecycle', {})
+# Converted databases and upload temp files
+DB_DIR = os.path.abspath(_lifecycle_config.get('databases_dir') or os.path.join(_BACKEND_DIR, 'databases'))
+TEMP_DIR = os.path.abspath(_lifecycle_config.get('temp_dir') or os.path.join(_BACKEND_DIR, 'temp'))
+
+
+class DatabaseRegistry:
+    """
+    Tracks every database under backend/databases: owner, size, source file and access times.
+
+    Entries are mirrored in memory so request-time checks are dictionary lookups;
+    the SQLite table keeps them across restarts and between workers. Access times
+    are updated in memory and written back by `flush`.
+    """
+
+    def __init__(self, path: str, db_dir: str = DB_DIR):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.path = path
+        self.db_dir = os.path.abspath(db_dir)
+        self._entries: Dict[str, Dict[str, Any]] = {}
+        self._dirty = set()
+        self._lock = threading.Lock()
+        with self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS databases ("
+                "db_path TEXT PRIMARY KEY, owner TEXT, source_filename TEXT, size_bytes INTEGER NOT NULL, "
+                "created_at REAL NOT NULL, last_accessed_at REAL NOT NULL, maintained_at REAL)"
+            )
+            for row in conn.execute("SELECT * FROM databases"):
+                self._entries[row["db_path"]] = dict(row)
+        self.adopt_existing()
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=5)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def adopt_existing(self):
+        """Registers databases present on disk but unknown to the registry (e.g. older uploads)."""
+        if not os.path.isdir(self.db_dir):
+            return
+        for name in os.listdir(self.db_dir):
+            path = os.path.join(self.db_dir, name)
+            if name.endswith('.db') and path not in self._entries:
+                self.register(path)
+
+    def register(self, db_path: str, owner: str = None, source_filename: str = None):
+        db_path = os.path.abspath(db_path)
+        now = time.time()
+        entry = {
+            "db_path": db_path,
+            "owner": owner,
+            "source_filename": source_filename,
+            "size_bytes": os.path.getsize(db_path) if os.path.exists(db_path) else 0,
+            "created_at": now,
+            "last_accessed_at": now,
+            "maintained_at": None,
+        }
+        with self._lock:
+            self._entries[db_path] = entry
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO databases VALUES (:db_path, :owner, :source_filename, :size_bytes, "
+                ":created_at, :last_accessed_at, :maintained_at)", entry
+            )
+        return entry
+
+    def resolve(self, db_path: str) -> Optional[str]:
+        """
+        Returns the registered absolute path for `db_path` (absolute, or a bare file name
+        inside the databases directory), or None. No filesystem access on the hot path.
+        """
+        candidates = [os.path.abspath(db_path), os.path.join(self.db_dir, os.path.basename(db_path))]
+        for candidate in candidates:
+            if candidate in self._entries:
+                return candidate
+        # Another worker may have registered it since we loaded the table
+        for candidate in candidates:
+            if os.path.dirname(candidate) != self.db_dir:
+                continue
+            with self._connect() as conn:
+                row = conn.execute("SELECT * FROM databases WHERE db_path = ?", (candidate,)).fetchone()
+            if row is not None:
+                with self._lock:
+                    self._entries[candidate] = dict(row)
+                return candidate
+        return None
+
+    def touch(self, db_path: str):
+        with self._lock:
+            entry = self._entries.get(db_path)
+            if entry is not None:
+                entry["last_accessed_at"] = time.time()
+                self._dirty.add(db_path)
+
+    def get(self, db_path: str) -> Optional[Dict[str, Any]]:
+        entry = self._entries.get(os.path.abspath(db_path))
+        return dict(entry) if entry else None
+
+    def entries(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            return [dict(e) for e in self._entries.values()]
+
+    def update(self, db_path: str, **fields):
+        with self._lock:
+            entry = self._entries.get(db_path)
+            if entry is None:
+                return
+            entry.update(fields)
+        assignments = ", ".join(f"{name} = ?" for name in fields)
+        with self._connect() as conn:
+            conn.execute(f"UPDATE databases SET {assignments} WHERE db_path = ?", (*fields.values(), db_path))
+
+    def remove(self, db_path: str, delete_file: bool = False):
+        db_path = os.path.abspath(db_path)
+        with self._lock:
+            self._entries.pop(db_path, None)
+            self._dirty.discard(db_path)
+        with self._connect() as conn:
+            conn.execute("DELETE FROM databases WHERE db_path = ?", (db_path,))
+        invalidate_database(db_path)
+        READ_POOLS.discard(db_path)
+        if delete_file:
+            # SQLite side files and the schema snapshot go with the database
+            for path in (db_path, db_path + "-wal", db_path + "-shm", db_path + "-journal", schema_snapshot_path(db_path)):
+                if os.path.exists(path):
+                    os.remove(path)
+
+    def flush(self):
+        """Writes buffered access times back to the registry table."""
+        with self._lock:
+            rows = [(self._entries[p]["last_accessed_at"], p) for p in self._dirty if p in self._entries]
+            self._dirty.clear()
+        if rows:
+            with self._connect() as conn:
+                conn.executemany("UPDATE databases SET last_accessed_at = ? WHERE db_path = ?", rows)
+
+    def total_size(self) -> int:
+        return sum(e["size_bytes"] for e in self._entries.values())
+
+
+class LifecycleManager:
+    """
+    Background housekeeping for the registry: drops entries whose file is gone, sweeps
+    orphan temp files, evicts least recently used databases above the disk quota and,
+    inside the off-peak window, runs VACUUM/ANALYZE on idle databases.
+    """
+
+    def __init__(self, registry: DatabaseRegistry, config: Dict[str, Any] = None, temp_dir: str = TEMP_DIR):
+        self.registry = registry
+        self.config = config if config is not None else GLOBAL_CONFIG.get('lifecycle', {})
+        self.temp_dir = temp_dir
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._lock_file = None
+
+    def sweep_missing(self) -> List[str]:
+        missing = [e["db_path"] for e in self.registry.entries() if not os.path.exists(e["db_path"])]
+        for path in missing:
+            # Leftover side files (WAL, schema snapshot) go too
+            self.registry.remove(path, delete_file=True)
+        return missing
+
+    def sweep_temp(self) -> List[str]:
+        """Deletes upload temp files older than `temp_max_age_seconds` (left behind by crashed requests)."""
+        if not os.path.isdir(self.temp_dir):
+            return []
+        cutoff = time.time() - self.config.get('temp_max_age_seconds', 3600)
+        removed = []
+        for name in os.listdir(self.temp_dir):
+            path = os.path.join(self.temp_dir, name)
+            if os.path.isfile(path) and os.path.getmtime(path) < cutoff:
+                os.remove(path)
+                removed.append(path)
+        return removed
+
+    def enforce_quota(self) -> List[str]:
+        """Evicts least recently used databases until the total size fits in `max_total_mb`."""
+        max_bytes = self.config.get('max_total_mb', 20480) * 1024 * 1024
+        protect_after = time.time() - self.config.get('min_idle_seconds', 300)
+        total = self.registry.total_size()
+        evicted = []
+        for entry in sorted(self.registry.entries(), key=lambda e: e["last_accessed_at"]):
+            if total <= max_bytes:
+                break
+            if entry["last_accessed_at"] > protect_after:
+                # Everything after this one was used even more recently
+                break
+            self.registry.remove(entry["db_path"], delete_file=True)
+            total -= entry["size_bytes"]
+            evicted.append(entry["db_path"])
+        return evicted
+
+    def in_maintenance_window(self, now: datetime = None) -> bool:
+        start, end = self.config.get('maintenance_hours', [2, 5])
+        hour = (now or datetime.now()).hour
+        return start <= hour < end if start <= end else hour >= start or hour < end
+
+    def maintain(self, force: bool = False) -> List[str]:
+        """VACUUM and ANALYZE idle databases changed since their last maintenance."""
+        if not force and not self.in_maintenance_window():
+            return []
+        idle_before = time.time() - self.config.get('min_idle_seconds', 300)
+        maintained = []
+        for entry in self.registry.entries():
+            path = entry["db_path"]
+            if self._stop.is_set():
+                break
+            if not os.path.exists(path) or entry["last_accessed_at"] > idle_before:
+                continue
+            if entry["maintained_at"] and entry["maintained_at"] >= os.path.getmtime(path):
+                continue
+            try:
+                conn = sqlite3.connect(path, timeout=1)
+                try:
+                    conn.execute("VACUUM")
+                    conn.execute("ANALYZE")
+                    conn.commit()
+                finally:
+                    conn.close()
+            except sqlite3.Error as e:
+                # Busy databases are retried on the next cycle
+                print(f"Maintenance skipped for {path}: {e}")
+                continue
+            self.registry.update(path, size_bytes=os.path.getsize(path), maintained_at=time.time())
+            maintained.append(path)
+        return maintained
+
+    def prewarm(self, budget_mb: float = None) -> List[str]:
+        """
+        Reads the most recently used databases into the OS cache, up to `budget_mb` in total,
+        so the first queries after a restart don't wait for the disk.
+        """
+        budget_mb = budget_mb if budget_mb is not None else GLOBAL_CONFIG.get('read_path', {}).get('prewarm_max_mb', 512)
+        remaining = budget_mb * 1024 * 1024
+        warmed = []
+        for entry in sorted(self.registry.entries(), key=lambda e: e["last_accessed_at"], reverse=True):
+            path = entry["db_path"]
+            if self._stop.is_set() or not os.path.exists(path):
+                continue
+            size = os.path.getsize(path)
+            if size > remaining:
+                continue
+            remaining -= prewarm(path)
+            warmed.append(path)
+        return warmed
+
+    def run_cycle(self) -> Dict[str, List[str]]:
+        self.registry.flush()
+        report = {
+            "missing": self.sweep_missing(),
+            "temp_files": self.sweep_temp(),
+            "evicted": self.enforce_quota(),
+            "maintained": self.maintain(),
+        }
+        if any(report.values()):
+            print("Database lifecycle: " + ", ".join(f"{k}={len(v)}" for k, v in report.items()))
+        return report
+
+    def _acquire_runner_lock(self) -> bool:
+        """With several worker processes, only the one holding this file lock runs housekeeping."""
+        try:
+            import fcntl
+        except ImportError:  # Windows: single-process deployments only
+            return True
+        lock_file = open(os.path.join(os.path.dirname(self.registry.path), 'lifecycle.lock'), 'a')
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            lock_file.close()
+            return False
+        self._lock_file = lock_file
+        return True
+
+    def start(self):
+        if self._thread is not None or not self.config.get('enabled', True):
+            return
+        if not self._acquire_runner_lock():
+            print("Lifecycle housekeeping already runs in another worker.")
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._loop, name="db-lifecycle", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+        if self._lock_file is not None:
+            self._lock_file.close()  # Releases the lock
+            self._lock_file = None
+        self.registry.flush()
+
+    def _loop(self):
+        interval = self.config.get('interval_seconds', 300)
+        while not self._stop.is_set():
+            try:
+                self.run_cycle()
+            except Exception as e:
+                print(f"Database lifecycle cycle failed: {e}")
+            self._stop.wait(interval)
+
+
+def build_registry() -> DatabaseRegistry:
+    """Creates the registry configured by the 'lifecycle' section of llm_config.yaml."""
+    config = GLOBAL_CONFIG.get('lifecycle', {})
+    path = config.get('registry_path') or os.path.join(_BACKEND_DIR, 'state', 'registry.db')
+    return DatabaseRegistry(path)
+
+
+DB_REGISTRY = build_registry()
+LIFECYCLE = LifecycleManager(DB_REGISTRY)
@@ -2,60 +2,109 @@ import pandas as pd
 import sqlite3
 import os
 import uuid
+from typing import Any, Dict, List
+
+from text_to_sql.config_loader import GLOBAL_CONFIG
+from utils.type_inference import infer_types, convert_frame, fit_types, normalize_nulls
+from text_to_sql.preaggregations import PREAGGREGATIONS
+from text_to_sql.approximate import APPROXIMATE, build_sample, refresh_sample
+from text_to_sql.fulltext import FULLTEXT
+from text_to_sql.relationships import drop_broken_keys, infer_relationships
+from text_to_sql.schema_inspector import get_relationships, list_user_tables
+from text_to_sql.shared_cache import invalidate_database
+
+# Internal metadata tables are prefixed so they can be hidden from the schema and previews
+COLUMNS_TABLE = "_af_columns"
+
 
 def convert_to_sqlite(file_path: str, output_dir: str) -> str:
     """
     Converts a CSV or Excel file to a SQLite database.
-    
+
     Args:
         file_path (str): Path to the input file (csv, xls, xlsx).
         output_dir (str): Directory to save the resulting .db file.
-        
+
     Returns:
         str: Absolute path to the generated SQLite database.
     """
     filename = os.path.basename(file_path)
     name, ext = os.path.splitext(filename)
     ext = ext.lower()
-    
+    settings = GLOBAL_CONFIG.get('ingestion', {})
+    typed = settings.get('type_inference', True)
+
+    if ext not in ['.csv', '.xls', '.xlsx']:
+        raise ValueError(f"Unsupported file format: {ext}")
+
     # Generate a unique database name to avoid conflicts
     db_name = f"{name}_{uuid.uuid4().hex[:8]}.db"
     db_path = os.path.join(output_dir, db_name)
-    
+
+    # Small files are built in memory and written to disk in one pass at the end
+    in_memory = typed and os.path.getsize(file_path) <= settings.get('memory_max_mb', 64) * 1024 * 1024
+
     # Create connection
-    conn = sqlite3.connect(db_path)
-    
+    conn = sqlite3.connect(":memory:" if in_memory else db_path)
+
     try:
+        if typed:
+            # The file is new and deleted on failure, so durability can be traded for speed
+            conn.execute("PRAGMA journal_mode=OFF")
+            conn.execute("PRAGMA synchronous=OFF")
+
         if ext == '.csv':
-            # Use chunking and multi-row inserts for performance
-            # SQLite limit is usually 32766 variables. Safe chunk ~= 500 rows for typical wide tables.
-            chunk_size = 1000 
-            first_chunk = True
-            
             # Sanitize table name
             raw_name = "".join([c if c.isalnum() else "_" for c in name])
             table_name = f"data_{raw_name}"
 
-            with pd.read_csv(file_path, chunksize=chunk_size) as reader:
-                for chunk in reader:
-                    if first_chunk:
-                        chunk.to_sql(table_name, conn, if_exists='replace', index=False, method='multi')
-                        first_chunk = False
-                    else:
-                        chunk.to_sql(table_name, conn, if_exists='append', index=False, method='multi')
-            
-        elif ext in ['.xls', '.xlsx']:
+            if typed:
+                column_types = load_csv_typed(file_path, table_name, conn, settings)
+                PREAGGREGATIONS.build_at_upload(conn, table_name, column_types)
+                build_sample(conn, table_name, column_types)
+                FULLTEXT.build_at_upload(conn, table_name, column_types)
+            else:
+                # Use chunking and multi-row inserts for performance
+                # SQLite limit is usually 32766 variables. Safe chunk ~= 500 rows for typical wide tables.
+                chunk_size = 1000
+                first_chunk = True
+
+                with pd.read_csv(file_path, chunksize=chunk_size) as reader:
+                    for chunk in reader:
+                        if first_chunk:
+                            chunk.to_sql(table_name, conn, if_exists='replace', index=False, method='multi')
+                            first_chunk = False
+                        else:
+                            chunk.to_sql(table_name, conn, if_exists='append', index=False, method='multi')
+
+        else:
             xls = pd.ExcelFile(file_path)
             for sheet_name in xls.sheet_names:
-                df = pd.read_excel(xls, sheet_name=sheet_name)
                 # Sanitize sheet name
                 raw_sheet_name = "".join([c if c.isalnum() else "_" for c in sheet_name])
                 table_name = f"data_{raw_sheet_name}"
-                # Write in chunks using method='multi'
-                df.to_sql(table_name, conn, if_exists='replace', index=False, chunksize=1000, method='multi')
-        else:
-            raise ValueError(f"Unsupported file format: {ext}")
-            
+
+                if typed:
+                    df = pd.read_excel(xls, sheet_name=sheet_name, dtype=str)
+                    column_types = infer_types([df], dayfirst=settings.get('dayfirst', True))
+                    create_typed_table(conn, table_name, column_types, strict=settings.get('strict_tables', True))
+                    insert_frame(conn, table_name, convert_frame(df, column_types))
+                    write_column_metadata(conn, table_name, column_types)
+                    PREAGGREGATIONS.build_at_upload(conn, table_name, column_types)
+                    build_sample(conn, table_name, column_types)
+                    FULLTEXT.build_at_upload(conn, table_name, column_types)
+                else:
+                    df = pd.read_excel(xls, sheet_name=sheet_name)
+                    # Write in chunks using method='multi'
+                    df.to_sql(table_name, conn, if_exists='replace', index=False, chunksize=1000, method='multi')
+
+        if typed:
+            # Keys and joins between the sheets, once every table is loaded
+            infer_relationships(conn)
+
+        if in_memory:
+            backup_to_file(conn, db_path)
+
     except Exception as e:
         # Clean up if failed
         conn.close()
@@ -64,5 +113,246 @@ def convert_to_sqlite(file_path: str, output_dir: str) -> str:
         raise e
     finally:
         conn.close()
-        
+
+    finalize_for_reads(db_path)
     return os.path.abspath(db_path)
+
+
+def finalize_for_reads(db_path: str):
+    """
+    Switches a database to WAL mode (the mode is stored in the file), so queries keep
+    reading while rows are appended. Read connections are tuned in sql_executor.
+    """
+    if not GLOBAL_CONFIG.get('read_path', {}).get('wal', True):
+        return
+    conn = sqlite3.connect(db_path, timeout=30)
+    try:
+        conn.execute("PRAGMA journal_mode=WAL")
+    except sqlite3.OperationalError as e:
+        # Busy: the database stays in rollback-journal mode, which reads just as well
+        print(f"WAL mode not enabled for {db_path}: {e}")
+    finally:
+        conn.close()
+
+
+def backup_to_file(conn: sqlite3.Connection, path: str):
+    """Copies a database (e.g. built in memory) to a file with SQLite's online backup API."""
+    target = sqlite3.connect(path)
+    try:
+        conn.backup(target)
+    finally:
+        target.close()
+
+
+def copy_database(db_path: str, output_dir: str) -> str:
+    """
+    Copies a converted database to a new unique name in `output_dir` (rows committed to its
+    WAL included) and returns the copy's absolute path.
+    """
+    # Converted databases are named `<name>_<8 hex>.db`: the copy gets a new suffix
+    name = os.path.splitext(os.path.basename(db_path))[0].rsplit("_", 1)[0]
+    copy_path = os.path.abspath(os.path.join(output_dir, f"{name}_{uuid.uuid4().hex[:8]}.db"))
+    conn = sqlite3.connect(db_path, timeout=30)
+    try:
+        backup_to_file(conn, copy_path)
+    finally:
+        conn.close()
+    finalize_for_reads(copy_path)
+    return copy_path
+
+
+def append_to_sqlite(file_path: str, db_path: str, table: str = None, mode: str = "append", key: str = None) -> Dict[str, Any]:
+    """
+    Loads the rows of a CSV or Excel file into an existing table of a converted database,
+    instead of converting a new database.
+
+    Args:
+        file_path (str): Path to the file with the new rows (same columns as the table).
+        db_path (str): Database created by convert_to_sqlite.
+        table (str): Target table; default: the first data table (for Excel, the sheet of
+            the same name is read, else the first sheet).
+        mode (str): 'append' adds the rows; 'upsert' replaces the rows whose `key` already
+            exists and adds the others.
+        key (str): Upsert key column; default: the primary key inferred at upload.
+
+    Returns:
+        dict: The table, rows inserted and updated, and the table's new row count.
+    """
+    name, ext = os.path.splitext(os.path.basename(file_path))
+    ext = ext.lower()
+    settings = GLOBAL_CONFIG.get('ingestion', {})
+    if ext not in ['.csv', '.xls', '.xlsx']:
+        raise ValueError(f"Unsupported file format: {ext}")
+    if mode not in ("append", "upsert"):
+        raise ValueError(f"Unsupported mode: {mode} (expected 'append' or 'upsert')")
+
+    # Databases converted before WAL finalization: readers aren't blocked by the append either
+    finalize_for_reads(db_path)
+    conn = sqlite3.connect(db_path, timeout=30)
+    try:
+        cursor = conn.cursor()
+        tables = list_user_tables(cursor)
+        table = table or (tables[0] if tables else None)
+        if table not in tables:
+            raise ValueError(f"Table not found: {table}")
+        declared = [row[1] for row in conn.execute(f"PRAGMA table_info({quote_identifier(table)})")]
+        try:
+            stored = {row[0]: {"name": row[0], "logical_type": row[1], "sql_type": row[2]} for row in conn.execute(
+                f"SELECT column_name, logical_type, sql_type FROM {COLUMNS_TABLE} WHERE table_name = ?", (table,)
+            )}
+        except sqlite3.OperationalError:
+            stored = {}
+        if set(stored) != set(declared):
+            raise ValueError("Rows can only be added to tables created with type inference; upload the full file instead.")
+        stored_types = [stored[c] for c in declared]
+
+        if mode == "upsert":
+            key = key or next((c for (t, c), r in get_relationships(cursor).items()
+                               if t == table and r["kind"] == "primary_key"), None)
+            if key not in declared:
+                raise ValueError(f"Upsert needs a key column of {table} (got {key!r}).")
+            # DDL doesn't open a transaction by itself: the index must go with the rows if the upsert fails
+            conn.execute("BEGIN")
+            try:
+                conn.execute(
+                    f"CREATE UNIQUE INDEX IF NOT EXISTS {quote_identifier(f'_af_uk_{table}_{key}')} "
+                    f"ON {quote_identifier(table)} ({quote_identifier(key)})"
+                )
+            except sqlite3.IntegrityError:
+                raise ValueError(f"Column {key!r} has duplicate values in {table}; it can't be an upsert key.")
+
+        if ext == '.csv':
+            read_options = {"dtype": str, "keep_default_na": False, "chunksize": settings.get('chunk_size', 100000)}
+        else:
+            xls = pd.ExcelFile(file_path)
+            sheets = {f"data_{''.join(c if c.isalnum() else '_' for c in s)}": s for s in xls.sheet_names}
+            sheet = pd.read_excel(xls, sheet_name=sheets.get(table, xls.sheet_names[0]), dtype=str)
+
+        def read_frames():
+            # Two passes, as for uploads: types are checked on every row before any is written
+            if ext == '.csv':
+                with pd.read_csv(file_path, **read_options) as reader:
+                    yield from reader
+            else:
+                yield sheet
+
+        observed = infer_types(read_frames(), dayfirst=settings.get('dayfirst', True))
+        names = [c["name"] for c in observed]
+        if set(names) != set(declared):
+            missing, unexpected = sorted(set(declared) - set(names)), sorted(set(names) - set(declared))
+            raise ValueError(f"The file's columns don't match {table}: missing {missing}, unexpected {unexpected}.")
+        column_types = fit_types(stored_types, observed)
+
+        since_rowid = conn.execute(f"SELECT COALESCE(MAX(rowid), 0) FROM {quote_identifier(table)}").fetchone()[0]
+        rows_before = conn.execute(f"SELECT COUNT(*) FROM {quote_identifier(table)}").fetchone()[0]
+        loaded = 0
+        for chunk in read_frames():
+            frame = convert_frame(chunk, column_types)
+            for spec in column_types:
+                lost = int((normalize_nulls(chunk[spec["name"]]).notna() & frame[spec["name"]].isna()).sum())
+                if lost:
+                    raise ValueError(f"{lost} values of column {spec['name']!r} don't fit its type ({spec['logical_type']}).")
+            try:
+                insert_frame(conn, table, frame, upsert_key=key if mode == "upsert" else None, commit=False)
+            except sqlite3.IntegrityError as e:
+                raise ValueError(f"The new rows break a unique key of {table} ({e}); use the upsert mode.")
+            loaded += len(frame)
+
+        rows = conn.execute(f"SELECT COUNT(*) FROM {quote_identifier(table)}").fetchone()[0]
+        inserted = rows - rows_before
+        updated = loaded - inserted
+
+        # Derived tables follow: increments merged for new rows, rebuilt when rows changed in place.
+        # A table that grew past their size thresholds gets them built as at upload.
+        since = None if updated else since_rowid
+        built = []
+        if not PREAGGREGATIONS.refresh(conn, table, since):
+            built += PREAGGREGATIONS.build_at_upload(conn, table, stored_types)
+        if updated or refresh_sample(conn, table, since_rowid) is None:
+            # Sample rows can't be matched to the rows that changed: the sample is drawn again
+            build_sample(conn, table, stored_types)
+        if FULLTEXT.refresh(conn, table, since) is None:
+            built.append(FULLTEXT.build_at_upload(conn, table, stored_types))
+        # A plain append (or an upsert on another column) may repeat the values of an inferred key
+        dropped_keys = drop_broken_keys(conn, table)
+        conn.commit()
+        conn.execute("PRAGMA optimize")
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+
+    db_path = os.path.abspath(db_path)
+    for catalog in (PREAGGREGATIONS, APPROXIMATE, FULLTEXT):
+        catalog.forget(db_path)
+    # Results depend on the rows; the schema and generated SQL only if new derived tables appeared
+    # or keys were dropped
+    invalidate_database(db_path, results_only=not (any(built) or dropped_keys))
+    return {"table": table, "mode": mode, "inserted": inserted, "updated": updated, "rows": rows}
+
+
+def load_csv_typed(file_path: str, table_name: str, conn: sqlite3.Connection, settings: Dict = None):
+    """
+    Two passes over the CSV: the first infers column types from every row, the
+    second converts each chunk and inserts it into a table created with those types.
+    """
+    settings = settings or {}
+    chunk_size = settings.get('chunk_size', 100000)
+    read_options = {"dtype": str, "keep_default_na": False, "chunksize": chunk_size}
+
+    with pd.read_csv(file_path, **read_options) as reader:
+        column_types = infer_types(reader, dayfirst=settings.get('dayfirst', True))
+    if not column_types:
+        raise ValueError("The CSV file has no columns.")
+
+    create_typed_table(conn, table_name, column_types, strict=settings.get('strict_tables', True))
+    with pd.read_csv(file_path, **read_options) as reader:
+        for chunk in reader:
+            insert_frame(conn, table_name, convert_frame(chunk, column_types))
+    write_column_metadata(conn, table_name, column_types)
+    return column_types
+
+
+def quote_identifier(name: str) -> str:
+    return '"' + str(name).replace('"', '""') + '"'
+
+
+def create_typed_table(conn: sqlite3.Connection, table_name: str, column_types: List[Dict[str, str]], strict: bool = True):
+    """Creates the table with declared column types, as a STRICT table when SQLite supports it (3.37+)."""
+    columns = ", ".join(f"{quote_identifier(c['name'])} {c['sql_type']}" for c in column_types)
+    use_strict = strict and sqlite3.sqlite_version_info >= (3, 37, 0)
+    conn.execute(f"DROP TABLE IF EXISTS {quote_identifier(table_name)}")
+    conn.execute(f"CREATE TABLE {quote_identifier(table_name)} ({columns}){' STRICT' if use_strict else ''}")
+
+
+def insert_frame(conn: sqlite3.Connection, table_name: str, frame: pd.DataFrame, upsert_key: str = None, commit: bool = True):
+    """Inserts the rows of `frame`; with `upsert_key`, rows whose key exists replace the stored values."""
+    if frame.empty:
+        return
+    columns = ", ".join(quote_identifier(c) for c in frame.columns)
+    placeholders = ", ".join("?" for _ in frame.columns)
+    sql = f"INSERT INTO {quote_identifier(table_name)} ({columns}) VALUES ({placeholders})"
+    if upsert_key:
+        updates = ", ".join(f"{quote_identifier(c)} = excluded.{quote_identifier(c)}" for c in frame.columns if c != upsert_key)
+        sql += f" ON CONFLICT ({quote_identifier(upsert_key)}) DO {f'UPDATE SET {updates}' if updates else 'NOTHING'}"
+    rows = frame.astype(object).where(frame.notna(), None).itertuples(index=False, name=None)
+    if commit:
+        with conn:
+            conn.executemany(sql, rows)
+    else:
+        conn.executemany(sql, rows)
+
+
+def write_column_metadata(conn: sqlite3.Connection, table_name: str, column_types: List[Dict[str, str]]):
+    """Records the inferred logical types (date, boolean...) that SQLite types alone can't express."""
+    with conn:
+        conn.execute(
+            f"CREATE TABLE IF NOT EXISTS {COLUMNS_TABLE} ("
+            "table_name TEXT NOT NULL, column_name TEXT NOT NULL, logical_type TEXT NOT NULL, "
+            "sql_type TEXT NOT NULL, PRIMARY KEY (table_name, column_name))"
+        )
+        conn.executemany(
+            f"INSERT OR REPLACE INTO {COLUMNS_TABLE} (table_name, column_name, logical_type, sql_type) VALUES (?, ?, ?, ?)",
+            [(table_name, c["name"], c["logical_type"], c["sql_type"]) for c in column_types]
+        )
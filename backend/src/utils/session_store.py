@@ -0,0 +1,239 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+
+from langchain_core.messages import BaseMessage, HumanMessage, AIMessage, SystemMessage
+
+from text_to_sql.config_loader import GLOBAL_CONFIG
+from text_to_sql.shared_cache import shared_state_enabled
+
+
+class Session:
+    """
+    Server-side state of a conversation pinned to one database. The schema is not kept:
+    each query reads it through the schema cache, which follows changes to the database.
+    """
+
+    def __init__(self, db_path: str, provider: str = None, model_name: str = None,
+                 session_id: str = None):
+        self.session_id = session_id or uuid.uuid4().hex
+        self.db_path = db_path
+        self.provider = provider
+        self.model_name = model_name
+        self.history: List[BaseMessage] = []
+        self.last_sql: Optional[str] = None
+        self.created_at = time.time()
+        self.last_access = self.created_at
+        # Serializes queries within one conversation
+        self.lock = threading.Lock()
+
+    def add_turn(self, question: str, answer: str, sql: str = None):
+        """Appends a question/answer exchange, keeping the SQL for follow-up questions."""
+        self.history.append(HumanMessage(content=question))
+        content = answer or ""
+        if sql:
+            content += f"\nSQL: {sql}"
+            self.last_sql = sql
+        self.history.append(AIMessage(content=content.strip()))
+
+    def to_dict(self, include_history: bool = False) -> Dict[str, Any]:
+        payload = {
+            "session_id": self.session_id,
+            "db_path": self.db_path,
+            "provider": self.provider,
+            "model_name": self.model_name,
+            "last_sql": self.last_sql,
+            "turns": len(self.history) // 2,
+            "created_at": self.created_at,
+            "last_access": self.last_access,
+        }
+        if include_history:
+            payload["history"] = [
+                {"role": "user" if m.type == "human" else "assistant", "content": m.content}
+                for m in self.history
+            ]
+        return payload
+
+
+class InMemorySessionStore:
+    """Bounded LRU session store with idle expiry."""
+
+    def __init__(self, max_sessions: int = 1000, ttl_seconds: int = 3600):
+        self.max_sessions = max_sessions
+        self.ttl_seconds = ttl_seconds
+        self._sessions: "OrderedDict[str, Session]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, session_id: str) -> Optional[Session]:
+        with self._lock:
+            session = self._sessions.get(session_id)
+            if session is None:
+                return None
+            if time.time() - session.last_access > self.ttl_seconds:
+                del self._sessions[session_id]
+                return None
+            session.last_access = time.time()
+            self._sessions.move_to_end(session_id)
+            return session
+
+    def put(self, session: Session):
+        with self._lock:
+            self._sessions[session.session_id] = session
+            self._sessions.move_to_end(session.session_id)
+            self._evict()
+
+    def delete(self, session_id: str) -> bool:
+        with self._lock:
+            return self._sessions.pop(session_id, None) is not None
+
+    def add_turn(self, session: Session, question: str, answer: str, sql: str = None) -> bool:
+        """Appends an exchange to a stored session; False if it was deleted meanwhile."""
+        with self._lock:
+            if session.session_id not in self._sessions:
+                return False
+            session.add_turn(question, answer, sql)
+            return True
+
+    def _evict(self):
+        now = time.time()
+        expired = [sid for sid, s in self._sessions.items() if now - s.last_access > self.ttl_seconds]
+        for sid in expired:
+            del self._sessions[sid]
+        while len(self._sessions) > self.max_sessions:
+            self._sessions.popitem(last=False)
+
+
+class SQLiteSessionStore(InMemorySessionStore):
+    """
+    Session store backed by a local SQLite file, so sessions survive restarts.
+    Recently used sessions stay in the in-memory LRU in front of it, unless the file is
+    `shared` by several worker processes: every read then goes to SQLite, so a worker
+    never serves a history or a session another worker has changed or deleted.
+    """
+
+    def __init__(self, path: str, max_sessions: int = 1000, ttl_seconds: int = 3600, shared: bool = False):
+        super().__init__(max_sessions=max_sessions, ttl_seconds=ttl_seconds)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.path = path
+        self.shared = shared
+        with self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS sessions ("
+                "session_id TEXT PRIMARY KEY, payload TEXT NOT NULL, last_access REAL NOT NULL)"
+            )
+
+    def _connect(self):
+        return sqlite3.connect(self.path, timeout=5)
+
+    def get(self, session_id: str) -> Optional[Session]:
+        if not self.shared:
+            session = super().get(session_id)
+            if session is not None:
+                return session
+
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT payload, last_access FROM sessions WHERE session_id = ?", (session_id,)
+            ).fetchone()
+        if row is None:
+            return None
+        if time.time() - row[1] > self.ttl_seconds:
+            self.delete(session_id)
+            return None
+
+        session = self._deserialize(json.loads(row[0]))
+        session.last_access = time.time()
+        if self.shared:
+            with self._connect() as conn:
+                conn.execute("UPDATE sessions SET last_access = ? WHERE session_id = ?", (session.last_access, session_id))
+        else:
+            super().put(session)
+        return session
+
+    def put(self, session: Session):
+        if not self.shared:
+            super().put(session)
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO sessions (session_id, payload, last_access) VALUES (?, ?, ?)",
+                (session.session_id, json.dumps(self._serialize(session)), session.last_access)
+            )
+            conn.execute("DELETE FROM sessions WHERE last_access < ?", (time.time() - self.ttl_seconds,))
+
+    def delete(self, session_id: str) -> bool:
+        deleted = super().delete(session_id)
+        with self._connect() as conn:
+            cursor = conn.execute("DELETE FROM sessions WHERE session_id = ?", (session_id,))
+        return deleted or cursor.rowcount > 0
+
+    def add_turn(self, session: Session, question: str, answer: str, sql: str = None) -> bool:
+        """
+        Appends an exchange to the stored session in one write transaction: the history
+        is read again inside it, so turns added meanwhile by another worker are kept.
+        The caller's copy is updated to the stored history.
+        """
+        conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            row = conn.execute("SELECT payload FROM sessions WHERE session_id = ?", (session.session_id,)).fetchone()
+            if row is None:
+                conn.execute("ROLLBACK")
+                super().delete(session.session_id)
+                return False
+            stored = self._deserialize(json.loads(row[0]))
+            stored.add_turn(question, answer, sql)
+            stored.last_access = time.time()
+            conn.execute(
+                "UPDATE sessions SET payload = ?, last_access = ? WHERE session_id = ?",
+                (json.dumps(self._serialize(stored)), stored.last_access, session.session_id)
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            conn.close()
+
+        session.history, session.last_sql, session.last_access = stored.history, stored.last_sql, stored.last_access
+        if not self.shared:
+            super().put(session)
+        return True
+
+    @staticmethod
+    def _serialize(session: Session) -> Dict[str, Any]:
+        payload = session.to_dict()
+        payload["history"] = [{"type": m.type, "content": m.content} for m in session.history]
+        return payload
+
+    @staticmethod
+    def _deserialize(payload: Dict[str, Any]) -> Session:
+        session = Session(
+            db_path=payload["db_path"],
+            provider=payload.get("provider"),
+            model_name=payload.get("model_name"),
+            session_id=payload["session_id"],
+        )
+        message_types = {"human": HumanMessage, "ai": AIMessage, "system": SystemMessage}
+        session.history = [message_types.get(m["type"], HumanMessage)(content=m["content"]) for m in payload["history"]]
+        session.last_sql = payload.get("last_sql")
+        session.created_at = payload.get("created_at", session.created_at)
+        return session
+
+
+def build_session_store():
+    """Creates the session store selected by the 'sessions' section of llm_config.yaml."""
+    config = GLOBAL_CONFIG.get('sessions', {})
+    max_sessions = config.get('max_sessions', 1000)
+    ttl_seconds = config.get('ttl_seconds', 3600)
+
+    # Worker processes don't share memory, so multi-worker mode always uses SQLite
+    if config.get('backend', 'memory') == 'sqlite' or shared_state_enabled():
+        base_dir = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+        path = config.get('sqlite_path') or os.path.join(base_dir, 'state', 'sessions.db')
+        return SQLiteSessionStore(path, max_sessions=max_sessions, ttl_seconds=ttl_seconds, shared=shared_state_enabled())
+    return InMemorySessionStore(max_sessions=max_sessions, ttl_seconds=ttl_seconds)
@@ -0,0 +1,261 @@
+import re
+from typing import Dict, List, Set
+
+import pandas as pd
+
+# Same missing-value markers pandas recognizes by default when reading CSV/Excel
+NULL_VALUES = {
+    "", "#N/A", "#N/A N/A", "#NA", "-1.#IND", "-1.#QNAN", "-NaN", "-nan", "1.#IND", "1.#QNAN",
+    "<NA>", "N/A", "NA", "NULL", "NaN", "None", "n/a", "nan", "null",
+}
+
+TRUE_TOKENS = {"true", "yes", "y", "t", "oui", "vrai"}
+FALSE_TOKENS = {"false", "no", "n", "f", "non", "faux"}
+
+# Value shapes, tried in order. Numbers may use thousands separators: comma (US),
+# dot (EU), space, no-break spaces or apostrophe (Swiss). "1,234" and "1.234" are
+# ambiguous between a US and an EU reading and get their own classes.
+_VALUE_CLASSES = [
+    # No leading zeros, so zip codes and ids like "00123" stay TEXT
+    ("int_plain", r"[+-]?(?:0|[1-9]\d*)"),
+    ("comma_group", r"[+-]?[1-9]\d{0,2},\d{3}"),
+    ("int_us", r"[+-]?[1-9]\d{0,2}(?:,\d{3})+"),
+    ("int_space", r"[+-]?[1-9]\d{0,2}(?:[ \u00a0\u202f']\d{3})+"),
+    ("dot_group", r"[+-]?[1-9]\d{0,2}\.\d{3}"),
+    ("int_eu", r"[+-]?[1-9]\d{0,2}(?:\.\d{3})+"),
+    ("dec_us", r"[+-]?(?:(?:0|[1-9]\d*)|[1-9]\d{0,2}(?:[, \u00a0\u202f']\d{3})+)?\.\d+(?:[eE][+-]?\d+)?|[+-]?(?:0|[1-9]\d*)[eE][+-]?\d+"),
+    ("dec_eu", r"[+-]?(?:(?:0|[1-9]\d*)|[1-9]\d{0,2}(?:[. \u00a0\u202f]\d{3})+),\d+"),
+    ("date_iso", r"\d{4}-\d{2}-\d{2}"),
+    ("datetime_iso", r"\d{4}-\d{2}-\d{2}[ T]\d{2}:\d{2}(?::\d{2}(?:\.\d+)?)?"),
+    ("date_dmy", r"\d{1,2}[/.-]\d{1,2}[/.-]\d{4}"),
+]
+_VALUE_PATTERN = re.compile("|".join(f"(?P<{name}>{pattern})" for name, pattern in _VALUE_CLASSES))
+
+_INTEGER_CLASSES = {"int_plain", "comma_group", "int_us", "int_space"}
+_REAL_US_CLASSES = _INTEGER_CLASSES | {"dot_group", "dec_us", "big_int"}
+_REAL_EU_CLASSES = {"int_plain", "comma_group", "int_space", "dot_group", "int_eu", "dec_eu", "big_int"}
+_DATE_CLASSES = {"date_iso", "datetime_iso", "date_dmy"}
+
+# Logical type -> SQLite column type (valid in STRICT tables)
+SQL_TYPES = {
+    "integer": "INTEGER",
+    "real": "REAL",
+    "boolean": "INTEGER",
+    "date": "TEXT",
+    "datetime": "TEXT",
+    "text": "TEXT",
+}
+
+_MAX_INT_DIGITS = 18  # Stays inside SQLite's signed 64-bit INTEGER
+_SAMPLE_SIZE = 500  # Distinct values checked first, to rule out text columns cheaply
+_SEEN_LIMIT = 100000  # Distinct values remembered across chunks to skip re-classifying them
+
+
+def classify_value(value: str) -> str:
+    """Returns the shape of a single (non-null) value: one of _VALUE_CLASSES, 'boolean' or 'text'."""
+    value = value.strip()
+    if not value:
+        return "null"
+    lowered = value.lower()
+    if lowered in TRUE_TOKENS or lowered in FALSE_TOKENS:
+        return "boolean"
+    match = _VALUE_PATTERN.fullmatch(value)
+    if match is None:
+        return "text"
+    kind = match.lastgroup
+    if kind in _INTEGER_CLASSES and len(value) > _MAX_INT_DIGITS and sum(ch.isdigit() for ch in value) > _MAX_INT_DIGITS:
+        return "big_int"
+    return kind
+
+
+class ColumnTypeTracker:
+    """
+    Narrows down the type of one column as chunks of string values are observed.
+    Every distinct value of the file is classified, so a late non-numeric value can't be missed.
+    """
+
+    def __init__(self, name: str, dayfirst: bool = True):
+        self.name = name
+        self.dayfirst = dayfirst
+        self.non_null = 0
+        self.candidates = {"boolean", "integer", "real_us", "real_eu", "date"}
+        self.all_midnight = True
+        self.has_dmy = False
+        self.max_first_part = 0
+        self.max_second_part = 0
+        self._seen: Set[str] = set()
+
+    def observe(self, values: pd.Series):
+        values = normalize_nulls(values).dropna()
+        self.non_null += len(values)
+        if values.empty or not self.candidates:
+            return
+
+        uniques = [v for v in values.unique() if v not in self._seen]
+        # A small sample usually rules out every candidate of a text column
+        if len(uniques) > _SAMPLE_SIZE:
+            self._check(uniques[:_SAMPLE_SIZE])
+            if not self.candidates:
+                return
+        self._check(uniques)
+        if self.candidates and len(self._seen) < _SEEN_LIMIT:
+            self._seen.update(uniques)
+
+    def _check(self, uniques: List[str]):
+        classes: Dict[str, List[str]] = {}
+        for value in uniques:
+            classes.setdefault(classify_value(value), []).append(value)
+        kinds = set(classes) - {"null"}
+        c = self.candidates
+
+        if kinds - {"boolean"}:
+            c.discard("boolean")
+        if kinds - _INTEGER_CLASSES:
+            c.discard("integer")
+        if kinds - _REAL_US_CLASSES:
+            c.discard("real_us")
+        if kinds - _REAL_EU_CLASSES:
+            c.discard("real_eu")
+        if kinds - _DATE_CLASSES or ("date_dmy" in kinds and kinds & {"date_iso", "datetime_iso"}):
+            c.discard("date")
+
+        if "date" not in c:
+            return
+        dmy = pd.Series(classes.get("date_dmy", []), dtype="str").str.strip()
+        iso = pd.Series(classes.get("date_iso", []) + classes.get("datetime_iso", []), dtype="str").str.strip()
+        if not dmy.empty:
+            self.has_dmy = True
+            parts = dmy.str.split(r"[/.-]", regex=True, expand=True).astype(int)
+            self.max_first_part = max(self.max_first_part, int(parts[0].max()))
+            self.max_second_part = max(self.max_second_part, int(parts[1].max()))
+        if classes.get("datetime_iso"):
+            times = pd.Series(classes["datetime_iso"], dtype="str").str.strip().str.slice(11)
+            if not times.str.fullmatch(r"00:00(:00(\.0+)?)?").all():
+                self.all_midnight = False
+        # Reject impossible dates (2023-02-30) that match the pattern
+        if parse_dates(dmy, self._date_order()).isna().any() or parse_dates(iso, "iso").isna().any():
+            c.discard("date")
+
+    def _date_order(self) -> str:
+        if self.max_first_part > 12:
+            return "dmy"
+        if self.max_second_part > 12:
+            return "mdy"
+        return "dmy" if self.dayfirst else "mdy"
+
+    def result(self) -> Dict[str, str]:
+        """Returns the logical type, the SQL type and conversion details for the column."""
+        c = self.candidates
+        if self.non_null == 0:
+            logical, detail = "text", ""
+        elif "boolean" in c:
+            logical, detail = "boolean", ""
+        elif "integer" in c:
+            logical, detail = "integer", ""
+        elif "real_us" in c:
+            logical, detail = "real", "us"
+        elif "real_eu" in c:
+            logical, detail = "real", "eu"
+        elif "date" in c:
+            logical = "date" if self.all_midnight else "datetime"
+            detail = self._date_order() if self.has_dmy else "iso"
+        else:
+            logical, detail = "text", ""
+        return {"name": self.name, "logical_type": logical, "sql_type": SQL_TYPES[logical], "detail": detail}
+
+
+def normalize_nulls(values: pd.Series) -> pd.Series:
+    """Turns missing-value markers into real missing values."""
+    if values.dtype != "str":
+        values = values.astype("str")
+    return values.mask(values.isin(NULL_VALUES))
+
+
+def parse_dates(values: pd.Series, order: str) -> pd.Series:
+    if values.empty:
+        return pd.Series([], dtype="datetime64[ns]")
+    if order in ("dmy", "mdy"):
+        normalized = values.str.replace(r"[.-]", "/", regex=True)
+        fmt = "%d/%m/%Y" if order == "dmy" else "%m/%d/%Y"
+        return pd.to_datetime(normalized, format=fmt, errors="coerce")
+    return pd.to_datetime(values, format="ISO8601", errors="coerce")
+
+
+def infer_types(frames, dayfirst: bool = True) -> List[Dict[str, str]]:
+    """
+    Infers column types from an iterable of string DataFrames (e.g. CSV chunks read
+    with dtype=str), looking at every value of the file rather than the first chunk.
+    """
+    trackers: Dict[str, ColumnTypeTracker] = {}
+    for frame in frames:
+        for column in frame.columns:
+            if column not in trackers:
+                trackers[column] = ColumnTypeTracker(column, dayfirst=dayfirst)
+            trackers[column].observe(frame[column])
+    return [tracker.result() for tracker in trackers.values()]
+
+
+def _to_number(values: pd.Series, detail: str = "us") -> pd.Series:
+    # Fast path: plain numbers parse directly; separators are only stripped when needed
+    if detail != "eu":
+        numbers = pd.to_numeric(values, errors="coerce", dtype_backend="numpy_nullable")
+        if numbers.isna().sum() == values.isna().sum():
+            return numbers
+    stripped = values.str.strip()
+    if detail == "eu":
+        cleaned = stripped.str.replace(r"[.\s\u00a0\u202f]", "", regex=True).str.replace(",", ".", regex=False)
+    else:
+        cleaned = stripped.str.replace(r"[,\s\u00a0\u202f']", "", regex=True)
+    return pd.to_numeric(cleaned, errors="coerce", dtype_backend="numpy_nullable")
+
+
+def _map_distinct(values: pd.Series, convert) -> pd.Series:
+    """Converts each distinct value once and maps the results back (dates, booleans)."""
+    uniques = pd.Series(values.dropna().unique(), dtype="str")
+    converted = convert(uniques)
+    return values.map(dict(zip(uniques, converted)))
+
+
+def convert_frame(frame: pd.DataFrame, column_types: List[Dict[str, str]]) -> pd.DataFrame:
+    """Converts a string DataFrame to the inferred types (dates become ISO-8601 text)."""
+    converted = {}
+    for spec in column_types:
+        values = normalize_nulls(frame[spec["name"]])
+        logical, detail = spec["logical_type"], spec["detail"]
+
+        if logical == "boolean":
+            column = _map_distinct(values, lambda u: u.str.strip().str.lower().isin(TRUE_TOKENS).astype(int))
+            converted[spec["name"]] = column.astype("Int64")
+        elif logical == "integer":
+            converted[spec["name"]] = _to_number(values).astype("Int64")
+        elif logical == "real":
+            converted[spec["name"]] = _to_number(values, detail).astype("Float64")
+        elif logical in ("date", "datetime"):
+            fmt = "%Y-%m-%d" if logical == "date" else "%Y-%m-%d %H:%M:%S"
+            converted[spec["name"]] = _map_distinct(values, lambda u: parse_dates(u.str.strip(), detail).dt.strftime(fmt))
+        else:
+            converted[spec["name"]] = values
+
+    return pd.DataFrame(converted, index=frame.index)
+
+
+def fit_types(stored: List[Dict[str, str]], observed: List[Dict[str, str]]) -> List[Dict[str, str]]:
+    """
+    Conversion specs that load newly observed values into columns of an existing table:
+    the stored logical type, with the conversion details read from the new values
+    (a real column may receive integers, a datetime column dates, a text column anything).
+    """
+    observed_by_name = {spec["name"]: spec for spec in observed}
+    fitted = []
+    for spec in stored:
+        new = observed_by_name.get(spec["name"], {})
+        logical = spec["logical_type"]
+        if new.get("logical_type") == logical or (logical == "datetime" and new.get("logical_type") == "date"):
+            detail = new["detail"]
+        elif logical == "real" and new.get("logical_type") == "integer":
+            detail = "us"
+        else:
+            # Values that don't fit become NULL; callers compare null counts to detect them
+            detail = {"real": "us", "date": "iso", "datetime": "iso"}.get(logical, "")
+        fitted.append({"name": spec["name"], "logical_type": logical, "sql_type": spec["sql_type"], "detail": detail})
+    return fitted
@@ -0,0 +1,189 @@
+import os
+import sqlite3
+import threading
+import time
+import uuid
+import zlib
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Optional, Tuple
+
+from text_to_sql.config_loader import GLOBAL_CONFIG
+from text_to_sql.schema_inspector import schema_snapshot_path
+from text_to_sql.sql_executor import READ_POOLS
+
+# Uploads of the same content hash share one of these locks
+_LOCK_STRIPES = 64
+
+
+class UploadIndex:
+    """
+    Content-addressed index of converted uploads: content hash -> database path.
+
+    Each upload of the same bytes takes a reference on the existing database instead
+    of converting it again. A reference is identified by the upload id returned to
+    its uploader, which is needed to release it. Databases whose references have all
+    been released are deleted by `collect_garbage` once the grace period has passed.
+    """
+
+    def __init__(self, path: str, gc_grace_seconds: int = 3600):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.path = path
+        self.gc_grace_seconds = gc_grace_seconds
+        # Striped by content hash, so concurrent uploads of the same file convert it once
+        # without keeping a lock per hash ever seen
+        self._hash_locks = [threading.Lock() for _ in range(_LOCK_STRIPES)]
+        with self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS uploads ("
+                "content_hash TEXT PRIMARY KEY, db_path TEXT NOT NULL UNIQUE, "
+                "refcount INTEGER NOT NULL, created_at REAL NOT NULL, released_at REAL)"
+            )
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS upload_refs ("
+                "upload_id TEXT PRIMARY KEY, db_path TEXT NOT NULL, created_at REAL NOT NULL)"
+            )
+
+    def _connect(self):
+        return sqlite3.connect(self.path, timeout=5)
+
+    def _hash_lock(self, content_hash: str) -> threading.Lock:
+        return self._hash_locks[zlib.crc32(content_hash.encode("utf-8")) % _LOCK_STRIPES]
+
+    @staticmethod
+    def _add_reference(conn: sqlite3.Connection, db_path: str) -> str:
+        upload_id = uuid.uuid4().hex
+        conn.execute("INSERT INTO upload_refs (upload_id, db_path, created_at) VALUES (?, ?, ?)",
+                     (upload_id, db_path, time.time()))
+        return upload_id
+
+    def acquire(self, content_hash: str) -> Optional[Tuple[str, str]]:
+        """
+        Takes a reference on the database already built for this content, if it still
+        exists; returns (db_path, upload_id).
+        """
+        with self._connect() as conn:
+            row = conn.execute("SELECT db_path FROM uploads WHERE content_hash = ?", (content_hash,)).fetchone()
+            if row is None:
+                return None
+            if not os.path.exists(row[0]):
+                # The file was removed behind our back; forget it and convert again
+                conn.execute("DELETE FROM uploads WHERE content_hash = ?", (content_hash,))
+                return None
+            conn.execute(
+                "UPDATE uploads SET refcount = refcount + 1, released_at = NULL WHERE content_hash = ?",
+                (content_hash,)
+            )
+            return row[0], self._add_reference(conn, row[0])
+
+    def register(self, content_hash: str, db_path: str) -> str:
+        """Records a freshly converted database with a single reference; returns its upload id."""
+        with self._connect() as conn:
+            conn.execute("DELETE FROM upload_refs WHERE db_path = ?", (db_path,))
+            conn.execute(
+                "INSERT OR REPLACE INTO uploads (content_hash, db_path, refcount, created_at, released_at) "
+                "VALUES (?, ?, 1, ?, NULL)",
+                (content_hash, db_path, time.time())
+            )
+            return self._add_reference(conn, db_path)
+
+    def get_or_convert(self, content_hash: str, convert: Callable[[], str]) -> Tuple[str, bool, str]:
+        """
+        Returns (db_path, deduplicated, upload_id): the existing database for this content,
+        or the one produced by `convert()` when the content has not been seen yet.
+        """
+        with self._hash_lock(content_hash):
+            acquired = self.acquire(content_hash)
+            if acquired is not None:
+                return acquired[0], True, acquired[1]
+            db_path = convert()
+            return db_path, False, self.register(content_hash, db_path)
+
+    def references(self, db_path: str) -> int:
+        """Number of uploads holding a reference on a database (0 if it isn't indexed)."""
+        with self._connect() as conn:
+            row = conn.execute("SELECT refcount FROM uploads WHERE db_path = ?", (db_path,)).fetchone()
+        return row[0] if row else 0
+
+    def holds(self, db_path: str, upload_id: str) -> bool:
+        """Whether `upload_id` holds a reference on a database."""
+        with self._connect() as conn:
+            row = conn.execute("SELECT 1 FROM upload_refs WHERE upload_id = ? AND db_path = ?", (upload_id, db_path)).fetchone()
+        return row is not None
+
+    @contextmanager
+    def locked(self, db_path: str):
+        """Holds the lock of a database's content hash: no upload takes a reference on it meanwhile."""
+        with self._connect() as conn:
+            row = conn.execute("SELECT content_hash FROM uploads WHERE db_path = ?", (db_path,)).fetchone()
+        if row is None:
+            yield
+            return
+        with self._hash_lock(row[0]):
+            yield
+
+    def rekey(self, db_path: str, content_hash: str):
+        """
+        Moves a database to a new content hash after its content changed (rows appended),
+        so uploads of the original file no longer map to it. References are kept.
+        """
+        with self._connect() as conn:
+            conn.execute("UPDATE uploads SET content_hash = ? WHERE db_path = ?", (content_hash, db_path))
+
+    def release(self, db_path: str, upload_id: str) -> Optional[int]:
+        """
+        Drops the reference `upload_id` holds on a database; returns the remaining count,
+        or None if the database isn't indexed or that upload holds no reference on it.
+        """
+        with self._connect() as conn:
+            row = conn.execute("SELECT refcount FROM uploads WHERE db_path = ?", (db_path,)).fetchone()
+            if row is None:
+                return None
+            cursor = conn.execute("DELETE FROM upload_refs WHERE upload_id = ? AND db_path = ?", (upload_id, db_path))
+            if cursor.rowcount == 0:
+                return None
+            refcount = max(row[0] - 1, 0)
+            conn.execute(
+                "UPDATE uploads SET refcount = ?, released_at = ? WHERE db_path = ?",
+                (refcount, time.time() if refcount == 0 else None, db_path)
+            )
+        return refcount
+
+    def collect_garbage(self, grace_seconds: int = None) -> List[str]:
+        """Deletes databases without references for longer than the grace period; returns their paths."""
+        grace = self.gc_grace_seconds if grace_seconds is None else grace_seconds
+        cutoff = time.time() - grace
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT content_hash, db_path FROM uploads WHERE refcount = 0 AND released_at <= ?", (cutoff,)
+            ).fetchall()
+            removed = []
+            for content_hash, db_path in rows:
+                with self._hash_lock(content_hash):
+                    # Re-checked under the lock: an upload may have taken a new reference meanwhile
+                    cursor = conn.execute("DELETE FROM uploads WHERE content_hash = ? AND refcount = 0", (content_hash,))
+                    conn.commit()
+                    if cursor.rowcount == 0:
+                        continue
+                    conn.execute("DELETE FROM upload_refs WHERE db_path = ?", (db_path,))
+                    conn.commit()
+                    READ_POOLS.discard(db_path)
+                    for path in (db_path, db_path + "-wal", db_path + "-shm", schema_snapshot_path(db_path)):
+                        if os.path.exists(path):
+                            os.remove(path)
+                removed.append(db_path)
+        return removed
+
+    def stats(self) -> Dict[str, int]:
+        with self._connect() as conn:
+            total, referenced = conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(refcount > 0), 0) FROM uploads"
+            ).fetchone()
+        return {"databases": total, "referenced": referenced, "unreferenced": total - referenced}
+
+
+def build_upload_index() -> UploadIndex:
+    """Creates the upload index configured by the 'uploads' section of llm_config.yaml."""
+    config = GLOBAL_CONFIG.get('uploads', {})
+    base_dir = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    path = config.get('index_path') or os.path.join(base_dir, 'state', 'uploads.db')
+    return UploadIndex(path, gc_grace_seconds=config.get('gc_grace_seconds', 3600))
@@ -0,0 +1,63 @@
+import os
+import shutil
+import sys
+import tempfile
+
+import pytest
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+os.environ.setdefault("GROQ_API_KEY", "dummy")
+
+from text_to_sql.config_loader import GLOBAL_CONFIG
+
+# Databases, uploads and state files of the test run live in a scratch directory, never in
+# backend/databases or backend/state. Set before the stores below are built at import.
+SCRATCH_DIR = tempfile.mkdtemp(prefix="af_tests_")
+for section, key, path in [
+    ("lifecycle", "databases_dir", "databases"),
+    ("lifecycle", "temp_dir", "temp"),
+    ("lifecycle", "registry_path", "state/registry.db"),
+    ("uploads", "index_path", "state/uploads.db"),
+    ("sessions", "sqlite_path", "state/sessions.db"),
+    ("cache", "sqlite_path", "state/cache.db"),
+    ("examples", "sqlite_path", "state/examples.db"),
+    ("tracing", "sqlite_path", "state/traces.db"),
+]:
+    GLOBAL_CONFIG.setdefault(section, {})[key] = os.path.join(SCRATCH_DIR, path)
+
+from text_to_sql import shared_cache, workflow_engine
+from text_to_sql.example_store import ExampleStore
+from utils.db_registry import DB_REGISTRY
+
+
+@pytest.fixture(autouse=True, scope="session")
+def scratch_dir():
+    yield SCRATCH_DIR
+    shutil.rmtree(SCRATCH_DIR, ignore_errors=True)
+
+
+@pytest.fixture(autouse=True)
+def isolated_example_store(tmp_path, monkeypatch):
+    # Examples persist across runs; tests must not answer from earlier runs' questions
+    monkeypatch.setattr(workflow_engine, "EXAMPLES", ExampleStore(str(tmp_path / "examples.db")))
+
+
+@pytest.fixture(autouse=True)
+def isolated_query_caches(monkeypatch):
+    # Generated SQL and results are cached per question; each test starts from empty caches,
+    # also seen by the invalidations of shared_cache
+    for name in ("SQL_CACHE", "RESULT_CACHE"):
+        cache = shared_cache.InMemoryCache()
+        monkeypatch.setattr(shared_cache, name, cache)
+        monkeypatch.setattr(workflow_engine, name, cache)
+
+
+@pytest.fixture
+def remove_upload():
+    """Releases an upload made through the API and deletes its database with the registry."""
+    def remove(client, upload: dict):
+        if upload.get("upload_id"):
+            client.delete("/upload", params={"db_path": upload["db_path"], "upload_id": upload["upload_id"]})
+        DB_REGISTRY.remove(upload["db_path"], delete_file=True)
+    return remove
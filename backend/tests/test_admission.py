@@ -0,0 +1,74 @@
+import os
+import sys
+
+import pytest
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+os.environ.setdefault("GROQ_API_KEY", "dummy")
+
+from fastapi.testclient import TestClient
+
+from main import app
+from api.routers import query
+from text_to_sql.admission import AdmissionController, AdmissionRejected
+
+client = TestClient(app)
+
+
+def test_client_burst_is_admitted_then_rejected_with_a_delay():
+    controller = AdmissionController({"max_wait_seconds": 0, "client": {"requests_per_minute": 60, "burst": 2}})
+    controller.admit(None, client_id="alice")
+    controller.admit(None, client_id="alice")
+    with pytest.raises(AdmissionRejected) as rejected:
+        controller.admit(None, client_id="alice")
+    assert 0 < rejected.value.retry_after <= 1
+    # Other clients have their own bucket
+    controller.admit(None, client_id="bob")
+
+
+def test_short_waits_queue_and_provider_tokens_are_limited():
+    controller = AdmissionController({
+        "max_wait_seconds": 1,
+        "providers": {"default": {"requests_per_minute": 6000, "burst_requests": 1, "tokens_per_minute": 1000}, "fake": {}},
+    })
+    controller.admit("groq", tokens=100)
+    # The next request slot frees up in 10 ms: it waits instead of failing
+    assert 0 < controller.admit("groq", tokens=100) <= 0.011
+    # 800 tokens left; 1000 more would need a 12 s refill
+    with pytest.raises(AdmissionRejected) as rejected:
+        controller.admit("groq", tokens=1000)
+    assert rejected.value.scope == "provider groq"
+    assert controller.admit("fake", tokens=1000) == 0
+
+
+def test_provider_requests_count_every_call_and_workers_share_the_limits():
+    controller = AdmissionController({"max_wait_seconds": 0, "providers": {"default": {"requests_per_minute": 4}}})
+    # SQL generation, explanation and two extra candidates: the whole minute's budget
+    controller.admit("groq", calls=4)
+    with pytest.raises(AdmissionRejected):
+        controller.admit("groq")
+
+    # Under serve.py with 4 workers, each one admits a quarter of the rate
+    shared = AdmissionController({"max_wait_seconds": 0, "providers": {"default": {"requests_per_minute": 4}}}, workers=4)
+    shared.admit("groq")
+    with pytest.raises(AdmissionRejected):
+        shared.admit("groq")
+
+
+def test_query_over_the_limit_gets_429_with_retry_after(monkeypatch, remove_upload):
+    upload = client.post("/upload", files={"file": ("admission_data.csv", b"a\n1", "text/csv")})
+    db_path = upload.json()["db_path"]
+    monkeypatch.setattr(query, "ADMISSION", AdmissionController({"max_wait_seconds": 0, "client": {"requests_per_minute": 1}}))
+    monkeypatch.setattr(query.workflow_engine, "run", lambda **kwargs: {"sql": "SELECT 1", "result": {"data": []}, "error": None})
+
+    try:
+        headers = {"X-User-Id": "carol"}
+        body = {"question": "q", "db_path": db_path, "explain": "none"}
+        assert client.post("/query", json=body, headers=headers).status_code == 200
+        response = client.post("/query", json=body, headers=headers)
+        assert response.status_code == 429
+        assert 1 <= int(response.headers["Retry-After"]) <= 60
+    finally:
+        remove_upload(client, upload.json())
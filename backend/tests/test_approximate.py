@@ -0,0 +1,57 @@
+import os
+import random
+import sys
+
+import pytest
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+os.environ.setdefault("GROQ_API_KEY", "dummy")
+
+from text_to_sql import approximate
+from text_to_sql.approximate import APPROXIMATE, approximation_note
+from text_to_sql.preaggregations import PREAGGREGATIONS
+from text_to_sql.sql_executor import execute_query_and_format
+from utils.file_converter import convert_to_sqlite
+
+
+@pytest.fixture
+def orders_db(tmp_path, monkeypatch):
+    monkeypatch.setitem(approximate.GLOBAL_CONFIG, "approximate", {"min_rows": 10000, "sample_rows": 2000, "min_per_stratum": 200})
+    monkeypatch.setattr(PREAGGREGATIONS, "config", {"enabled": False})
+    rng = random.Random(3)
+    lines = ["channel,amount,units"]
+    # A small 'phone' channel must stay represented in the sample
+    for _ in range(40000):
+        channel = "phone" if rng.random() < 0.01 else rng.choice(["web", "store"])
+        lines.append(f"{channel},{rng.lognormvariate(3, 1):.2f},{rng.randint(1, 5)}")
+    path = tmp_path / "orders.csv"
+    path.write_text("\n".join(lines))
+    return convert_to_sqlite(str(path), str(tmp_path))
+
+
+def test_estimates_fall_within_reported_bounds(orders_db):
+    sql = "SELECT channel, COUNT(*) AS n, SUM(amount) AS revenue, AVG(units) FROM data_orders GROUP BY channel ORDER BY channel"
+    exact = execute_query_and_format(sql, orders_db)["data"]
+    estimate = APPROXIMATE.execute(sql, orders_db)
+
+    approximation = estimate["approximation"]
+    assert approximation["base_rows"] == 40000
+    assert approximation["sample_rows"] < 4000
+    assert estimate["columns"] == ["channel", "n", "revenue", "AVG(units)"]
+    assert [row["channel"] for row in estimate["data"]] == ["phone", "store", "web"]
+
+    for truth, row, bounds in zip(exact, estimate["data"], approximation["error_bounds"]):
+        for column in ("n", "revenue", "AVG(units)"):
+            assert bounds[column] > 0
+            # 95% bounds: allow a wide margin so the check is not a coin flip
+            assert abs(row[column] - truth[column]) <= 2 * bounds[column]
+
+    note = approximation_note(estimate)
+    assert "sample of 40,000 rows" in note and "approximate" in note
+
+
+def test_queries_a_sample_cannot_answer_run_exactly(orders_db):
+    assert APPROXIMATE.execute("SELECT MAX(amount) FROM data_orders", orders_db) is None
+    assert APPROXIMATE.execute("SELECT * FROM data_orders LIMIT 5", orders_db) is None
+    assert approximation_note(execute_query_and_format("SELECT COUNT(*) FROM data_orders", orders_db)) is None
@@ -0,0 +1,64 @@
+import json
+import os
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+os.environ.setdefault("GROQ_API_KEY", "dummy")
+
+from fastapi import HTTPException
+from fastapi.testclient import TestClient
+
+from main import app
+from api.routers import query
+from api.routers.query import workflow_engine
+from text_to_sql.sql_executor import execute_query_and_format
+
+client = TestClient(app)
+
+
+def test_batch_streams_one_line_per_question(monkeypatch, remove_upload):
+    upload = client.post("/upload", files={"file": ("batch_data.csv", b"name,age\nAlice,30\nBob,25", "text/csv")})
+    db_path = upload.json()["db_path"]
+
+    table = execute_query_and_format("SELECT name FROM sqlite_master WHERE type='table'", db_path)["data"][0]["name"]
+    schemas = []
+    def fake_run(question, db_path, chat_history, schema=None, connection_pool=None, **kwargs):
+        schemas.append(schema)
+        sql = f"SELECT COUNT(*) AS n FROM [{table}] WHERE age > {question}"
+        return {"sql": sql, "result": execute_query_and_format(sql, db_path, pool=connection_pool), "error": None}
+    monkeypatch.setattr(workflow_engine, "run", fake_run)
+
+    try:
+        response = client.post("/query/batch", json={"db_path": db_path, "questions": ["20", "26", "40"], "concurrency": 2})
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("application/x-ndjson")
+
+        lines = sorted((json.loads(line) for line in response.text.splitlines()), key=lambda l: l["index"])
+        assert [l["result"]["data"][0]["n"] for l in lines] == [2, 1, 0]
+        assert {l["status_code"] for l in lines} == {200}
+        assert len(set(schemas)) == 1
+    finally:
+        remove_upload(client, upload.json())
+
+
+def test_batch_rejects_invalid_path():
+    response = client.post("/query/batch", json={"db_path": "/etc/passwd", "questions": ["q"]})
+    assert response.status_code == 403
+
+
+def test_batch_reports_rate_limited_questions(monkeypatch, remove_upload):
+    upload = client.post("/upload", files={"file": ("batch_limited.csv", b"a\n1", "text/csv")})
+    db_path = upload.json()["db_path"]
+
+    def reject(*args, **kwargs):
+        raise HTTPException(status_code=429, detail="Provider token budget exceeded")
+    monkeypatch.setattr(query, "admit_request", reject)
+
+    try:
+        response = client.post("/query/batch", json={"db_path": db_path, "questions": ["q1", "q2"]})
+        lines = [json.loads(line) for line in response.text.splitlines()]
+        assert [(l["status_code"], l["error"]) for l in lines] == [(429, "Provider token budget exceeded")] * 2
+    finally:
+        remove_upload(client, upload.json())
@@ -0,0 +1,86 @@
+import os
+import sqlite3
+import sys
+import time
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+os.environ.setdefault("GROQ_API_KEY", "dummy")
+
+from langchain_core.messages import AIMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+
+from text_to_sql import workflow_engine
+from text_to_sql.candidates import select_candidate
+from text_to_sql.fake_llm import FakeSQLChatModel
+from text_to_sql.llm_generator import LLMGenerator
+from text_to_sql.shared_cache import database_key
+from text_to_sql.workflow_engine import WorkflowEngine
+
+
+def _sales_db(tmp_path):
+    db_path = str(tmp_path / "sales.db")
+    with sqlite3.connect(db_path) as conn:
+        conn.execute("CREATE TABLE sales (id INTEGER, region TEXT, amount REAL)")
+        conn.executemany("INSERT INTO sales VALUES (?, ?, ?)",
+                         [(i, "EU" if i % 2 else "US", i * 1.5) for i in range(200)])
+    return db_path
+
+
+def test_agreeing_candidates_win_over_the_first(tmp_path):
+    db_path = _sales_db(tmp_path)
+    candidates = [
+        "SELECT region, COUNT(*) FROM sales WHERE amount > 10 GROUP BY region",
+        "SELECT region, SUM(amount) AS total FROM sales GROUP BY region",
+        "SELECT region, TOTAL(amount) AS revenue FROM sales GROUP BY region ORDER BY 2 DESC",
+        "SELECT regoin FROM sales",
+        "DROP TABLE sales",
+    ]
+    chosen = select_candidate(candidates, db_path)
+    assert chosen["sql"] == candidates[1]
+    assert chosen["result"]["candidates"] == {"generated": 5, "valid": 3, "agreeing": 2, "chosen": 1}
+
+    # Without agreement, the first valid candidate is kept
+    chosen = select_candidate([candidates[3], candidates[0], candidates[1]], db_path)
+    assert chosen["sql"] == candidates[0]
+    assert select_candidate([candidates[3]], db_path)["error"] == "no such column: regoin"
+
+
+def test_slow_candidates_are_interrupted_at_the_time_budget(tmp_path):
+    db_path = _sales_db(tmp_path)
+    slow = "SELECT COUNT(*) FROM sales a, sales b, sales c, sales d"
+    start = time.monotonic()
+    chosen = select_candidate([slow, "SELECT COUNT(*) AS n FROM sales"], db_path, time_budget=0.2)
+    assert time.monotonic() - start < 2
+    assert chosen["result"]["data"] == [{"n": 200}]
+    assert chosen["result"]["candidates"]["valid"] == 1
+
+
+class TemperatureModel(FakeSQLChatModel):
+    """Answers with a different query when sampled with a temperature."""
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        sql = "SELECT 2" if kwargs.get("temperature") else "SELECT 1"
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=f"```sql\n{sql}\n```"))])
+
+
+def test_candidates_are_generated_concurrently_and_deduplicated():
+    generator = LLMGenerator()
+    generator.default_llm = TemperatureModel()
+    candidates = generator.generate_candidates("q", "Table 'sales':\n  - id: INTEGER\n", n=3)
+    # The deterministic answer comes first; identical samples collapse
+    assert candidates == ["SELECT 1", "SELECT 2"]
+
+
+def test_workflow_runs_candidates_in_one_round(tmp_path):
+    engine = WorkflowEngine()
+    engine.llm_generator.default_llm = TemperatureModel()
+    db_path = _sales_db(tmp_path)
+    result = engine.run("q", db_path, [], explain_mode="none", candidates=3)
+    assert result["sql"] == "SELECT 1"
+    assert result["retry_count"] == 1
+    assert result["result"]["candidates"]["generated"] == 2
+
+    # Candidates go through the same execution chain as a single query, result cache included
+    cached = workflow_engine.RESULT_CACHE.get(database_key(db_path, "exact", "SELECT 2"))
+    assert cached is not None and "candidates" not in cached
@@ -0,0 +1,95 @@
+import os
+import sqlite3
+import sys
+import time
+
+import pytest
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+os.environ.setdefault("GROQ_API_KEY", "dummy")
+
+from fastapi import HTTPException
+
+from utils import validators
+from utils.db_registry import DatabaseRegistry, LifecycleManager
+
+
+def _make_db(path, rows=1000):
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE t (v TEXT)")
+    conn.executemany("INSERT INTO t VALUES (?)", [("x" * 100,)] * rows)
+    conn.commit()
+    conn.close()
+
+
+@pytest.fixture
+def registry(tmp_path):
+    db_dir = tmp_path / "databases"
+    db_dir.mkdir()
+    _make_db(str(db_dir / "existing.db"))
+    return DatabaseRegistry(str(tmp_path / "state" / "registry.db"), db_dir=str(db_dir))
+
+
+def test_registry_adopts_files_and_validates_in_memory(registry, monkeypatch):
+    monkeypatch.setattr(validators, "DB_REGISTRY", registry)
+    existing = os.path.join(registry.db_dir, "existing.db")
+
+    assert validators.validate_db_path(existing) == existing
+    assert validators.validate_db_path("existing.db") == existing
+
+    with pytest.raises(HTTPException) as missing:
+        validators.validate_db_path(os.path.join(registry.db_dir, "unknown.db"))
+    assert missing.value.status_code == 404
+    with pytest.raises(HTTPException) as forbidden:
+        validators.validate_db_path("/etc/passwd")
+    assert forbidden.value.status_code == 403
+
+    # Entries survive a restart
+    reloaded = DatabaseRegistry(registry.path, db_dir=registry.db_dir)
+    assert reloaded.get(existing)["size_bytes"] > 0
+
+
+def test_lru_quota_evicts_least_recently_used(registry, tmp_path):
+    paths = []
+    for name in ("a.db", "b.db", "c.db"):
+        path = os.path.join(registry.db_dir, name)
+        _make_db(path)
+        registry.register(path, owner="alice", source_filename=name)
+        paths.append(path)
+    registry.remove(os.path.join(registry.db_dir, "existing.db"), delete_file=True)
+
+    now = time.time()
+    for age, path in zip((3000, 1000, 2000), paths):
+        registry.update(path, last_accessed_at=now - age)
+
+    size = registry.get(paths[0])["size_bytes"]
+    manager = LifecycleManager(registry, {"max_total_mb": (size * 1.5) / (1024 * 1024), "min_idle_seconds": 300})
+    assert manager.enforce_quota() == [paths[0], paths[2]]
+    assert not os.path.exists(paths[0]) and os.path.exists(paths[1])
+
+
+def test_sweeps_old_temp_files_and_vacuums_idle_databases(registry, tmp_path):
+    temp_dir = tmp_path / "temp"
+    temp_dir.mkdir()
+    old, recent = temp_dir / "old_upload.csv", temp_dir / "recent_upload.csv"
+    old.write_text("a\n1")
+    recent.write_text("a\n1")
+    os.utime(old, (time.time() - 7200, time.time() - 7200))
+
+    path = os.path.join(registry.db_dir, "existing.db")
+    conn = sqlite3.connect(path)
+    conn.execute("DELETE FROM t")
+    conn.commit()
+    conn.close()
+    registry.update(path, last_accessed_at=time.time() - 3600, size_bytes=os.path.getsize(path))
+
+    manager = LifecycleManager(registry, {"temp_max_age_seconds": 3600, "min_idle_seconds": 300}, temp_dir=str(temp_dir))
+    assert manager.sweep_temp() == [str(old)]
+    assert recent.exists()
+
+    size_before = registry.get(path)["size_bytes"]
+    assert manager.maintain(force=True) == [path]
+    assert registry.get(path)["size_bytes"] < size_before
+    # Unchanged since the last run, so it is skipped
+    assert manager.maintain(force=True) == []
@@ -0,0 +1,76 @@
+import os
+import sqlite3
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+os.environ.setdefault("GROQ_API_KEY", "dummy")
+
+from text_to_sql import workflow_engine as workflow_module
+from text_to_sql.example_store import ExampleStore, schema_fingerprint
+from text_to_sql.workflow_engine import WorkflowEngine
+
+SCHEMA = "Table 'sales':\n  - region: TEXT\n  - amount: REAL\n"
+
+
+def test_similar_questions_are_found_across_workers(tmp_path):
+    path = str(tmp_path / "examples.db")
+    writer, reader = ExampleStore(path), ExampleStore(path)
+    fingerprint = schema_fingerprint(SCHEMA)
+    writer.add(fingerprint, "Total amount by region?", "SELECT region, SUM(amount) FROM sales GROUP BY region")
+    writer.add(fingerprint, "How many sales are there?", "SELECT COUNT(*) FROM sales")
+    writer.add(fingerprint, "Average amount in the EU", "SELECT AVG(amount) FROM sales WHERE region = 'EU'")
+
+    matches = reader.similar(fingerprint, "what is the total amount per region")
+    assert matches[0]["sql"] == "SELECT region, SUM(amount) FROM sales GROUP BY region"
+    assert all(m["score"] >= 0.3 for m in matches)
+    assert reader.similar(fingerprint, "list customers born in july") == []
+    assert reader.exact(fingerprint, "how many SALES are there") == "SELECT COUNT(*) FROM sales"
+
+    # Types and notes don't change the fingerprint; columns do
+    assert schema_fingerprint(SCHEMA.replace("REAL", "INTEGER") + "\nNote: ...") == fingerprint
+    assert schema_fingerprint(SCHEMA + "  - units: INTEGER\n") != fingerprint
+
+
+def test_exact_matches_follow_the_model_expire_and_are_replaced(tmp_path):
+    path = str(tmp_path / "examples.db")
+    writer, reader = ExampleStore(path, {"exact_ttl_seconds": 60}), ExampleStore(path, {"exact_ttl_seconds": 60})
+    fingerprint = schema_fingerprint(SCHEMA)
+    writer.add(fingerprint, "How many sales?", "SELECT 1", "groq", None)
+
+    assert reader.exact(fingerprint, "how many sales", "groq") == "SELECT 1"
+    assert reader.exact(fingerprint, "how many sales", "openai") is None
+
+    # The latest success replaces the SQL, for exact matches and examples in every worker
+    writer.add(fingerprint, "How many sales?", "SELECT COUNT(*) FROM sales", "openai", None)
+    assert reader.exact(fingerprint, "how many sales", "openai") == "SELECT COUNT(*) FROM sales"
+    assert reader.exact(fingerprint, "how many sales", "groq") is None
+    assert [m["sql"] for m in reader.similar(fingerprint, "how many sales are there")] == ["SELECT COUNT(*) FROM sales"]
+
+    with sqlite3.connect(path) as conn:
+        conn.execute("UPDATE examples SET created_at = created_at - 120")
+    assert ExampleStore(path, {"exact_ttl_seconds": 60}).exact(fingerprint, "how many sales", "openai") is None
+
+
+def test_known_questions_skip_the_llm_and_similar_ones_get_examples(tmp_path):
+    databases = []
+    for name in ("january", "february"):
+        db_path = str(tmp_path / f"{name}.db")
+        with sqlite3.connect(db_path) as conn:
+            conn.execute("CREATE TABLE sales (region TEXT, amount REAL)")
+            conn.execute("INSERT INTO sales VALUES ('EU', 10)")
+        databases.append(db_path)
+
+    engine = WorkflowEngine()
+    calls = []
+    engine.llm_generator.generate_query = lambda **kwargs: calls.append(kwargs) or "SELECT SUM(amount) AS total FROM sales"
+
+    engine.run("Total amount?", databases[0], [], explain_mode="none")
+    # Same question on another upload of the same layout: no LLM call
+    result = engine.run("total amount", databases[1], [], explain_mode="none")
+    assert result["result"]["data"] == [{"total": 10.0}]
+    assert len(calls) == 1
+
+    engine.run("What is the total amount in the EU?", databases[1], [], explain_mode="none")
+    assert len(calls) == 2
+    assert calls[1]["examples"][0]["question"] == "Total amount?"
@@ -0,0 +1,71 @@
+import os
+import sqlite3
+import sys
+import time
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+os.environ.setdefault("GROQ_API_KEY", "dummy")
+
+from fastapi.testclient import TestClient
+
+from main import app
+from api.routers.query import workflow_engine
+from text_to_sql.workflow_engine import WorkflowEngine
+
+client = TestClient(app)
+
+
+def _engine_with_stub_llm(explanations):
+    engine = WorkflowEngine()
+    engine.llm_generator.generate_query = lambda **kwargs: "SELECT 1 AS one"
+    engine.llm_generator.generate_explanation = lambda **kwargs: explanations.append(kwargs) or "One."
+    return engine
+
+
+def test_explain_none_ends_after_execute(tmp_path):
+    db_path = str(tmp_path / "empty.db")
+    sqlite3.connect(db_path).execute("CREATE TABLE t (a INTEGER)")
+
+    explanations = []
+    engine = _engine_with_stub_llm(explanations)
+
+    result = engine.run("q", db_path, [], explain_mode="none")
+    assert result["result"]["data"] == [{"one": 1}]
+    assert "message" not in result["result"]
+    assert explanations == []
+
+    result = engine.run("q", db_path, [], explain_mode="inline")
+    assert result["result"]["message"] == "One."
+    assert len(explanations) == 1
+
+
+def test_deferred_explanation_is_fetchable(monkeypatch, remove_upload):
+    upload = client.post("/upload", files={"file": ("explain_data.csv", b"a\n1", "text/csv")})
+    db_path = upload.json()["db_path"]
+
+    modes = []
+    def fake_run(explain_mode="inline", **kwargs):
+        modes.append(explain_mode)
+        return {"sql": "SELECT a FROM t", "result": {"columns": ["a"], "data": [{"a": 1}]}, "error": None}
+    monkeypatch.setattr(workflow_engine, "run", fake_run)
+    monkeypatch.setattr(workflow_engine.llm_generator, "generate_explanation", lambda **kwargs: "There is one row.")
+
+    try:
+        response = client.post("/query", json={"question": "q", "db_path": db_path, "explain": "deferred"})
+        assert response.status_code == 200
+        assert modes == ["deferred"]
+        explanation_id = response.json()["result"]["explanation_id"]
+
+        for _ in range(50):
+            job = client.get(f"/query/explanations/{explanation_id}").json()
+            if job["status"] != "pending":
+                break
+            time.sleep(0.02)
+        assert job["status"] == "done"
+        assert job["explanation"] == "There is one row."
+
+        assert client.get("/query/explanations/unknown").status_code == 404
+    finally:
+        remove_upload(client, upload.json())
@@ -0,0 +1,49 @@
+import os
+import sqlite3
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+os.environ.setdefault("GROQ_API_KEY", "dummy")
+
+from langchain_core.messages import HumanMessage, SystemMessage
+
+from text_to_sql.fake_llm import FakeSQLChatModel
+from text_to_sql.llm_provider import LLMProvider
+from text_to_sql.workflow_engine import WorkflowEngine
+
+
+def test_fake_provider_is_selectable_and_deterministic():
+    llm = LLMProvider.get_llm(provider="fake")
+    assert isinstance(llm, FakeSQLChatModel)
+
+    latency = {"distribution": "lognormal", "mean_ms": 100, "sigma": 0.5}
+    first = [FakeSQLChatModel(latency=latency, seed=1).sample_latency() for _ in range(3)]
+    second = [FakeSQLChatModel(latency=latency, seed=1).sample_latency() for _ in range(3)]
+    assert first == second
+
+
+def test_fake_provider_answers_from_canned_sql():
+    llm = FakeSQLChatModel(canned_sql=[{"pattern": "how many", "sql": "SELECT COUNT(*) FROM [{table}]"}])
+    messages = [SystemMessage(content="Schema:\nTable 'sales':\n  - id: INTEGER\n")]
+
+    assert llm.invoke(messages + [HumanMessage(content="How many rows?")]).content == "SELECT COUNT(*) FROM [sales]"
+    assert llm.invoke(messages + [HumanMessage(content="List them")]).content == "SELECT * FROM [sales] LIMIT 5"
+    assert llm.invoke([SystemMessage(content="Explain this data")]).content == llm.canned_answer
+
+
+def test_workflow_runs_end_to_end_offline(tmp_path):
+    db_path = str(tmp_path / "sales.db")
+    with sqlite3.connect(db_path) as conn:
+        conn.execute("CREATE TABLE sales (id INTEGER)")
+        conn.executemany("INSERT INTO sales VALUES (?)", [(1,), (2,)])
+
+    engine = WorkflowEngine()
+    engine.llm_generator.default_llm = FakeSQLChatModel(
+        canned_sql=[{"pattern": "how many", "sql": "SELECT COUNT(*) AS row_count FROM [{table}]"}]
+    )
+
+    result = engine.run("how many sales?", db_path, [])
+    assert result["error"] is None
+    assert result["result"]["data"] == [{"row_count": 2}]
+    assert result["result"]["message"] == engine.llm_generator.default_llm.canned_answer
@@ -0,0 +1,57 @@
+import os
+import random
+import sys
+
+import pytest
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+os.environ.setdefault("GROQ_API_KEY", "dummy")
+
+from text_to_sql.fulltext import FULLTEXT, rewrite_contains
+from text_to_sql.preaggregations import PREAGGREGATIONS
+from text_to_sql.schema_inspector import get_db_schema
+from text_to_sql.sql_executor import execute_query_and_format
+from utils.file_converter import convert_to_sqlite
+
+
+@pytest.fixture
+def customers_db(tmp_path, monkeypatch):
+    monkeypatch.setattr(FULLTEXT, "config", {"min_rows": 1000})
+    monkeypatch.setattr(PREAGGREGATIONS, "config", {"enabled": False})
+    rng = random.Random(5)
+    lines = ["name,country,notes"]
+    for i in range(3000):
+        name = f"{rng.choice(['Martin', 'Bernard', 'Dubois', 'Thomas'])} {rng.choice(['Jean', 'Zoé', 'Lucas'])} {i}"
+        channel = "O'Brien" if i % 97 == 0 else "web"
+        lines.append(f"{name},{rng.choice(['FR', 'BE'])},order {i} via {channel}")
+    path = tmp_path / "customers.csv"
+    path.write_text("\n".join(lines))
+    return convert_to_sqlite(str(path), str(tmp_path))
+
+
+def test_contains_filters_use_the_index_with_the_same_rows(customers_db):
+    schema = get_db_schema(customers_db)
+    assert "'data_customers' on name, notes" in schema
+    assert "_af_fts" not in schema
+
+    for sql in [
+        "SELECT name FROM data_customers WHERE name LIKE '%zoé%' AND country = 'FR' ORDER BY name",
+        "SELECT COUNT(*) FROM data_customers c WHERE LOWER(c.name) LIKE '%martin lu%'",
+        "SELECT notes FROM data_customers WHERE notes LIKE '%O''Brien%' ORDER BY notes;",
+    ]:
+        result = FULLTEXT.try_execute(sql, customers_db)
+        assert result["fulltext"] == "_af_fts_data_customers"
+        assert result["data"] == execute_query_and_format(sql, customers_db)["data"]
+        assert result["data"]
+
+
+def test_ineligible_predicates_are_left_alone():
+    columns = ["name"]
+    assert rewrite_contains("SELECT * FROM t WHERE name NOT LIKE '%abc%'", "_af_fts_t", "t", columns) is None
+    assert rewrite_contains("SELECT * FROM t WHERE name LIKE '%ab%'", "_af_fts_t", "t", columns) is None
+    assert rewrite_contains("SELECT * FROM t WHERE name LIKE '%a_c%'", "_af_fts_t", "t", columns) is None
+    assert rewrite_contains("SELECT * FROM t WHERE country LIKE '%abc%'", "_af_fts_t", "t", columns) is None
+    assert rewrite_contains("SELECT * FROM t JOIN u ON t.id = u.id WHERE name LIKE '%abc%'", "_af_fts_t", "t", columns) is None
+    rewritten = rewrite_contains("SELECT * FROM t WHERE `name` LIKE '%abc%'", "_af_fts_t", "t", columns)
+    assert rewritten == "SELECT * FROM t WHERE rowid IN (SELECT rowid FROM `_af_fts_t` WHERE `_af_fts_t` MATCH '\"name\" : \"abc\"')"
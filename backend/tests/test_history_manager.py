@@ -0,0 +1,66 @@
+import os
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from langchain_core.messages import HumanMessage, AIMessage
+from text_to_sql.history_manager import HistoryManager, count_tokens
+
+
+def _conversation(turns):
+    messages = []
+    for i in range(turns):
+        messages.append(HumanMessage(content=f"Question {i}"))
+        messages.append(AIMessage(content=f"Answer {i}\nSQL: SELECT {i}\n| a | b |\n| 1 | 2 |"))
+    return messages
+
+
+def test_short_history_is_kept_verbatim_without_tables():
+    manager = HistoryManager({"keep_last_turns": 4, "token_budget": 1000})
+    compacted = manager.compact(_conversation(2), provider="groq")
+
+    assert len(compacted) == 4
+    assert compacted[0].content == "Question 0"
+    assert "| a | b |" not in compacted[1].content
+    assert "SQL: SELECT 0" in compacted[1].content
+
+
+def test_older_turns_are_summarized_and_cached():
+    manager = HistoryManager({"keep_last_turns": 2, "token_budget": 1000})
+    compacted = manager.compact(_conversation(5), provider="groq")
+
+    assert isinstance(compacted[0], HumanMessage)
+    assert isinstance(compacted[1], AIMessage)
+    assert "User asked: Question 0" in compacted[0].content
+    assert "SELECT 2" in compacted[0].content
+    assert len(compacted) == 6
+
+
+def test_llm_summary_is_not_recomputed_for_same_prefix():
+    calls = []
+    manager = HistoryManager({"keep_last_turns": 2, "token_budget": 1000, "summary_mode": "llm"})
+    summarizer = lambda text: calls.append(text) or "summary"
+
+    manager.compact(_conversation(5), provider="groq", summarizer=summarizer)
+    compacted = manager.compact(_conversation(5), provider="groq", summarizer=summarizer)
+
+    assert len(calls) == 1
+    assert compacted[0].content.endswith("summary")
+
+
+def test_history_respects_token_budget():
+    manager = HistoryManager({"keep_last_turns": 10, "token_budget": 30})
+    compacted = manager.compact(_conversation(10), provider="groq")
+
+    total = sum(count_tokens(m.content, "groq") for m in compacted)
+    assert total <= 30
+
+
+def test_kept_turns_start_on_a_user_turn():
+    # The budget ages out the question of the oldest kept exchange, not its answer
+    manager = HistoryManager({"keep_last_turns": 3, "token_budget": 25})
+    compacted = manager.compact(_conversation(4), provider="groq")
+
+    roles = [m.type for m in compacted]
+    assert roles[0] == "human"
+    assert all(a != b for a, b in zip(roles, roles[1:]))
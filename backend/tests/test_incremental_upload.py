@@ -0,0 +1,124 @@
+import os
+import random
+import sqlite3
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+os.environ.setdefault("GROQ_API_KEY", "dummy")
+
+import pytest
+from fastapi.testclient import TestClient
+
+from main import app
+from text_to_sql import approximate, shared_cache
+from text_to_sql.fulltext import FULLTEXT
+from text_to_sql.preaggregations import PREAGGREGATIONS
+from text_to_sql.schema_inspector import get_db_schema
+from text_to_sql.shared_cache import SCHEMA_CACHE, database_key
+from text_to_sql.sql_executor import execute_query_and_format
+from text_to_sql.workflow_engine import WorkflowEngine
+from utils.file_converter import append_to_sqlite, convert_to_sqlite
+
+client = TestClient(app)
+
+
+def test_append_and_upsert_through_the_api(monkeypatch, remove_upload):
+    upload = client.post("/upload", files={"file": ("refresh_data.csv", b"id,name,amount\n1,Alice,10.5\n2,Bob,20", "text/csv")})
+    db_path = upload.json()["db_path"]
+    try:
+        SCHEMA_CACHE.set(db_path, "cached schema")
+        shared_cache.RESULT_CACHE.set(database_key(db_path, "exact", "SELECT 1"), {"data": []})
+
+        appended = client.post("/upload/append", data={"db_path": db_path},
+                               files={"file": ("more.csv", b"id,name,amount\n3,Carol,7", "text/csv")})
+        assert appended.status_code == 200
+        assert (appended.json()["inserted"], appended.json()["updated"], appended.json()["rows"]) == (1, 0, 3)
+        assert shared_cache.RESULT_CACHE.get(database_key(db_path, "exact", "SELECT 1")) is None
+        assert SCHEMA_CACHE.get(db_path) == "cached schema"
+
+        # The inferred primary key (id) is the default upsert key
+        upserted = client.post("/upload/append", data={"db_path": db_path, "mode": "upsert"},
+                               files={"file": ("fix.csv", b"name,id,amount\nBobby,2,25\nDan,4,1", "text/csv")})
+        assert (upserted.json()["inserted"], upserted.json()["updated"]) == (1, 1)
+        table = upserted.json()["table"]
+        rows = execute_query_and_format(f"SELECT id, name, amount FROM [{table}] ORDER BY id", db_path)["data"]
+        assert rows[1] == {"id": 2, "name": "Bobby", "amount": 25.0} and len(rows) == 4
+
+        duplicate = client.post("/upload/append", data={"db_path": db_path},
+                                files={"file": ("dup.csv", b"id,name,amount\n1,Again,1", "text/csv")})
+        assert duplicate.status_code == 400 and "upsert" in duplicate.json()["detail"]
+        mistyped = client.post("/upload/append", data={"db_path": db_path},
+                               files={"file": ("bad.csv", b"id,name,amount\n9,Eve,lots", "text/csv")})
+        assert mistyped.status_code == 400 and "amount" in mistyped.json()["detail"]
+        assert execute_query_and_format(f"SELECT COUNT(*) AS n FROM [{table}]", db_path)["data"][0]["n"] == 4
+
+        # A path spelled differently (relative) shares the cache entries the append drops
+        engine = WorkflowEngine()
+        monkeypatch.setattr(engine.llm_generator, "generate_query", lambda **kwargs: f"SELECT COUNT(*) AS n FROM [{table}]")
+        count = lambda: engine.run("How many rows?", os.path.relpath(db_path), [], explain_mode="none")["result"]["data"]
+        assert count() == [{"n": 4}]
+        client.post("/upload/append", data={"db_path": db_path}, files={"file": ("last.csv", b"id,name,amount\n5,Erin,3", "text/csv")})
+        assert count() == [{"n": 5}]
+    finally:
+        SCHEMA_CACHE.delete(db_path)
+        remove_upload(client, upload.json())
+
+
+def test_derived_tables_follow_new_rows(tmp_path, monkeypatch):
+    monkeypatch.setattr(PREAGGREGATIONS, "config", {"min_rows": 1000})
+    monkeypatch.setattr(FULLTEXT, "config", {"min_rows": 1000})
+    monkeypatch.setitem(approximate.GLOBAL_CONFIG, "approximate", {"min_rows": 2000, "sample_rows": 500, "min_per_stratum": 50})
+    rng = random.Random(11)
+
+    def rows(start, count):
+        return [f"{rng.choice(['web', 'store'])},{rng.randint(1, 100)},customer {i}" for i in range(start, start + count)]
+
+    path = tmp_path / "sales.csv"
+    path.write_text("\n".join(["channel,amount,customer"] + rows(0, 3000)))
+    db_path = convert_to_sqlite(str(path), str(tmp_path))
+    extra = tmp_path / "extra.csv"
+    extra.write_text("\n".join(["channel,amount,customer"] + rows(3000, 500) + ["phone,5,customer zed"]))
+    assert append_to_sqlite(str(extra), db_path)["rows"] == 3501
+
+    exact = execute_query_and_format("SELECT channel, COUNT(*) AS n, SUM(amount) AS s FROM data_sales GROUP BY channel ORDER BY channel", db_path)
+    summary = PREAGGREGATIONS.execute("SELECT channel, COUNT(*) AS n, SUM(amount) AS s FROM data_sales GROUP BY channel ORDER BY channel", db_path)
+    assert summary["preaggregate"] and summary["data"] == exact["data"]
+
+    found = FULLTEXT.try_execute("SELECT customer FROM data_sales WHERE customer LIKE '%zed%'", db_path)
+    assert found["fulltext"] and found["data"] == [{"customer": "customer zed"}]
+
+    sample = approximate.APPROXIMATE.execute("SELECT COUNT(*) AS n FROM data_sales", db_path)
+    assert sample["approximation"]["base_rows"] == 3501
+    # The new stratum is kept whole, with weight 1
+    phone = execute_query_and_format("SELECT _af_weight FROM _af_sample_data_sales WHERE channel = 'phone'", db_path)["data"]
+    assert phone == [{"_af_weight": 1.0}]
+
+
+def test_plain_append_may_repeat_an_inferred_key(tmp_path):
+    path = tmp_path / "people.csv"
+    path.write_text("name,age\nAlice,30\nBob,25\nCarol,41")
+    db_path = convert_to_sqlite(str(path), str(tmp_path))
+    extra = tmp_path / "more.csv"
+    extra.write_text("name,age\nAlice,52")
+    assert "  - name: TEXT (PRIMARY KEY)" in get_db_schema(db_path)
+
+    assert append_to_sqlite(str(extra), db_path)["inserted"] == 1
+    rows = execute_query_and_format("SELECT age FROM data_people WHERE name = 'Alice' ORDER BY age", db_path)["data"]
+    assert rows == [{"age": 30}, {"age": 52}]
+    # The schema no longer presents the repeated column as a key
+    assert "  - name: TEXT\n" in get_db_schema(db_path)
+
+
+def test_failed_upsert_leaves_no_unique_index(tmp_path):
+    path = tmp_path / "stock.csv"
+    path.write_text("id,units\n1,4\n2,9")
+    db_path = convert_to_sqlite(str(path), str(tmp_path))
+    extra = tmp_path / "wrong.csv"
+    extra.write_text("id,weight\n2,3")
+
+    with pytest.raises(ValueError):
+        append_to_sqlite(str(extra), db_path, mode="upsert", key="id")
+    with sqlite3.connect(db_path) as conn:
+        assert conn.execute("SELECT name FROM sqlite_master WHERE name LIKE '_af_uk_%'").fetchall() == []
@@ -0,0 +1,70 @@
+import os
+import random
+import sys
+
+import pytest
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+os.environ.setdefault("GROQ_API_KEY", "dummy")
+
+from text_to_sql.preaggregations import PREAGGREGATIONS
+from text_to_sql.schema_inspector import get_db_schema
+from text_to_sql.sql_executor import execute_query_and_format
+from utils.file_converter import convert_to_sqlite
+
+
+@pytest.fixture
+def sales_db(tmp_path, monkeypatch):
+    monkeypatch.setattr(PREAGGREGATIONS, "config", {"min_rows": 1000, "max_ratio": 0.5, "observe_threshold": 2})
+    rng = random.Random(7)
+    lines = ["category,region,amount,units,is_returned"]
+    for _ in range(3000):
+        lines.append(f"{rng.choice(['Books', 'Games', 'Tools', 'Toys'])},{rng.choice(['EU', 'US', 'APAC'])},"
+                     f"{rng.uniform(1, 500):.2f},{rng.randint(1, 9)},{rng.choice(['yes', 'no'])}")
+    path = tmp_path / "sales.csv"
+    path.write_text("\n".join(lines))
+    return convert_to_sqlite(str(path), str(tmp_path))
+
+
+def _same(a, b):
+    assert a["columns"] == b["columns"]
+    assert [[pytest.approx(v) if isinstance(v, float) else v for v in row.values()] for row in a["data"]] == \
+           [list(row.values()) for row in b["data"]]
+
+
+def test_group_by_queries_read_the_summary_tables(sales_db):
+    schema = get_db_schema(sales_db)
+    assert "'data_sales' by category" in schema
+    assert "_af_agg" not in schema
+
+    queries = [
+        "SELECT category, SUM(amount), COUNT(*) AS n FROM data_sales GROUP BY category ORDER BY SUM(amount) DESC",
+        "SELECT s.region, AVG(s.units) avg_units, MIN(amount), MAX(amount) FROM [data_sales] s "
+        "WHERE region <> 'US' GROUP BY s.region HAVING COUNT(*) > 10",
+        "SELECT SUM(is_returned) FROM data_sales",
+    ]
+    for sql in queries:
+        result = PREAGGREGATIONS.execute(sql, sales_db)
+        assert result["preaggregate"].startswith("_af_agg_")
+        _same(execute_query_and_format(sql, sales_db), result)
+
+    # A filter on a measure column can't be answered from a summary (even when double-quoted,
+    # which SQLite would otherwise read as a string literal on the summary table)
+    sql = 'SELECT category, COUNT(*) FROM data_sales WHERE "amount" > 250 GROUP BY category'
+    result = PREAGGREGATIONS.execute(sql, sales_db)
+    assert "preaggregate" not in result
+    _same(execute_query_and_format(sql, sales_db), result)
+
+
+def test_repeated_group_by_shape_gets_its_own_summary(sales_db):
+    sql = "SELECT category, region, SUM(units) FROM data_sales GROUP BY category, region"
+    for _ in range(2):
+        assert "preaggregate" not in PREAGGREGATIONS.execute(sql, sales_db)
+
+    # The build runs on the single background worker
+    PREAGGREGATIONS._executor.submit(lambda: None).result()
+    result = PREAGGREGATIONS.execute(sql, sales_db)
+    assert result["preaggregate"].startswith("_af_agg_")
+    _same(execute_query_and_format(sql, sales_db), result)
+    assert "'data_sales' by category, region" in get_db_schema(sales_db)
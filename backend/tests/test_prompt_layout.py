@@ -0,0 +1,42 @@
+import os
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+os.environ.setdefault("GROQ_API_KEY", "dummy")
+
+from langchain_core.language_models.fake_chat_models import GenericFakeChatModel
+from langchain_core.messages import AIMessage, SystemMessage, HumanMessage
+
+from text_to_sql.llm_generator import LLMGenerator
+from text_to_sql.metrics import METRICS
+
+
+def test_prompt_prefix_is_stable_across_retries():
+    generator = LLMGenerator()
+    first = generator.query_prompt.invoke({"schema": "Table 't'", "question": "Q", "chat_history": [], "feedback": []})
+    retry = generator.query_prompt.invoke({
+        "schema": "Table 't'", "question": "Q", "chat_history": [],
+        "feedback": [HumanMessage(content="PREVIOUS ERROR: no such column")]
+    })
+
+    first_messages, retry_messages = first.to_messages(), retry.to_messages()
+    assert isinstance(first_messages[0], SystemMessage)
+    assert first_messages[0].content == retry_messages[0].content
+    assert "Table 't'" in first_messages[0].content
+    assert "PREVIOUS ERROR" not in retry_messages[0].content
+    assert retry_messages[-1].content.startswith("PREVIOUS ERROR")
+
+
+def test_cached_tokens_are_reported_in_metrics():
+    METRICS.reset()
+    generator = LLMGenerator()
+    response = AIMessage(content="SELECT 1", usage_metadata={
+        "input_tokens": 120, "output_tokens": 4, "total_tokens": 124,
+        "input_token_details": {"cache_read": 100}
+    })
+    generator.default_llm = GenericFakeChatModel(messages=iter([response]))
+
+    assert generator.generate_query("Q", "Table 't'") == "SELECT 1"
+    assert METRICS.get("llm.cached_prompt_tokens") == 100
+    assert METRICS.get("llm.prompt_tokens") == 120
@@ -0,0 +1,54 @@
+import os
+import shutil
+import sqlite3
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+os.environ.setdefault("GROQ_API_KEY", "dummy")
+
+from text_to_sql.sql_executor import READ_POOLS, ReadPools, execute_query_and_format, prewarm
+from utils.file_converter import append_to_sqlite, convert_to_sqlite
+
+
+def test_converted_databases_are_read_through_tuned_pooled_connections(tmp_path):
+    source = tmp_path / "sales.csv"
+    source.write_text("id,region,amount\n" + "\n".join(f"{i},R{i % 3},{i * 1.5}" for i in range(1, 2001)))
+    db_path = convert_to_sqlite(str(source), str(tmp_path))
+    with sqlite3.connect(db_path) as conn:
+        assert conn.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+
+    assert execute_query_and_format("SELECT COUNT(*) AS n FROM data_sales", db_path)["data"] == [{"n": 2000}]
+    pool = READ_POOLS.get(db_path)
+    with pool.connection() as conn:
+        assert conn.execute("PRAGMA mmap_size").fetchone()[0] == os.path.getsize(db_path)
+        assert conn.execute("PRAGMA cache_size").fetchone()[0] == -16 * 1024
+
+    # Kept connections see appended rows
+    more = tmp_path / "more.csv"
+    more.write_text("id,region,amount\n2001,R0,1.0")
+    append_to_sqlite(str(more), db_path)
+    assert execute_query_and_format("SELECT COUNT(*) AS n FROM data_sales", db_path)["data"] == [{"n": 2001}]
+    assert READ_POOLS.get(db_path) is pool
+    assert prewarm(db_path) >= os.path.getsize(db_path)
+    READ_POOLS.discard(db_path)
+
+
+def test_pools_are_replaced_with_the_file_and_bounded(tmp_path):
+    pools = ReadPools({"max_databases": 2})
+    paths = []
+    for name in ("a", "b", "c"):
+        path = str(tmp_path / f"{name}.db")
+        with sqlite3.connect(path) as conn:
+            conn.execute("CREATE TABLE t (x INTEGER)")
+            conn.execute("INSERT INTO t VALUES (1)")
+        paths.append(path)
+        pools.get(path)
+    assert [p for p in paths if p in pools._pools] == paths[1:]
+
+    # A database deleted and rebuilt under the same path is not read through the old connections
+    first = pools.get(paths[2])
+    shutil.copy(paths[0], paths[2] + ".new")
+    os.replace(paths[2] + ".new", paths[2])
+    assert pools.get(paths[2]) is not first
+    pools.clear()
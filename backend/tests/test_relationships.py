@@ -0,0 +1,65 @@
+import os
+import sqlite3
+import sys
+
+import pandas as pd
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+os.environ.setdefault("GROQ_API_KEY", "dummy")
+
+from text_to_sql.relationships import bottom_hashes, profile_column, value_hashes
+from text_to_sql.schema_inspector import get_db_schema
+from utils.file_converter import convert_to_sqlite
+
+
+def test_keys_and_joins_between_sheets(tmp_path):
+    path = tmp_path / "shop.xlsx"
+    with pd.ExcelWriter(path) as writer:
+        pd.DataFrame({
+            "code": [f"P{i:03d}" for i in range(40)],
+            "label": [f"Product {i}" for i in range(40)],
+        }).to_excel(writer, sheet_name="products", index=False)
+        pd.DataFrame({
+            "customer_id": range(1, 51),
+            "name": [f"Customer {i}" for i in range(1, 51)],
+        }).to_excel(writer, sheet_name="customers", index=False)
+        pd.DataFrame({
+            "order_id": range(100, 300),
+            "customer_id": [i % 50 + 1 for i in range(200)],
+            "product": [f"P{i % 40:03d}" for i in range(200)],
+            "quantity": [i % 5 + 1 for i in range(200)],
+        }).to_excel(writer, sheet_name="orders", index=False)
+    db_path = convert_to_sqlite(str(path), str(tmp_path))
+
+    schema = get_db_schema(db_path)
+    assert "  - code: TEXT (PRIMARY KEY)" in schema
+    assert "  - order_id: INTEGER (PRIMARY KEY)" in schema
+    assert "  - customer_id: INTEGER (FOREIGN KEY -> 'data_customers'.customer_id)" in schema
+    assert "  - product: TEXT (FOREIGN KEY -> 'data_products'.code)" in schema
+    # Small integers fall inside the id range, but nothing in the name points at another table
+    assert "  - quantity: INTEGER\n" in schema
+
+    with sqlite3.connect(db_path) as conn:
+        indexes = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type='index'")}
+        plan = conn.execute(
+            "EXPLAIN QUERY PLAN SELECT c.name, COUNT(*) FROM data_orders o JOIN data_customers c "
+            "ON o.customer_id = c.customer_id WHERE c.customer_id = 7"
+        ).fetchall()
+    assert {"_af_pk_data_customers_customer_id", "_af_fk_data_orders_customer_id"} <= indexes
+    assert any("_af_fk_data_orders_customer_id" in row[3] for row in plan)
+    # An inferred key is a guess: its index doesn't make later rows unique
+    with sqlite3.connect(db_path) as conn:
+        conn.execute("INSERT INTO data_customers VALUES (7, 'Customer 7 again')")
+
+
+def test_only_keys_keep_every_value_hash(tmp_path):
+    conn = sqlite3.connect(str(tmp_path / "values.db"))
+    conn.execute("CREATE TABLE t (id INTEGER, city TEXT)")
+    conn.executemany("INSERT INTO t VALUES (?, ?)", [(i, f"city {i % 300}") for i in range(1000)] + [(None, None)])
+
+    assert profile_column(conn, "t", "city") == {"rows": 1001, "nulls": 1, "distinct": 300, "unique": False}
+    assert len(value_hashes(conn, "t", "id")) == 1000
+    # Other columns: the same bottom-k sample as from the full set, without holding it
+    everything = sorted(value_hashes(conn, "t", "city"))
+    assert bottom_hashes(conn, "t", "city", 50) == everything[:50]
@@ -0,0 +1,77 @@
+import os
+import sqlite3
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+os.environ.setdefault("GROQ_API_KEY", "dummy")
+
+from text_to_sql import workflow_engine as workflow_module
+from text_to_sql.error_classifier import FATAL, SCHEMA, SECURITY, SYNTAX, TRANSIENT, RetryPolicy, classify_error
+from text_to_sql.metrics import METRICS
+from text_to_sql.workflow_engine import WorkflowEngine
+
+
+def test_errors_are_classified():
+    assert classify_error("near \"FORM\": syntax error") == SYNTAX
+    assert classify_error("no such column: amt") == SCHEMA
+    assert classify_error("database is locked") == TRANSIENT
+    assert classify_error("Database file not found at /tmp/x.db") == FATAL
+    assert classify_error("Security Violation: Only SELECT statements are allowed.") == SECURITY
+    assert classify_error("Generation Error: Error code: 429 - rate limit reached", generation=True) == TRANSIENT
+    assert classify_error("Generation Error: GROQ_API_KEY not found", generation=True) == FATAL
+    # A query stopped at its deadline is regenerated, not re-run; a timed-out LLM call is retried
+    assert classify_error("interrupted") == SYNTAX
+    assert classify_error("Generation Error: Request timed out.", generation=True) == TRANSIENT
+    assert classify_error("Generation Error: near \"x\": syntax error", generation=True) == FATAL
+    # Identifiers quoted by SQLite don't pass for provider or file errors
+    assert classify_error("no such column: busy") == SCHEMA
+    assert classify_error("no such table: overloaded_orders") == SCHEMA
+    assert classify_error("no such column: timeout") == SCHEMA
+    assert classify_error('near "403": syntax error') == SYNTAX
+    assert classify_error("malformed MATCH expression: [\"x\"]") == SYNTAX
+    assert classify_error("database disk image is malformed") == FATAL
+
+
+def _engine(tmp_path, sqls):
+    db_path = str(tmp_path / "sales.db")
+    with sqlite3.connect(db_path) as conn:
+        conn.execute("CREATE TABLE sales (id INTEGER, amount REAL)")
+        conn.execute("INSERT INTO sales VALUES (1, 9.5)")
+
+    engine = WorkflowEngine()
+    engine.retry_policy = RetryPolicy({"backoff_base_seconds": 0, "jitter": False})
+    calls = []
+    engine.llm_generator.generate_query = lambda **kwargs: calls.append(kwargs) or sqls[len(calls) - 1]
+    return engine, db_path, calls
+
+
+def test_schema_error_regenerates_with_the_closest_names(tmp_path):
+    engine, db_path, calls = _engine(tmp_path, ["SELECT amout FROM sales", "SELECT amount FROM sales"])
+    result = engine.run("amounts?", db_path, [], explain_mode="none")
+    assert result["result"]["data"] == [{"amount": 9.5}]
+    assert len(calls) == 2
+    assert calls[1]["error"] == "no such column: amout"
+    assert "did you mean: amount" in calls[1]["correction"]
+
+
+def test_transient_error_re_executes_without_the_llm(tmp_path, monkeypatch):
+    engine, db_path, calls = _engine(tmp_path, ["SELECT COUNT(*) AS n FROM sales"])
+    original = workflow_module.PREAGGREGATIONS.execute
+    outcomes = [{"error": "database is locked"}]
+    monkeypatch.setattr(workflow_module.PREAGGREGATIONS, "execute",
+                        lambda *args, **kwargs: outcomes.pop() if outcomes else original(*args, **kwargs))
+    saved = METRICS.get("retries.llm_calls_saved", TRANSIENT)
+
+    result = engine.run("how many?", db_path, [], explain_mode="none")
+    assert result["result"]["data"] == [{"n": 1}]
+    assert len(calls) == 1
+    assert METRICS.get("retries.llm_calls_saved", TRANSIENT) == saved + 1
+
+
+def test_fatal_error_stops_immediately(tmp_path):
+    engine, db_path, calls = _engine(tmp_path, ["SELECT 1"] * 4)
+    os.remove(db_path)
+    result = engine.run("anything", db_path, [], schema="Table 'sales':\n", explain_mode="none")
+    assert result["error_class"] == FATAL
+    assert len(calls) == 1
@@ -0,0 +1,46 @@
+import os
+import sys
+
+import pandas as pd
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+os.environ.setdefault("GROQ_API_KEY", "dummy")
+
+from text_to_sql.error_classifier import schema_names
+from text_to_sql.example_store import schema_fingerprint
+from text_to_sql.schema_inspector import extract_schema, render_schema
+from text_to_sql.sql_executor import open_readonly_connection
+from utils.file_converter import convert_to_sqlite
+
+
+def test_compact_style_is_shorter_and_keeps_the_names(tmp_path):
+    path = tmp_path / "stores.xlsx"
+    month = {"store_id": [1, 1, 2], "sold on": ["2024-01-05", "2024-01-09", "2024-02-01"], "amount": [1.5, 2.0, 3.25]}
+    with pd.ExcelWriter(path) as writer:
+        pd.DataFrame({"store_id": [1, 2, 3], "city": ["Lyon", "Nice", "Metz"]}).to_excel(writer, sheet_name="stores", index=False)
+        pd.DataFrame(month).to_excel(writer, sheet_name="january", index=False)
+        pd.DataFrame(month).to_excel(writer, sheet_name="february", index=False)
+    db_path = convert_to_sqlite(str(path), str(tmp_path))
+    conn = open_readonly_connection(db_path)
+    try:
+        payload = extract_schema(conn)
+    finally:
+        conn.close()
+
+    verbose = render_schema(payload, {"style": "verbose"})
+    compact = render_schema(payload, {"style": "compact"})
+    assert compact.splitlines()[:4] == [
+        "Tables as name(column type, ...); date: date as 'YYYY-MM-DD' text; fk t.c: foreign key to t.c; pk: primary key",
+        "data_stores(store_id int pk, city text)",
+        'data_january(store_id int fk data_stores.store_id, "sold on" date, amount real)',
+        "data_february(same as data_january)",
+    ]
+    assert len(compact) < len(verbose)
+    assert "INTEGER" in render_schema(payload, {"style": "compact", "abbreviate_types": False})
+    assert "data_february(store_id" in render_schema(payload, {"style": "compact", "deduplicate": False})
+
+    # Correction hints and example fingerprints don't depend on the style
+    assert schema_names(compact) == schema_names(verbose)
+    assert "sold on" in schema_names(compact)
+    assert schema_fingerprint(compact) == schema_fingerprint(verbose)
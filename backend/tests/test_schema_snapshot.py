@@ -0,0 +1,29 @@
+import os
+import sqlite3
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+os.environ.setdefault("GROQ_API_KEY", "dummy")
+
+from text_to_sql.schema_inspector import get_db_schema, load_schema_snapshot, schema_snapshot_path
+from utils.file_converter import convert_to_sqlite
+
+
+def test_schema_is_loaded_from_snapshot_until_the_file_changes(tmp_path):
+    path = tmp_path / "orders.csv"
+    path.write_text("order_id,customer,amount\n1,Alice,10.5\n2,Bob,20\n")
+    db_path = convert_to_sqlite(str(path), str(tmp_path))
+
+    schema = get_db_schema(db_path)
+    snapshot = load_schema_snapshot(db_path)
+    assert snapshot["source"] == "sqlite"
+    assert [c["name"] for c in snapshot["tables"][0]["columns"]] == ["order_id", "customer", "amount"]
+    # The snapshot renders the same text as a fresh inspection
+    os.remove(schema_snapshot_path(db_path))
+    assert get_db_schema(db_path) == schema
+
+    with sqlite3.connect(db_path) as conn:
+        conn.execute("CREATE TABLE extra (x INTEGER)")
+    assert load_schema_snapshot(db_path) is None
+    assert "Table 'extra'" in get_db_schema(db_path)
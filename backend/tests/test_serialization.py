@@ -0,0 +1,77 @@
+import csv
+import datetime
+import io
+import json
+import os
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+os.environ.setdefault("GROQ_API_KEY", "dummy")
+
+from fastapi.testclient import TestClient
+
+from main import app
+from api.routers.query import workflow_engine
+from api.serialization import dumps, negotiate, to_columnar
+from text_to_sql.config_loader import GLOBAL_CONFIG
+from text_to_sql.sql_executor import execute_query_and_format
+
+client = TestClient(app)
+
+
+def test_dumps_handles_nan_dates_and_bytes():
+    payload = {"v": float("nan"), "d": datetime.date(2024, 1, 31), "b": b"\x01\xff", 1: "int key"}
+    assert json.loads(dumps(payload)) == {"v": None, "d": "2024-01-31", "b": "01ff", "1": "int key"}
+
+
+def test_negotiate_prefers_query_parameter_then_accept():
+    assert negotiate(None, None) == "json"
+    assert negotiate(None, "text/csv;q=0.9, */*") == "csv"
+    assert negotiate("ndjson", "text/csv") == "ndjson"
+    columnar = to_columnar({"columns": ["a", "b"], "data": [{"a": 1, "b": 2}]})
+    assert columnar == {"columns": ["a", "b"], "rows": [[1, 2]]}
+
+
+def test_query_formats_and_export(monkeypatch, remove_upload):
+    upload = client.post("/upload", files={"file": ("export_data.csv", b"name,age\nAlice,30\nBob,25\nCarol,41", "text/csv")})
+    db_path = upload.json()["db_path"]
+    table = execute_query_and_format("SELECT name FROM sqlite_master WHERE type='table'", db_path)["data"][0]["name"]
+    sql = f"SELECT name, age FROM [{table}] ORDER BY age"
+
+    def fake_run(question, db_path, chat_history, **kwargs):
+        return {"sql": sql, "result": execute_query_and_format(sql, db_path), "error": None}
+    monkeypatch.setattr(workflow_engine, "run", fake_run)
+
+    try:
+        body = {"question": "ages", "db_path": db_path, "explain": "none"}
+        default = client.post("/query/", json=body)
+        assert default.status_code == 200
+        assert default.json()["result"]["data"][0] == {"name": "Bob", "age": 25}
+
+        columnar = client.post("/query/?format=columnar", json=body).json()
+        assert columnar["result"]["rows"] == [["Bob", 25], ["Alice", 30], ["Carol", 41]]
+
+        as_csv = client.post("/query/", json=body, headers={"Accept": "text/csv"})
+        assert as_csv.headers["content-type"].startswith("text/csv")
+        assert list(csv.reader(io.StringIO(as_csv.text)))[1] == ["Bob", "25"]
+
+        export = client.post("/query/export?format=ndjson", json={"db_path": db_path, "sql": sql})
+        assert export.status_code == 200
+        assert [json.loads(line)["name"] for line in export.text.splitlines()] == ["Bob", "Alice", "Carol"]
+
+        refused = client.post("/query/export", json={"db_path": db_path, "sql": f"DELETE FROM [{table}]", "format": "csv"})
+        assert refused.status_code == 403
+
+        # Exports stop at their deadline
+        monkeypatch.setitem(GLOBAL_CONFIG, "serialization", {"export_timeout_seconds": 0.01})
+        slow = "SELECT COUNT(*) FROM " + ", ".join(f"[{table}] t{i}" for i in range(16))
+        stopped = client.post("/query/export", json={"db_path": db_path, "sql": slow, "format": "csv"})
+        assert stopped.status_code == 400 and "interrupted" in stopped.json()["detail"]
+        assert client.post("/query/?format=xml", json=body).status_code == 400
+
+        preview = client.get("/data/preview", params={"db_path": db_path, "limit": 2}).json()
+        assert preview["rows"] == [["Alice", 30], ["Bob", 25]]
+    finally:
+        remove_upload(client, upload.json())
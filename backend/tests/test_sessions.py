@@ -0,0 +1,96 @@
+import os
+import sys
+import time
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+os.environ.setdefault("GROQ_API_KEY", "dummy")
+
+from fastapi.testclient import TestClient
+
+from main import app
+from api.routers.query import workflow_engine
+from text_to_sql.shared_cache import SCHEMA_CACHE
+from utils.session_store import Session, InMemorySessionStore, SQLiteSessionStore
+
+client = TestClient(app)
+
+
+def test_in_memory_store_evicts_lru_and_expired():
+    store = InMemorySessionStore(max_sessions=2, ttl_seconds=60)
+    sessions = [Session(db_path=f"db{i}.db") for i in range(3)]
+    for session in sessions:
+        store.put(session)
+
+    assert store.get(sessions[0].session_id) is None
+    assert store.get(sessions[2].session_id) is sessions[2]
+
+    sessions[2].last_access = time.time() - 120
+    assert store.get(sessions[2].session_id) is None
+
+
+def test_sqlite_store_round_trips_history(tmp_path):
+    path = str(tmp_path / "sessions.db")
+    session = Session(db_path="sales.db")
+    session.add_turn("How many rows?", "There are 3 rows.", "SELECT COUNT(*) FROM t")
+    SQLiteSessionStore(path).put(session)
+
+    restored = SQLiteSessionStore(path).get(session.session_id)
+    assert restored.db_path == "sales.db"
+    assert restored.last_sql == "SELECT COUNT(*) FROM t"
+    assert [m.type for m in restored.history] == ["human", "ai"]
+
+
+def test_shared_sqlite_store_is_consistent_across_workers(tmp_path):
+    # Two stores on one file stand for two worker processes
+    path = str(tmp_path / "sessions.db")
+    first, second = SQLiteSessionStore(path, shared=True), SQLiteSessionStore(path, shared=True)
+    session = Session(db_path="sales.db")
+    first.put(session)
+
+    stale = second.get(session.session_id)
+    assert first.add_turn(first.get(session.session_id), "How many rows?", "3 rows.")
+    assert [m.content for m in second.get(session.session_id).history] == ["How many rows?", "3 rows."]
+
+    # A turn appended from an outdated copy doesn't drop the other worker's turn
+    assert second.add_turn(stale, "And columns?", "2 columns.")
+    assert len(first.get(session.session_id).history) == 4
+    assert len(stale.history) == 4
+
+    assert first.delete(session.session_id)
+    assert second.get(session.session_id) is None
+    assert not second.add_turn(stale, "Still there?", "No.")
+
+
+def test_session_query_uses_stored_history_and_schema(monkeypatch, remove_upload):
+    upload = client.post("/upload", files={"file": ("session_data.csv", b"name,age\nAlice,30\nBob,25", "text/csv")})
+    db_path = upload.json()["db_path"]
+
+    calls = []
+    def fake_run(**kwargs):
+        calls.append(kwargs)
+        return {"sql": "SELECT name FROM t", "result": {"data": [{"name": "Alice"}], "message": "Alice"},
+                "chat_history": kwargs["chat_history"], "schema": kwargs["schema"]}
+    monkeypatch.setattr(workflow_engine, "run", fake_run)
+
+    try:
+        session_id = client.post("/sessions", json={"db_path": db_path}).json()["session_id"]
+        client.post(f"/sessions/{session_id}/query", json={"question": "Who is first?"})
+        response = client.post(f"/sessions/{session_id}/query", json={"question": "And second?"})
+
+        assert response.status_code == 200
+        assert "chat_history" not in response.json()
+        assert "session_data" in calls[1]["schema"]
+        assert [m.content for m in calls[1]["chat_history"]] == ["Who is first?", "Alice\nSQL: SELECT name FROM t"]
+
+        # The schema is read at each query, so a change to the database reaches open sessions
+        SCHEMA_CACHE.set(db_path, "Table 'session_data_v2':\n")
+        client.post(f"/sessions/{session_id}/query", json={"question": "And third?"})
+        assert calls[2]["schema"] == "Table 'session_data_v2':\n"
+
+        assert client.delete(f"/sessions/{session_id}").status_code == 200
+        assert client.post(f"/sessions/{session_id}/query", json={"question": "?"}).status_code == 404
+    finally:
+        SCHEMA_CACHE.delete(db_path)
+        remove_upload(client, upload.json())
@@ -0,0 +1,76 @@
+import os
+import sqlite3
+import sys
+import time
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+os.environ.setdefault("GROQ_API_KEY", "dummy")
+
+from langchain_core.messages import HumanMessage
+
+from text_to_sql import workflow_engine
+from text_to_sql.fake_llm import FakeSQLChatModel
+from text_to_sql.shared_cache import InMemoryCache, SQLiteCache, database_key
+from text_to_sql.workflow_engine import WorkflowEngine
+
+
+def test_sqlite_cache_is_shared_between_instances(tmp_path):
+    path = str(tmp_path / "cache.db")
+    # Two instances on one file stand for two worker processes
+    first, second = SQLiteCache(path, "sql"), SQLiteCache(path, "sql")
+    other_namespace = SQLiteCache(path, "result")
+
+    first.set(database_key("/db/a.db", "q1"), "SELECT 1")
+    first.set(database_key("/db/a.db", "q2"), "SELECT 2")
+    first.set(database_key("/db/b.db", "q1"), "SELECT 3")
+    assert second.get(database_key("/db/a.db", "q1")) == "SELECT 1"
+    assert other_namespace.get(database_key("/db/a.db", "q1")) is None
+
+    second.delete_prefix("/db/a.db\n")
+    assert first.get(database_key("/db/a.db", "q2")) is None
+    assert first.get(database_key("/db/b.db", "q1")) == "SELECT 3"
+
+    first.set("short", {"status": "pending"}, ttl_seconds=0.05)
+    time.sleep(0.1)
+    assert second.get("short") is None
+
+
+def test_in_memory_cache_is_bounded_and_copies_values():
+    cache = InMemoryCache(max_entries=2)
+    cache.set("a", {"rows": [1]})
+    cache.get("a")["rows"].append(2)
+    assert cache.get("a") == {"rows": [1]}
+
+    cache.set("b", 2)
+    cache.set("c", 3)
+    assert cache.get("a") is None and cache.get("c") == 3
+
+
+class CountingModel(FakeSQLChatModel):
+    calls: int = 0
+
+    def _generate(self, messages, *args, **kwargs):
+        if "Schema:" in messages[0].content:
+            self.calls += 1
+        return super()._generate(messages, *args, **kwargs)
+
+
+def test_repeated_question_skips_the_llm(tmp_path):
+    db_path = str(tmp_path / "sales.db")
+    with sqlite3.connect(db_path) as conn:
+        conn.execute("CREATE TABLE sales (id INTEGER)")
+        conn.executemany("INSERT INTO sales VALUES (?)", [(1,), (2,)])
+
+    engine = WorkflowEngine()
+    model = CountingModel(canned_sql=[{"pattern": "how many", "sql": "SELECT COUNT(*) AS row_count FROM [{table}]"}])
+    engine.llm_generator.default_llm = model
+
+    first = engine.run("how many sales?", db_path, [], explain_mode="none")
+    second = engine.run("how many sales?", db_path, [], explain_mode="none")
+    assert first["result"]["data"] == second["result"]["data"] == [{"row_count": 2}]
+    assert model.calls == 1
+
+    # A follow-up question depends on the conversation: not cached
+    engine.run("how many sales?", db_path, [HumanMessage(content="hi")], explain_mode="none")
+    assert model.calls == 2
@@ -0,0 +1,54 @@
+import os
+import sqlite3
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+os.environ.setdefault("GROQ_API_KEY", "dummy")
+
+from benchmarks.replay_traces import compare, replay_trace
+from text_to_sql import workflow_engine as workflow_module
+from text_to_sql.error_classifier import RetryPolicy
+from text_to_sql.shared_cache import InMemoryCache
+from text_to_sql.trace_store import TraceStore
+from text_to_sql.workflow_engine import WorkflowEngine
+
+
+def test_runs_are_traced_and_replayed_offline(tmp_path, monkeypatch):
+    # As in offline_engine: replays must not be answered from the run's cached SQL
+    monkeypatch.setattr(workflow_module, "SQL_CACHE", InMemoryCache(max_entries=0))
+    monkeypatch.setattr(workflow_module, "RESULT_CACHE", InMemoryCache(max_entries=0))
+    store = TraceStore(str(tmp_path / "traces.db"), {"enabled": True, "max_result_rows": 1})
+    monkeypatch.setattr(workflow_module, "TRACES", store)
+    db_path = str(tmp_path / "sales.db")
+    with sqlite3.connect(db_path) as conn:
+        conn.execute("CREATE TABLE sales (id INTEGER, amount REAL)")
+        conn.executemany("INSERT INTO sales VALUES (?, ?)", [(1, 9.5), (2, 3.0)])
+
+    engine = WorkflowEngine()
+    engine.retry_policy = RetryPolicy({"backoff_base_seconds": 0, "jitter": False})
+    sqls = ["SELECT amout FROM sales", "SELECT amount FROM sales ORDER BY id"]
+    engine.llm_generator.generate_query = lambda **kwargs: sqls.pop(0)
+    result = engine.run("amounts?", db_path, [], explain_mode="none")
+
+    trace = store.get(result["trace_id"])
+    assert [s["node"] for s in trace["steps"]] == ["generate", "execute", "generate", "execute"]
+    assert trace["steps"][1]["update"]["error"] == "no such column: amout"
+    # Rows past max_result_rows are counted, not kept
+    assert trace["steps"][3]["update"]["result"] == {"columns": ["amount"], "data": [{"amount": 9.5}], "row_count": 2}
+    assert trace["final"]["row_count"] == 2 and trace["inputs"]["schema"] == result["schema"]
+    assert store.list()[0]["nodes"] == "generate>execute>generate>execute"
+
+    # Replayed from the recorded SQL, on the real database
+    replays = TraceStore(str(tmp_path / "replays.db"), {"enabled": True})
+    # As in offline_engine: an exact example match would skip the recorded failed attempt
+    monkeypatch.setitem(workflow_module.GLOBAL_CONFIG, "examples", {"enabled": False})
+    monkeypatch.setattr(workflow_module, "TRACES", replays)
+    replayed = replay_trace(engine, replays, trace)
+    assert replayed["state"]["result"]["data"] == [{"amount": 9.5}, {"amount": 3.0}]
+    assert compare(trace, replayed)["differences"] == []
+
+    with sqlite3.connect(db_path) as conn:
+        conn.execute("DELETE FROM sales WHERE id = 2")
+    assert compare(trace, replay_trace(engine, replays, trace))["differences"] == ["rows"]
@@ -0,0 +1,64 @@
+import os
+import sqlite3
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+import pandas as pd
+
+from utils.type_inference import infer_types, convert_frame
+from utils.file_converter import convert_to_sqlite
+from text_to_sql.schema_inspector import get_db_schema
+
+
+def _types(frames):
+    return {c["name"]: (c["logical_type"], c["detail"]) for c in infer_types(frames)}
+
+
+def test_type_is_inferred_from_every_chunk():
+    first = pd.DataFrame({"qty": ["1", "2"], "price": ["3", "4"]})
+    later = pd.DataFrame({"qty": ["3", "unknown"], "price": ["5.5", "N/A"]})
+
+    types = _types([first, later])
+    assert types["qty"][0] == "text"
+    assert types["price"] == ("real", "us")
+
+
+def test_numbers_dates_and_booleans():
+    frame = pd.DataFrame({
+        "zip": ["00123", "75001"],
+        "amount": ["1,234", "2,345,678"],
+        "eu": ["1.234,5", "12,75"],
+        "flag": ["Oui", "non"],
+        "day": ["31/01/2024", "01/02/2024"],
+        "bad_day": ["2023-02-30", "2023-03-01"],
+    })
+    types = _types([frame])
+    assert types["zip"][0] == "text"
+    assert types["amount"][0] == "integer"
+    assert types["eu"] == ("real", "eu")
+    assert types["flag"][0] == "boolean"
+    assert types["day"] == ("date", "dmy")
+    assert types["bad_day"][0] == "text"
+
+    converted = convert_frame(frame, infer_types([frame]))
+    assert converted["amount"].tolist() == [1234, 2345678]
+    assert converted["eu"].tolist() == [1234.5, 12.75]
+    assert converted["flag"].tolist() == [1, 0]
+    assert converted["day"].tolist() == ["2024-01-31", "2024-02-01"]
+
+
+def test_convert_creates_typed_strict_table(tmp_path):
+    csv_path = tmp_path / "orders.csv"
+    csv_path.write_text("id,total,ordered\n1,10.5,2024-01-05\n2,,2024-01-06\n3,7,2024-01-07\n")
+
+    db_path = convert_to_sqlite(str(csv_path), str(tmp_path))
+    with sqlite3.connect(db_path) as conn:
+        ddl = conn.execute("SELECT sql FROM sqlite_master WHERE name='data_orders'").fetchone()[0]
+        rows = conn.execute("SELECT id, total FROM data_orders WHERE total > 8").fetchall()
+
+    assert '"total" REAL' in ddl and ddl.endswith("STRICT")
+    assert rows == [(1, 10.5)]
+    schema = get_db_schema(db_path)
+    assert "_af_columns" not in schema
+    assert "ordered: TEXT (date as 'YYYY-MM-DD' text)" in schema
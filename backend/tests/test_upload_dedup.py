@@ -0,0 +1,113 @@
+import os
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+os.environ.setdefault("GROQ_API_KEY", "dummy")
+
+from fastapi.testclient import TestClient
+
+from main import app
+from api.routers import upload
+from text_to_sql.sql_executor import execute_query_and_format
+from utils.db_registry import DB_REGISTRY
+from utils.upload_index import UploadIndex
+
+client = TestClient(app)
+
+CONTENT = b"product,units\nChair,4\nDesk,2\nLamp,9"
+
+
+def test_identical_uploads_share_one_database(tmp_path, monkeypatch, remove_upload):
+    monkeypatch.setattr(upload, "upload_index", UploadIndex(str(tmp_path / "uploads.db"), gc_grace_seconds=0))
+    conversions = []
+    original = upload.convert_to_sqlite
+    monkeypatch.setattr(upload, "convert_to_sqlite", lambda *args: conversions.append(args) or original(*args))
+
+    first = client.post("/upload", files={"file": ("sales.csv", CONTENT, "text/csv")}).json()
+    second = client.post("/upload", files={"file": ("sales_copy.csv", CONTENT, "text/csv")}).json()
+    other = client.post("/upload", files={"file": ("sales.csv", CONTENT + b"\nSofa,1", "text/csv")}).json()
+
+    try:
+        assert first["deduplicated"] is False
+        assert second["deduplicated"] is True
+        assert second["db_path"] == first["db_path"]
+        assert other["db_path"] != first["db_path"]
+        assert len(conversions) == 2
+
+        assert second["upload_id"] != first["upload_id"]
+
+        # A reference can only be released by the upload that took it
+        release = lambda upload_id: client.delete("/upload", params={"db_path": first["db_path"], "upload_id": upload_id})
+        assert release(other["upload_id"]).status_code == 404
+        assert release("not-an-upload").status_code == 404
+
+        # The database is only collected once every upload has released it
+        assert release(first["upload_id"]).json()["references"] == 1
+        assert release(first["upload_id"]).status_code == 404
+        assert os.path.exists(first["db_path"])
+        response = release(second["upload_id"]).json()
+        assert response == {"db_path": second["db_path"], "references": 0, "collected": 1}
+        assert not os.path.exists(first["db_path"])
+
+        assert release(second["upload_id"]).status_code == 404
+    finally:
+        remove_upload(client, other)
+        DB_REGISTRY.remove(first["db_path"], delete_file=True)
+
+
+def test_hash_locks_are_bounded(tmp_path):
+    index = UploadIndex(str(tmp_path / "uploads.db"))
+    locks = {id(index._hash_lock(f"{i:064x}.csv")) for i in range(1000)}
+
+    assert len(locks) <= len(index._hash_locks)
+    assert index._hash_lock("abc.csv") is index._hash_lock("abc.csv")
+
+
+def test_deleted_database_is_converted_again(tmp_path, monkeypatch, remove_upload):
+    monkeypatch.setattr(upload, "upload_index", UploadIndex(str(tmp_path / "uploads.db")))
+
+    first = client.post("/upload", files={"file": ("stock.csv", CONTENT, "text/csv")}).json()
+    DB_REGISTRY.remove(first["db_path"], delete_file=True)
+    second = client.post("/upload", files={"file": ("stock.csv", CONTENT, "text/csv")}).json()
+
+    try:
+        assert second["deduplicated"] is False
+        assert os.path.exists(second["db_path"])
+    finally:
+        remove_upload(client, second)
+
+
+def test_append_to_a_shared_database_copies_it(tmp_path, monkeypatch, remove_upload):
+    monkeypatch.setattr(upload, "upload_index", UploadIndex(str(tmp_path / "uploads.db"), gc_grace_seconds=0))
+    first = client.post("/upload", files={"file": ("shared.csv", CONTENT, "text/csv")}).json()
+    second = client.post("/upload", files={"file": ("shared.csv", CONTENT, "text/csv")}).json()
+    more = lambda db_path, upload_id, rows: client.post(
+        "/upload/append", data={"db_path": db_path, "upload_id": upload_id},
+        files={"file": ("more.csv", b"product,units\n" + rows, "text/csv")}).json()
+
+    uploads = [first, second]
+    try:
+        # Only an upload holding a reference may change a shared database
+        for upload_id in ("", "not-an-upload"):
+            response = client.post("/upload/append", data={"db_path": first["db_path"], "upload_id": upload_id},
+                                   files={"file": ("more.csv", b"product,units\nSofa,1", "text/csv")})
+            assert response.status_code == 400 and "upload_id" in response.json()["detail"]
+
+        appended = more(first["db_path"], first["upload_id"], b"Sofa,1")
+        uploads[0] = appended
+        assert appended["copied"] is True and appended["db_path"] != first["db_path"]
+        assert appended["rows"] == 4
+
+        # The other uploader's database is untouched and only its reference remains on it
+        count = lambda path: execute_query_and_format(f"SELECT COUNT(*) AS n FROM [{appended['table']}]", path)["data"][0]["n"]
+        assert count(second["db_path"]) == 3
+        assert upload.upload_index.references(first["db_path"]) == 1
+
+        # Once sole owner, the copy is changed in place
+        again = more(appended["db_path"], appended["upload_id"], b"Stool,6")
+        assert (again["copied"], again["db_path"], again["rows"]) == (False, appended["db_path"], 5)
+    finally:
+        for done in uploads:
+            remove_upload(client, done)